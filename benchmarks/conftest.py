@@ -0,0 +1,85 @@
+"""Shared fixtures of the benchmark suite.
+
+The benchmarks run on synthetic corpora. The corpus sizes are set with the
+PYKNOWBASE_BENCHMARK_SIZES environment variable, a comma separated list of article counts
+(for example ``1000,10000,100000,1000000``). The default is 1000 articles.
+"""
+
+import os
+import random
+import resource
+import string
+import sys
+import time
+import tracemalloc
+from datetime import datetime, timedelta, timezone
+from typing import Any, Callable, Dict, Iterator, List, Sequence
+
+import pytest
+
+from pyknowbase.model import Article
+
+SIZES = [int(size) for size in os.environ.get("PYKNOWBASE_BENCHMARK_SIZES", "1000").split(",")]
+
+_WORDS = [
+    "".join(random.Random(i).choices(string.ascii_lowercase, k=3 + i % 8)) for i in range(2000)
+]
+
+
+def make_articles(count: int, text_words: int = 200, seed: int = 0) -> Iterator[Article]:
+    """Generates a reproducible synthetic corpus."""
+    rng = random.Random(seed)
+    start = datetime(2024, 1, 1, tzinfo=timezone.utc)
+    for i in range(count):
+        yield Article(
+            id=f"article-{i:08d}",
+            text=" ".join(rng.choices(_WORDS, k=text_words)),
+            metadata={ "language": rng.choice(["en", "de", "fr"]), "rank": i % 100 },
+            last_modified=start + timedelta(seconds=i),
+        )
+
+
+@pytest.fixture(scope="session", params=SIZES, ids=lambda size: f"{size}")
+def corpus(request) -> List[Article]:
+    return list(make_articles(request.param))
+
+
+def peak_rss_mb() -> float:
+    """The peak resident set size of the process in megabytes."""
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is in bytes on macOS and in kilobytes on Linux.
+    return peak / (1 << 20) if sys.platform == "darwin" else peak / 1024
+
+
+def record_throughput(benchmark, items: int) -> None:
+    """Adds the throughput of the benchmarked operation to the report."""
+    if benchmark.stats is not None:
+        mean = benchmark.stats.stats.mean
+        benchmark.extra_info["items_per_second"] = items / mean if mean else None
+    benchmark.extra_info["peak_rss_mb"] = round(peak_rss_mb(), 1)
+
+
+def record_allocations(benchmark, operation: Callable[[], Any]) -> None:
+    """Runs an operation once more with tracemalloc and reports its peak memory allocation."""
+    tracemalloc.start()
+    try:
+        operation()
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    benchmark.extra_info["peak_allocated_mb"] = round(peak / (1 << 20), 2)
+
+
+def record_latencies(benchmark, operation: Callable[[Any], Any], args: Sequence[Any]) -> None:
+    """Measures the latency of single calls of an operation and reports their percentiles."""
+    latencies = []
+    for arg in args:
+        start = time.perf_counter()
+        operation(arg)
+        latencies.append(time.perf_counter() - start)
+    latencies.sort()
+    percentiles: Dict[str, float] = {}
+    for percentile in (50, 95, 99):
+        index = min(len(latencies) - 1, len(latencies) * percentile // 100)
+        percentiles[f"p{percentile}_us"] = round(latencies[index] * 1e6, 2)
+    benchmark.extra_info.update(percentiles)
@@ -0,0 +1,64 @@
+"""Benchmarks of the DynamoDB backends against the moto DynamoDB stand-in.
+
+The absolute numbers do not reflect the latency of the real service, but they show the number
+of round trips and the client side overhead of the operations.
+"""
+
+import random
+
+import pytest
+
+pytest.importorskip("moto")
+
+from conftest import record_latencies, record_throughput  # noqa: E402
+
+
+@pytest.fixture
+def collection(monkeypatch):
+    from moto import mock_aws
+
+    from pyknowbase.storage.dynamo_multi import DynamoMultiKnowledgeBaseCollection
+
+    monkeypatch.setenv("AWS_DEFAULT_REGION", "us-east-1")
+    monkeypatch.setenv("AWS_ACCESS_KEY_ID", "benchmark")
+    monkeypatch.setenv("AWS_SECRET_ACCESS_KEY", "benchmark")
+    with mock_aws():
+        collection = DynamoMultiKnowledgeBaseCollection("benchmark", max_workers=4)
+        collection.create_table()
+        yield collection
+
+
+@pytest.fixture
+def knowledge_base(collection, corpus):
+    kb = collection.put_knowledge_base("benchmark")
+    kb.put_articles(corpus)
+    return kb
+
+
+def test_put_articles(benchmark, collection, corpus):
+    kb = collection.put_knowledge_base("benchmark")
+    benchmark.pedantic(kb.put_articles, args=(corpus,), rounds=3)
+    record_throughput(benchmark, len(corpus))
+
+
+def test_iterate(benchmark, knowledge_base, corpus):
+    benchmark.pedantic(lambda: sum(1 for _ in knowledge_base), rounds=3)
+    record_throughput(benchmark, len(corpus))
+
+
+def test_get(benchmark, knowledge_base, corpus):
+    ids = [article.id for article in random.Random(0).sample(corpus, min(200, len(corpus)))]
+    benchmark.pedantic(lambda: [knowledge_base[article_id] for article_id in ids], rounds=3)
+    record_throughput(benchmark, len(ids))
+    record_latencies(benchmark, knowledge_base.__getitem__, ids)
+
+
+def test_get_many(benchmark, knowledge_base, corpus):
+    ids = [article.id for article in corpus[::10]]
+    benchmark.pedantic(knowledge_base.get_many, args=(ids,), rounds=3)
+    record_throughput(benchmark, len(ids))
+
+
+def test_iter_versions(benchmark, knowledge_base, corpus):
+    benchmark.pedantic(lambda: sum(1 for _ in knowledge_base.iter_versions()), rounds=3)
+    record_throughput(benchmark, len(corpus))
@@ -0,0 +1,71 @@
+import pytest
+
+from pyknowbase.storage.binary import MutableBinaryKnowledgeBase
+from pyknowbase.storage.json_kb import MutableJSONFileKnowledgeBase
+from pyknowbase.storage.jsonl_kb import MutableJsonLinesKnowledgeBase
+from pyknowbase.storage.yaml import MutableYamlKnowledgeBase
+
+from conftest import record_allocations, record_throughput
+
+FORMATS = {
+    "json": (MutableJSONFileKnowledgeBase, {}),
+    "json-streaming": (MutableJSONFileKnowledgeBase, { "streaming": True }),
+    "jsonl": (MutableJsonLinesKnowledgeBase, {}),
+    "yaml": (MutableYamlKnowledgeBase, {}),
+    "yaml-stream": (MutableYamlKnowledgeBase, { "stream": True }),
+    "binary": (MutableBinaryKnowledgeBase, {}),
+}
+
+
+@pytest.fixture(params=list(FORMATS))
+def file_format(request):
+    if request.param.startswith("yaml"):
+        pytest.importorskip("yaml")
+    return FORMATS[request.param]
+
+
+def write_file(path, file_format, corpus):
+    cls, kwargs = file_format
+    kb = cls(path, **kwargs)
+    kb.put_articles(corpus)
+    kb.save()
+    return kb
+
+
+def test_save(benchmark, tmp_path, file_format, corpus):
+    kb = write_file(tmp_path / "kb", file_format, corpus)
+    benchmark(kb.save)
+    record_throughput(benchmark, len(corpus))
+    record_allocations(benchmark, kb.save)
+
+
+def test_load(benchmark, tmp_path, file_format, corpus):
+    cls, kwargs = file_format
+    path = tmp_path / "kb"
+    write_file(path, file_format, corpus)
+    benchmark(cls, path, **kwargs)
+    record_throughput(benchmark, len(corpus))
+    record_allocations(benchmark, lambda: cls(path, **kwargs))
+
+
+@pytest.mark.parametrize("name", ["json", "jsonl"])
+def test_open_lazy(benchmark, tmp_path, name, corpus):
+    cls, kwargs = FORMATS[name]
+    path = tmp_path / "kb"
+    write_file(path, FORMATS[name], corpus)
+    cls(path, lazy=True, **kwargs)  # Writes the offset index.
+    benchmark(cls, path, lazy=True, **kwargs)
+    record_allocations(benchmark, lambda: cls(path, lazy=True, **kwargs))
+
+
+def test_journal_save(benchmark, tmp_path, corpus):
+    kb = MutableJSONFileKnowledgeBase(tmp_path / "kb.json", journal=True)
+    kb.put_articles(corpus)
+    kb.compact()
+    changed = corpus[:10]
+
+    def update():
+        kb.put_articles(changed)
+        kb.save()
+
+    benchmark(update)
@@ -0,0 +1,22 @@
+import subprocess
+import sys
+
+import pytest
+
+MODULES = ["pyknowbase", "pyknowbase.storage.dynamo_multi", "pyknowbase.cli"]
+
+
+def import_in_subprocess(module: str) -> None:
+    subprocess.run([sys.executable, "-c", f"import {module}"], check=True)
+
+
+@pytest.mark.parametrize("module", MODULES)
+def test_import(benchmark, module):
+    # The interpreter startup is included, compare with the baseline below.
+    benchmark.pedantic(import_in_subprocess, args=(module,), rounds=10, warmup_rounds=1)
+
+
+def test_interpreter_baseline(benchmark):
+    benchmark.pedantic(
+        subprocess.run, args=([sys.executable, "-c", "pass"],), rounds=10, warmup_rounds=1
+    )
@@ -0,0 +1,56 @@
+import random
+
+from pyknowbase.storage.memory import MutableInMemoryKnowledgeBase
+
+from conftest import record_latencies, record_throughput
+
+
+def make_kb(corpus):
+    kb = MutableInMemoryKnowledgeBase("benchmark")
+    kb.put_articles(corpus)
+    return kb
+
+
+def test_get(benchmark, corpus):
+    kb = make_kb(corpus)
+    ids = [article.id for article in random.Random(0).sample(corpus, min(1000, len(corpus)))]
+
+    def get_all():
+        for article_id in ids:
+            kb[article_id]
+
+    benchmark(get_all)
+    record_throughput(benchmark, len(ids))
+    record_latencies(benchmark, kb.__getitem__, ids)
+
+
+def test_get_many(benchmark, corpus):
+    kb = make_kb(corpus)
+    ids = [article.id for article in corpus[::10]]
+    benchmark(kb.get_many, ids)
+    record_throughput(benchmark, len(ids))
+
+
+def test_iterate(benchmark, corpus):
+    kb = make_kb(corpus)
+    benchmark(lambda: sum(1 for _ in kb))
+    record_throughput(benchmark, len(corpus))
+
+
+def test_query_indexed(benchmark, corpus):
+    kb = MutableInMemoryKnowledgeBase("benchmark", indexed_fields=["language"])
+    kb.put_articles(corpus)
+    benchmark(lambda: sum(1 for _ in kb.query({ "language": "en", "rank": { "lt": 10 } })))
+
+
+def test_copy_from(benchmark, corpus):
+    source = make_kb(corpus)
+    benchmark(lambda: MutableInMemoryKnowledgeBase("target").copy_from(source))
+    record_throughput(benchmark, len(corpus))
+
+
+def test_sync_from_unchanged(benchmark, corpus):
+    source = make_kb(corpus)
+    target = make_kb(corpus)
+    benchmark(target.sync_from, source)
+    record_throughput(benchmark, len(corpus))
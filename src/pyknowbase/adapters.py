@@ -0,0 +1,184 @@
+"""Adapters between the synchronous and the asyncio knowledge base interfaces."""
+
+from typing import (
+    Any, AsyncIterator, Awaitable, Callable, Dict, Iterable, Iterator, List, Optional, TypeVar
+)
+from concurrent.futures import Executor
+import asyncio
+import itertools
+import threading
+
+from .storage.parallel import chunked
+from .model import (
+    KnowledgeBase, MutableKnowledgeBase, AsyncKnowledgeBase, AsyncMutableKnowledgeBase, Article
+)
+
+T = TypeVar("T")
+
+
+class AsyncKnowledgeBaseAdapter(AsyncKnowledgeBase):
+    """Exposes a synchronous knowledge base with the asyncio interface.
+
+    The blocking calls of the wrapped knowledge base are executed in an executor, so they do not
+    block the event loop. Iteration fetches the articles in batches to amortize the cost of the
+    executor calls.
+
+    Args:
+        knowledge_base (KnowledgeBase): The wrapped knowledge base.
+        executor (Optional[Executor]): The executor running the blocking calls. If None, the
+            default executor of the event loop is used. Defaults to None.
+        batch_size (int): The number of articles fetched by a single executor call during
+            iteration. Defaults to 100.
+    """
+
+    knowledge_base: KnowledgeBase
+
+    def __init__(self,
+        knowledge_base: KnowledgeBase,
+        executor: Optional[Executor] = None,
+        batch_size: int = 100,
+    ) -> None:
+        self.knowledge_base = knowledge_base
+        self.name = knowledge_base.name
+        self.metadata = knowledge_base.metadata
+        self.executor = executor
+        self.batch_size = batch_size
+
+    async def _run(self, func: Callable[..., T], *args: Any) -> T:
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self.executor, func, *args)
+
+    async def get(self, article_id: str) -> Optional[Article]:
+        try:
+            return await self._run(self.knowledge_base.__getitem__, article_id)
+        except KeyError:
+            return None
+
+    async def get_many(self, ids: Iterable[str]) -> Dict[str, Article]:
+        return await self._run(self.knowledge_base.get_many, list(ids))
+
+    async def __aiter__(self) -> AsyncIterator[Article]:
+        iterator = iter(self.knowledge_base)
+        while True:
+            batch: List[Article] = await self._run(
+                lambda: list(itertools.islice(iterator, self.batch_size))
+            )
+            if not batch:
+                return
+            for article in batch:
+                yield article
+
+
+class AsyncMutableKnowledgeBaseAdapter(AsyncKnowledgeBaseAdapter, AsyncMutableKnowledgeBase):
+    """Exposes a synchronous mutable knowledge base with the asyncio interface."""
+
+    knowledge_base: MutableKnowledgeBase
+
+    async def put(self, article: Article) -> None:
+        await self._run(self.knowledge_base.add, article)
+
+    async def delete(self, article_id: str) -> None:
+        await self._run(self.knowledge_base.__delitem__, article_id)
+
+    async def put_articles(self, articles: Iterable[Article]) -> None:
+        await self._run(self.knowledge_base.put_articles, list(articles))
+
+
+class _EventLoopThread:
+    """An event loop running forever in a daemon thread."""
+
+    _instance: Optional["_EventLoopThread"] = None
+    _lock = threading.Lock()
+
+    def __init__(self) -> None:
+        self.loop = asyncio.new_event_loop()
+        self.thread = threading.Thread(target=self.loop.run_forever, daemon=True)
+        self.thread.start()
+
+    @classmethod
+    def shared(cls) -> "_EventLoopThread":
+        with cls._lock:
+            if cls._instance is None:
+                cls._instance = _EventLoopThread()
+            return cls._instance
+
+
+def _run_in_loop(awaitable: Awaitable[T], loop: asyncio.AbstractEventLoop) -> T:
+    async def wrapper() -> T:
+        return await awaitable
+    return asyncio.run_coroutine_threadsafe(wrapper(), loop).result()
+
+
+class SyncKnowledgeBaseAdapter(KnowledgeBase):
+    """Exposes an asyncio knowledge base with the synchronous interface.
+
+    The coroutines of the wrapped knowledge base are executed in an event loop running in a
+    background thread, so the adapter can be used also from code that is called by a running
+    event loop. The wrapped knowledge base must not be used concurrently from other event loops.
+
+    Args:
+        knowledge_base (AsyncKnowledgeBase): The wrapped knowledge base.
+        loop (Optional[asyncio.AbstractEventLoop]): The event loop executing the coroutines. It
+            must run in a thread different from the callers of the adapter. If None, a shared
+            event loop is started in a daemon thread. Defaults to None.
+        batch_size (int): The number of articles written by a single put_articles coroutine.
+            Defaults to 100.
+    """
+
+    knowledge_base: AsyncKnowledgeBase
+
+    def __init__(self,
+        knowledge_base: AsyncKnowledgeBase,
+        loop: Optional[asyncio.AbstractEventLoop] = None,
+        batch_size: int = 100,
+    ) -> None:
+        self.knowledge_base = knowledge_base
+        self.name = knowledge_base.name
+        self.metadata = knowledge_base.metadata
+        self.loop = loop
+        self.batch_size = batch_size
+
+    def _run(self, awaitable: Awaitable[T]) -> T:
+        return _run_in_loop(awaitable, self.loop or _EventLoopThread.shared().loop)
+
+    def __getitem__(self, __key: str) -> Article:
+        article = self._run(self.knowledge_base.get(__key))
+        if article is None:
+            raise KeyError(__key)
+        return article
+
+    def get_many(self, ids: Iterable[str]) -> Dict[str, Article]:
+        return self._run(self.knowledge_base.get_many(list(ids)))
+
+    def __iter__(self) -> Iterator[Article]:
+        iterator = self.knowledge_base.__aiter__()
+        try:
+            while True:
+                try:
+                    article = self._run(iterator.__anext__())
+                except StopAsyncIteration:
+                    return
+                yield article
+        finally:
+            # Releases the resources of an iteration that was not consumed until the end.
+            aclose = getattr(iterator, "aclose", None)
+            if aclose is not None:
+                self._run(aclose())
+
+
+class SyncMutableKnowledgeBaseAdapter(SyncKnowledgeBaseAdapter, MutableKnowledgeBase):
+    """Exposes an asyncio mutable knowledge base with the synchronous interface."""
+
+    knowledge_base: AsyncMutableKnowledgeBase
+
+    def __setitem__(self, __key: str, __value: Article) -> None:
+        if __key != __value.id:
+            __value = __value.model_copy(update={ "id": __key })
+        self._run(self.knowledge_base.put(__value))
+
+    def __delitem__(self, __key: str) -> None:
+        self._run(self.knowledge_base.delete(__key))
+
+    def put_articles(self, articles: Iterable[Article]) -> None:
+        for batch in chunked(articles, self.batch_size):
+            self._run(self.knowledge_base.put_articles(batch))
@@ -0,0 +1,458 @@
+"""Splitting articles into passages (chunks) for retrieval.
+
+A Chunker derives overlapping passages from the text of an article, with a size measured in
+characters or in tokens. The chunks have stable identifiers composed of the article identifier
+and the position of the chunk, and they record their character offsets in the article text.
+
+A ChunkedKnowledgeBase serves the chunks of the articles of a knowledge base. Only the offsets of
+the chunks are cached, keyed by the last_modified timestamp of the articles, so splitting is
+repeated only for the articles that changed.
+"""
+
+from typing import (
+    Any, Callable, Dict, Iterable, Iterator, List, NamedTuple, Optional, Sequence, Tuple
+)
+from array import array
+from datetime import datetime
+import json
+import os
+from pathlib import Path
+import re
+
+from .model import (
+    Article, KnowledgeBase, MutableKnowledgeBase, WrappedKnowledgeBase, timestamp_micros
+)
+from .storage import StrPath
+
+Span = Tuple[int, int]
+"""The start and end character offsets of a piece of text."""
+
+TokenSpans = Callable[[str], Iterable[Span]]
+"""Finds the character offsets of the tokens of a text."""
+
+CHUNK_ID_SEPARATOR = "#"
+"""The separator of the article identifier and the chunk index in the chunk identifiers."""
+
+_WORD_RE = re.compile(r"\S+")
+_SPACE_RE = re.compile(r"\s")
+
+
+def word_spans(text: str) -> Iterator[Span]:
+    """Finds the whitespace separated words of a text.
+
+    Args:
+        text (str): The text.
+
+    Returns:
+        Iterator[Span]: The character offsets of the words.
+    """
+    return (match.span() for match in _WORD_RE.finditer(text))
+
+
+class Chunk(NamedTuple):
+    """A passage of the text of an article."""
+
+    id: str
+    """The identifier of the chunk: the article identifier, CHUNK_ID_SEPARATOR and index."""
+
+    article_id: str
+    """The identifier of the article."""
+
+    index: int
+    """The position of the chunk in the article, starting from 0."""
+
+    text: str
+    """The text of the chunk."""
+
+    start: int
+    """The offset of the first character of the chunk in the text of the article."""
+
+    end: int
+    """The offset after the last character of the chunk in the text of the article."""
+
+    last_modified: datetime
+    """The last_modified timestamp of the article the chunk was derived from."""
+
+
+def chunk_id(article_id: str, index: int) -> str:
+    """Returns the identifier of a chunk.
+
+    Args:
+        article_id (str): The identifier of the article.
+        index (int): The position of the chunk in the article.
+
+    Returns:
+        str: The chunk identifier.
+    """
+    return f"{article_id}{CHUNK_ID_SEPARATOR}{index}"
+
+
+def parse_chunk_id(chunk_id: str) -> Tuple[str, int]:
+    """Splits a chunk identifier into the article identifier and the chunk index.
+
+    Args:
+        chunk_id (str): The chunk identifier.
+
+    Raises:
+        ValueError: If the identifier is not a chunk identifier.
+
+    Returns:
+        Tuple[str, int]: The article identifier and the chunk index.
+    """
+    article_id, separator, index = chunk_id.rpartition(CHUNK_ID_SEPARATOR)
+    if not separator or not index.isdigit():
+        raise ValueError(f"Invalid chunk id: {chunk_id}")
+    return article_id, int(index)
+
+
+class Chunker:
+    """Splits texts into overlapping chunks.
+
+    With unit="chars", the chunks have at most size characters, and consecutive chunks overlap
+    by about overlap characters. The chunk boundaries are moved to whitespace when possible, so
+    words are not split. With unit="tokens", the chunks have at most size tokens, consecutive
+    chunks share overlap tokens, and the tokens are found by token_spans.
+
+    Args:
+        size (int): The maximum size of the chunks. Defaults to 1000.
+        overlap (int): The size of the overlap of consecutive chunks, at most half of size.
+            Defaults to 100.
+        unit (str): "chars" or "tokens". Defaults to "chars".
+        token_spans (TokenSpans): Finds the tokens of a text, used with unit="tokens". The
+            offsets of a tokenizer of an embedding model can be used here. Defaults to
+            word_spans.
+
+    Raises:
+        ValueError: If the arguments are invalid.
+    """
+
+    def __init__(self,
+        size: int = 1000,
+        overlap: int = 100,
+        unit: str = "chars",
+        token_spans: TokenSpans = word_spans,
+    ) -> None:
+        if size <= 0:
+            raise ValueError("The chunk size must be positive.")
+        if not 0 <= overlap <= size // 2:
+            # A larger overlap would repeat most of the text in several chunks.
+            raise ValueError("The overlap must be non-negative and at most half of the size.")
+        if unit not in ("chars", "tokens"):
+            raise ValueError(f"Unknown chunk unit: {unit}")
+        self.size = size
+        self.overlap = overlap
+        self.unit = unit
+        self.token_spans = token_spans
+
+    @property
+    def config(self) -> Dict[str, Any]:
+        """The settings of the chunker, the cached chunks are valid only with the same settings."""
+        config: Dict[str, Any] = { "size": self.size, "overlap": self.overlap, "unit": self.unit }
+        if self.unit == "tokens":
+            token_spans = self.token_spans
+            config["tokenizer"] = (
+                f"{getattr(token_spans, '__module__', '')}."
+                f"{getattr(token_spans, '__qualname__', type(token_spans).__qualname__)}"
+            )
+        return config
+
+    def spans(self, text: str) -> List[Span]:
+        """Finds the chunks of a text.
+
+        Args:
+            text (str): The text.
+
+        Returns:
+            List[Span]: The character offsets of the chunks. An empty text has no chunks.
+        """
+        if self.unit == "tokens":
+            return self._token_chunks(text)
+        return self._char_chunks(text)
+
+    def _char_chunks(self, text: str) -> List[Span]:
+        spans: List[Span] = []
+        length = len(text)
+        # Chunks shortened at a word boundary must not make the next chunk start too early.
+        min_step = max(1, (self.size - self.overlap) // 2)
+        start = 0
+        while start < length:
+            end = min(start + self.size, length)
+            if end < length and not text[end].isspace():
+                # Break after the last whitespace in the second half of the chunk.
+                low = start + self.size // 2
+                cut = max(text.rfind(" ", low, end), text.rfind("\n", low, end))
+                if cut >= 0:
+                    end = cut + 1
+            spans.append((start, end))
+            if end >= length:
+                break
+            next_start = max(end - self.overlap, start + min_step)
+            if 0 < next_start < end and not text[next_start - 1].isspace():
+                # Start the next chunk at a word boundary within the overlap.
+                match = _SPACE_RE.search(text, next_start, end)
+                if match is not None:
+                    next_start = match.end()
+            start = next_start
+        return spans
+
+    def _token_chunks(self, text: str) -> List[Span]:
+        tokens = list(self.token_spans(text))
+        spans: List[Span] = []
+        step = self.size - self.overlap
+        for first in range(0, len(tokens), step):
+            window = tokens[first:first + self.size]
+            spans.append((window[0][0], window[-1][1]))
+            if first + self.size >= len(tokens):
+                break
+        return spans
+
+    def chunks(self, article: Article) -> Iterator[Chunk]:
+        """Splits an article into chunks.
+
+        Args:
+            article (Article): The article.
+
+        Returns:
+            Iterator[Chunk]: The chunks.
+        """
+        return _make_chunks(article, self.spans(article.text))
+
+
+def _make_chunks(article: Article, spans: Iterable[Span]) -> Iterator[Chunk]:
+    for index, (start, end) in enumerate(spans):
+        yield Chunk(
+            id=chunk_id(article.id, index),
+            article_id=article.id,
+            index=index,
+            text=article.text[start:end],
+            start=start,
+            end=end,
+            last_modified=article.last_modified,
+        )
+
+
+class ChunkRefreshResult(NamedTuple):
+    """The outcome of ChunkedKnowledgeBase.refresh."""
+
+    chunked: int
+    """The number of new or changed articles that were split."""
+    removed: int
+    """The number of deleted articles removed from the cache."""
+
+
+class ChunkedKnowledgeBase(WrappedKnowledgeBase):
+    """A knowledge base serving the chunks of the articles of another knowledge base.
+
+    The articles are served by the wrapped knowledge base. The chunk offsets of each article are
+    cached together with its last_modified timestamp, and they are recomputed only when the
+    timestamp changes. The chunks are produced lazily, one article at a time.
+
+    The cache can be persisted with the save_cache method. When the wrapped knowledge base is a
+    file knowledge base, the cache is stored next to its file (with an additional ``.chunks``
+    suffix) by default. The persisted cache is used only if it was created with the same chunker
+    settings.
+
+    Example::
+
+        kb = ChunkedKnowledgeBase(JsonKnowledgeBase("kb.json"), Chunker(size=800, overlap=80))
+        kb.refresh()
+        kb.save_cache()
+        for chunk in kb.iter_chunks():
+            print(chunk.id, chunk.text)
+
+    Args:
+        knowledge_base (KnowledgeBase): The wrapped knowledge base.
+        chunker (Optional[Chunker]): The chunker. If None, a Chunker with the default settings
+            is used. Defaults to None.
+        cache_path (Optional[StrPath]): The path of the persisted cache. Defaults to None.
+    """
+
+    def __init__(self,
+        knowledge_base: KnowledgeBase,
+        chunker: Optional[Chunker] = None,
+        cache_path: Optional[StrPath] = None,
+    ) -> None:
+        super().__init__(knowledge_base)
+        self.chunker = chunker or Chunker()
+        filepath: Optional[Path] = getattr(knowledge_base, "filepath", None)
+        if cache_path is None and filepath is not None:
+            cache_path = filepath.with_name(filepath.name + ".chunks")
+        self.cache_path = Path(cache_path) if cache_path is not None else None
+        # The timestamp and the flattened chunk offsets of the articles.
+        self._cache: Dict[str, Tuple[int, array]] = {}
+        if self.cache_path is not None and self.cache_path.is_file():
+            self._load_cache(self.cache_path)
+
+    def iter_chunks(self) -> Iterator[Chunk]:
+        """Iterates over the chunks of all articles.
+
+        Returns:
+            Iterator[Chunk]: The chunks, grouped by article.
+        """
+        for article in self.knowledge_base:
+            yield from self.article_chunks(article)
+
+    def article_chunks(self, article: Article) -> Iterator[Chunk]:
+        """Returns the chunks of an article, splitting it only if it is not cached.
+
+        Args:
+            article (Article): The article.
+
+        Returns:
+            Iterator[Chunk]: The chunks.
+        """
+        return _make_chunks(article, self._spans(article))
+
+    def get_chunks(self, article_id: str) -> Iterator[Chunk]:
+        """Returns the chunks of an article.
+
+        Args:
+            article_id (str): The identifier of the article.
+
+        Raises:
+            KeyError: If the article does not exist.
+
+        Returns:
+            Iterator[Chunk]: The chunks.
+        """
+        return self.article_chunks(self.knowledge_base[article_id])
+
+    def get_chunk(self, chunk_id: str) -> Optional[Chunk]:
+        """Retrieves a chunk by its identifier.
+
+        Args:
+            chunk_id (str): The identifier of the chunk.
+
+        Returns:
+            Optional[Chunk]: The chunk, or None if the article or the chunk does not exist.
+        """
+        article_id, index = parse_chunk_id(chunk_id)
+        article = self.knowledge_base.get(article_id)
+        if article is None:
+            return None
+        offsets = self._offsets(article)
+        if 2 * index + 1 >= len(offsets):
+            return None
+        start, end = offsets[2 * index], offsets[2 * index + 1]
+        return Chunk(
+            id=chunk_id,
+            article_id=article_id,
+            index=index,
+            text=article.text[start:end],
+            start=start,
+            end=end,
+            last_modified=article.last_modified,
+        )
+
+    def refresh(self, batch_size: int = 100) -> ChunkRefreshResult:
+        """Splits the new and changed articles in advance, and forgets the deleted ones.
+
+        The versions of the articles are listed with iter_versions, and only the changed articles
+        are read from the wrapped knowledge base.
+
+        Args:
+            batch_size (int): The number of articles read at once. Defaults to 100.
+
+        Returns:
+            ChunkRefreshResult: The number of split and removed articles.
+        """
+        seen = set()
+        changed: List[str] = []
+        chunked = 0
+        for article_id, last_modified in self.knowledge_base.iter_versions():
+            seen.add(article_id)
+            cached = self._cache.get(article_id)
+            if cached is None or cached[0] != timestamp_micros(last_modified):
+                changed.append(article_id)
+            if len(changed) >= batch_size:
+                chunked += self._split_articles(changed)
+                changed = []
+        if changed:
+            chunked += self._split_articles(changed)
+        removed = [article_id for article_id in self._cache if article_id not in seen]
+        for article_id in removed:
+            del self._cache[article_id]
+        return ChunkRefreshResult(chunked=chunked, removed=len(removed))
+
+    def save_cache(self) -> None:
+        """Saves the chunk offsets to cache_path.
+
+        Raises:
+            ValueError: If cache_path is not set.
+        """
+        if self.cache_path is None:
+            raise ValueError("The cache_path of the knowledge base is not set.")
+        data = {
+            "chunker": self.chunker.config,
+            "articles": { article_id: [timestamp, offsets.tolist()]
+                          for article_id, (timestamp, offsets) in self._cache.items() },
+        }
+        tmp_path = self.cache_path.with_name(self.cache_path.name + ".tmp")
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(data, f, separators=(",", ":"))
+        os.replace(tmp_path, self.cache_path)
+
+    def _load_cache(self, path: Path) -> None:
+        try:
+            data = json.loads(path.read_text(encoding="utf-8"))
+        except ValueError:
+            return
+        if data.get("chunker") != self.chunker.config:
+            return
+        self._cache = { article_id: (timestamp, array("I", offsets))
+                        for article_id, (timestamp, offsets) in data["articles"].items() }
+
+    def _split_articles(self, article_ids: Sequence[str]) -> int:
+        articles = self.knowledge_base.get_many(article_ids)
+        for article in articles.values():
+            self._offsets(article)
+        return len(articles)
+
+    def _offsets(self, article: Article) -> array:
+        timestamp = timestamp_micros(article.last_modified)
+        cached = self._cache.get(article.id)
+        if cached is not None and cached[0] == timestamp:
+            return cached[1]
+        offsets = array("I")
+        for start, end in self.chunker.spans(article.text):
+            offsets.append(start)
+            offsets.append(end)
+        self._cache[article.id] = (timestamp, offsets)
+        return offsets
+
+    def _spans(self, article: Article) -> Iterator[Span]:
+        offsets = self._offsets(article)
+        return zip(offsets[::2], offsets[1::2])
+
+
+class MutableChunkedKnowledgeBase(ChunkedKnowledgeBase, MutableKnowledgeBase):
+    """A mutable knowledge base serving the chunks of the articles of another knowledge base.
+
+    Writes are forwarded to the wrapped knowledge base and drop the cached chunks of the written
+    articles. Saving a file knowledge base does not save the cache, save_cache should be called
+    after save.
+    """
+
+    knowledge_base: MutableKnowledgeBase
+
+    def __setitem__(self, __key: str, __value: Article) -> None:
+        self.knowledge_base[__key] = __value
+        self._cache.pop(__key, None)
+
+    def __delitem__(self, __key: str) -> None:
+        del self.knowledge_base[__key]
+        self._cache.pop(__key, None)
+
+    def put_articles(self, articles: Iterable[Article]) -> None:
+        def forgetting() -> Iterator[Article]:
+            for article in articles:
+                self._cache.pop(article.id, None)
+                yield article
+        self.knowledge_base.put_articles(forgetting())
+
+    def delete_articles(self, article_ids: Iterable[str]) -> None:
+        def forgetting() -> Iterator[str]:
+            for article_id in article_ids:
+                self._cache.pop(article_id, None)
+                yield article_id
+        self.knowledge_base.delete_articles(forgetting())
@@ -13,18 +13,472 @@ Why does this file exist, and why not put this in __main__?
     there"s no ``pyknowbase.__main__`` in ``sys.modules``.
 
   Also see (1) from http://click.pocoo.org/5/setuptools/#setuptools-integration
+
+The knowledge bases are addressed with URIs:
+
+- ``json://kb.json``, ``jsonl://kb.jsonl``, ``yaml://kb.yaml`` and ``binary://kb.pkbb`` for file
+  knowledge bases. Paths without a scheme are recognized by their suffix.
+- ``dynamo://table/kb`` for a knowledge base of a DynamoDB knowledge base collection.
+
+Options of the knowledge bases can be passed as query parameters, for example
+``yaml://kb.yaml?stream=true``, ``binary://kb.pkbb?compression=zlib`` or
+``dynamo://table/kb?shards=4&skip_unchanged=true``.
+
+The backends are imported only when they are used, so the command starts fast.
 """
+from typing import Any, Callable, Dict, Iterable, List, NamedTuple, Optional, TextIO, Tuple
 import argparse
+import importlib
+import json
+import os
+import sys
+import threading
+import time
+
+FILE_SCHEMES = {
+    "json": ("pyknowbase.storage.json_kb", "JsonKnowledgeBase", "MutableJSONFileKnowledgeBase"),
+    "jsonl": (
+        "pyknowbase.storage.jsonl_kb", "JsonLinesKnowledgeBase", "MutableJsonLinesKnowledgeBase"
+    ),
+    "yaml": ("pyknowbase.storage.yaml", "YamlKnowledgeBase", "MutableYamlKnowledgeBase"),
+    "binary": ("pyknowbase.storage.binary", "BinaryKnowledgeBase", "MutableBinaryKnowledgeBase"),
+}
+"""The module, the read-only and the mutable knowledge base class of the file URI schemes."""
+
+SUFFIX_SCHEMES = {
+    ".json": "json",
+    ".jsonl": "jsonl",
+    ".yaml": "yaml",
+    ".yml": "yaml",
+    ".pkbb": "binary",
+    ".bin": "binary",
+}
+"""The URI schemes of the file paths without a scheme, by file suffix."""
+
+READ_OPTIONS = {
+    "json": frozenset(("lazy", "cache_size", "indexed_fields", "streaming", "validate")),
+    "jsonl": frozenset(("lazy", "cache_size", "indexed_fields")),
+    "yaml": frozenset(("indexed_fields",)),
+    "binary": frozenset(("lazy", "indexed_fields")),
+}
+"""The options of the file URI schemes."""
+
+WRITE_OPTIONS = {
+    "json": frozenset(("journal", "skip_unchanged")),
+    "jsonl": frozenset(("journal", "skip_unchanged")),
+    "yaml": frozenset(("journal", "skip_unchanged", "stream")),
+    "binary": frozenset(("journal", "skip_unchanged", "compression")),
+}
+"""The options of the file URI schemes that affect only the writing of the knowledge bases."""
+
+DYNAMO_OPTIONS = frozenset((
+    "shards", "compression", "indexed_fields", "last_modified_index_name", "max_inline_text_bytes",
+    "max_pool_connections", "max_workers", "scan_segments", "skip_unchanged",
+))
+"""The options of the DynamoDB URIs."""
+
+
+class Endpoint(NamedTuple):
+    """A knowledge base opened from a URI."""
+
+    knowledge_base: Any
+    """The knowledge base."""
+    save: Optional[Callable[[], None]]
+    """Persists the changes of the knowledge base, None if it writes its changes directly."""
+    concurrent_writes: bool
+    """True if several threads may write the knowledge base concurrently."""
+
+
+def _parse_value(value: str) -> Any:
+    # Digits are left to int, so that shards=1 is not mistaken for a flag.
+    if value.lower() in ("true", "yes"):
+        return True
+    if value.lower() in ("false", "no"):
+        return False
+    if value.isdigit():
+        return int(value)
+    return value
+
+
+def parse_uri(uri: str) -> Tuple[str, str, Dict[str, Any]]:
+    """Splits a knowledge base URI into the scheme, the location and the options.
+
+    >>> parse_uri("dynamo://table/kb?shards=4")
+    ('dynamo', 'table/kb', {'shards': 4})
+    >>> parse_uri("data/kb.yml")
+    ('yaml', 'data/kb.yml', {})
+
+    Args:
+        uri (str): The URI.
+
+    Raises:
+        ValueError: If the scheme is not recognized.
+
+    Returns:
+        Tuple[str, str, Dict[str, Any]]: The scheme, the location (file path, or table and
+        knowledge base name) and the options.
+    """
+    from urllib.parse import parse_qsl
+
+    location, _, query = uri.partition("?")
+    options = { key: _parse_value(value) for key, value in parse_qsl(query) }
+    scheme, separator, path = location.partition("://")
+    if not separator:
+        path = location
+        suffix = "." + path.rsplit(".", 1)[-1].lower() if "." in path else ""
+        if suffix not in SUFFIX_SCHEMES:
+            raise ValueError(f"Could not recognize the format of {uri}, use a URI scheme.")
+        scheme = SUFFIX_SCHEMES[suffix]
+    elif scheme == "pkbb":
+        scheme = "binary"
+    if scheme not in FILE_SCHEMES and scheme != "dynamo":
+        raise ValueError(f"Unknown knowledge base URI scheme: {scheme}")
+    return scheme, path, options
+
+
+def open_endpoint(uri: str, writable: bool = False) -> Endpoint:
+    """Opens the knowledge base addressed by a URI.
+
+    Args:
+        uri (str): The URI of the knowledge base.
+        writable (bool): Set to True to open the knowledge base for writing. File knowledge
+            bases and DynamoDB knowledge bases opened for writing are created if they do not
+            exist. Defaults to False.
+
+    Raises:
+        ValueError: If the URI is invalid, or it has an option that its scheme does not support.
+        FileNotFoundError: If a file knowledge base opened for reading does not exist.
+        KeyError: If a DynamoDB knowledge base opened for reading does not exist.
+
+    Returns:
+        Endpoint: The opened knowledge base.
+    """
+    scheme, path, options = parse_uri(uri)
+    if scheme == "dynamo":
+        _check_options(uri, options, DYNAMO_OPTIONS)
+        return _open_dynamo(path, options, writable)
+    _check_options(uri, options, READ_OPTIONS[scheme] | WRITE_OPTIONS[scheme])
+    if "indexed_fields" in options:
+        options["indexed_fields"] = str(options["indexed_fields"]).split(",")
+    module_name, class_name, mutable_class_name = FILE_SCHEMES[scheme]
+    module = importlib.import_module(module_name)
+    if writable:
+        if "compression" in options:
+            from .storage.compression import TextCompression
+            options["compression"] = TextCompression(codec=options["compression"])
+        kb = getattr(module, mutable_class_name)(path, **options)
+        return Endpoint(knowledge_base=kb, save=kb.save, concurrent_writes=False)
+    if not os.path.isfile(path):
+        raise FileNotFoundError(f"Knowledge base file {path} not found.")
+    for option in WRITE_OPTIONS[scheme]:
+        options.pop(option, None)
+    return Endpoint(
+        knowledge_base=getattr(module, class_name)(path, **options),
+        save=None,
+        concurrent_writes=False,
+    )
+
+
+def _check_options(uri: str, options: Dict[str, Any], supported: Iterable[str]) -> None:
+    unsupported = sorted(set(options).difference(supported))
+    if unsupported:
+        raise ValueError(
+            f"Unsupported option {', '.join(unsupported)} in {uri}, "
+            f"the supported options are {', '.join(sorted(supported))}."
+        )
+
+
+def _open_dynamo(path: str, options: Dict[str, Any], writable: bool) -> Endpoint:
+    from .storage.dynamo_multi import DynamoMultiKnowledgeBaseCollection
+
+    table_name, _, kb_name = path.partition("/")
+    if not table_name or not kb_name:
+        raise ValueError(f"Invalid DynamoDB knowledge base URI: dynamo://{path}")
+    shards = options.pop("shards", 1)
+    if "compression" in options:
+        from .storage.compression import TextCompression
+        options["compression"] = TextCompression(codec=options["compression"])
+    if "indexed_fields" in options:
+        options["indexed_fields"] = str(options["indexed_fields"]).split(",")
+    collection = DynamoMultiKnowledgeBaseCollection(table_name, **options)
+    kb = collection.get_knowledge_base(kb_name)
+    if kb is None:
+        if not writable:
+            raise KeyError(f"Knowledge base {kb_name} not found in table {table_name}.")
+        kb = collection.put_knowledge_base(kb_name, shards=shards)
+    return Endpoint(knowledge_base=kb, save=None, concurrent_writes=True)
+
+
+class Progress:
+    """Reports the progress and the throughput of a long running command.
+
+    Args:
+        verb (str): The verb describing the processed articles, for example "copied".
+        stream (Optional[TextIO]): The stream of the reports, None to disable them. Defaults to
+            None.
+        interval (float): The minimum number of seconds between two reports. Defaults to 1.0.
+    """
+
+    def __init__(self, verb: str, stream: Optional[TextIO] = None, interval: float = 1.0) -> None:
+        self.verb = verb
+        self.stream = stream
+        self.interval = interval
+        self.articles = 0
+        self.characters = 0
+        self.start = time.perf_counter()
+        self._last_report = self.start
+        self._lock = threading.Lock()
+
+    def update(self, articles: int, characters: int = 0) -> None:
+        """Records processed articles, and reports the progress if the interval elapsed.
+
+        Args:
+            articles (int): The number of processed articles.
+            characters (int): The total length of the texts of the articles. Defaults to 0.
+        """
+        with self._lock:
+            self.articles += articles
+            self.characters += characters
+            now = time.perf_counter()
+            if now - self._last_report >= self.interval:
+                self._last_report = now
+                self._report(now)
+
+    def finish(self) -> None:
+        """Reports the totals."""
+        self._report(time.perf_counter())
 
-parser = argparse.ArgumentParser(description="Command description.")
-parser.add_argument(
-    "names",
-    metavar="NAME",
-    nargs=argparse.ZERO_OR_MORE,
-    help="A name of something.",
+    def _report(self, now: float) -> None:
+        if self.stream is None:
+            return
+        elapsed = max(now - self.start, 1e-9)
+        print(
+            f"{self.verb} {self.articles} articles in {elapsed:.1f} s "
+            f"({self.articles / elapsed:.0f} articles/s, "
+            f"{self.characters / elapsed / 1e6:.2f} M characters/s)",
+            file=self.stream,
+        )
+
+
+def copy_articles(
+    source: Any,
+    target: Endpoint,
+    batch_size: int = 100,
+    workers: int = 4,
+    progress: Optional[Progress] = None,
+) -> int:
+    """Copies the articles of a knowledge base in a streaming pipeline.
+
+    The articles are read in the calling thread and written in batches with put_articles by
+    worker threads, so reading and writing overlap. Knowledge bases that do not support
+    concurrent writes are written by a single worker.
+
+    Args:
+        source (KnowledgeBase): The source knowledge base.
+        target (Endpoint): The target knowledge base.
+        batch_size (int): The number of articles written at once. Defaults to 100.
+        workers (int): The number of writer threads. Defaults to 4.
+        progress (Optional[Progress]): Reports the progress. Defaults to None.
+
+    Returns:
+        int: The number of copied articles.
+    """
+    from .storage.parallel import chunked, consume_parallel
+
+    copied = 0
+    lock = threading.Lock()
+
+    def write(batch: List[Any]) -> None:
+        nonlocal copied
+        target.knowledge_base.put_articles(batch)
+        with lock:
+            copied += len(batch)
+        if progress is not None:
+            progress.update(len(batch), sum(len(article.text) for article in batch))
+
+    consume_parallel(
+        chunked(source, batch_size),
+        write,
+        max_workers=workers if target.concurrent_writes else 1,
+    )
+    if target.save is not None:
+        target.save()
+    return copied
+
+
+def knowledge_base_stats(articles: Iterable[Any], duplicates: bool = False) -> Dict[str, Any]:
+    """Computes statistics of the articles of a knowledge base.
+
+    Args:
+        articles (Iterable[Article]): The articles.
+        duplicates (bool): Set to True to count the articles with the same content as another
+            article. Defaults to False.
+
+    Returns:
+        Dict[str, Any]: The statistics.
+    """
+    from .model import content_hash
+
+    count = 0
+    total_length = 0
+    max_length = 0
+    oldest = newest = None
+    metadata_keys: Dict[str, int] = {}
+    hashes: Dict[str, int] = {}
+    for article in articles:
+        count += 1
+        length = len(article.text)
+        total_length += length
+        max_length = max(max_length, length)
+        if oldest is None or article.last_modified < oldest:
+            oldest = article.last_modified
+        if newest is None or article.last_modified > newest:
+            newest = article.last_modified
+        for key in article.metadata:
+            metadata_keys[key] = metadata_keys.get(key, 0) + 1
+        if duplicates:
+            digest = content_hash(article)
+            hashes[digest] = hashes.get(digest, 0) + 1
+    stats: Dict[str, Any] = {
+        "articles": count,
+        "text_characters": total_length,
+        "mean_text_characters": round(total_length / count, 1) if count else 0,
+        "max_text_characters": max_length,
+        "oldest": oldest.isoformat() if oldest is not None else None,
+        "newest": newest.isoformat() if newest is not None else None,
+        "metadata_keys": dict(sorted(metadata_keys.items(), key=lambda item: -item[1])),
+    }
+    if duplicates:
+        stats["duplicates"] = sum(n - 1 for n in hashes.values())
+    return stats
+
+
+def _add_pipeline_arguments(parser: argparse.ArgumentParser) -> None:
+    parser.add_argument(
+        "--batch-size", type=int, default=100, help="articles written at once (default: 100)"
+    )
+    parser.add_argument(
+        "--workers",
+        type=int,
+        default=4,
+        help="concurrent writers, for targets supporting concurrent writes (default: 4)",
+    )
+
+
+common_parser = argparse.ArgumentParser(add_help=False)
+common_parser.add_argument(
+    "-q", "--quiet", action="store_true", help="do not report the progress"
+)
+
+parser = argparse.ArgumentParser(
+    prog="pyknowbase",
+    description="Copies, converts and inspects knowledge bases.",
+    epilog="Knowledge base URIs: json://PATH, jsonl://PATH, yaml://PATH, binary://PATH, "
+           "dynamo://TABLE/KB, or a file path with a known suffix.",
 )
+subparsers = parser.add_subparsers(dest="command", metavar="COMMAND")
+
+copy_parser = subparsers.add_parser(
+    "copy", help="copy all articles to another knowledge base", parents=[common_parser]
+)
+copy_parser.add_argument("source", metavar="SOURCE", help="source knowledge base URI")
+copy_parser.add_argument("target", metavar="TARGET", help="target knowledge base URI")
+_add_pipeline_arguments(copy_parser)
+
+export_parser = subparsers.add_parser(
+    "export", help="export a knowledge base into a file", parents=[common_parser]
+)
+export_parser.add_argument("source", metavar="SOURCE", help="source knowledge base URI")
+export_parser.add_argument("target", metavar="FILE", help="target file path or URI")
+_add_pipeline_arguments(export_parser)
+
+import_parser = subparsers.add_parser(
+    "import", help="import a file into a knowledge base", parents=[common_parser]
+)
+import_parser.add_argument("source", metavar="FILE", help="source file path or URI")
+import_parser.add_argument("target", metavar="TARGET", help="target knowledge base URI")
+_add_pipeline_arguments(import_parser)
+
+sync_parser = subparsers.add_parser(
+    "sync",
+    help="update a knowledge base to mirror another one incrementally",
+    parents=[common_parser],
+)
+sync_parser.add_argument("source", metavar="SOURCE", help="source knowledge base URI")
+sync_parser.add_argument("target", metavar="TARGET", help="target knowledge base URI")
+sync_parser.add_argument(
+    "--keep", action="store_true", help="keep the articles missing from the source"
+)
+sync_parser.add_argument(
+    "--batch-size", type=int, default=100, help="articles fetched at once (default: 100)"
+)
+
+stats_parser = subparsers.add_parser(
+    "stats", help="print statistics of a knowledge base", parents=[common_parser]
+)
+stats_parser.add_argument("source", metavar="SOURCE", help="knowledge base URI")
+stats_parser.add_argument(
+    "--duplicates", action="store_true", help="count the articles with duplicate content"
+)
+
+
+def _is_file_uri(uri: str) -> bool:
+    return parse_uri(uri)[0] in FILE_SCHEMES
+
+
+def run(args: argparse.Namespace) -> int:
+    """Runs a parsed command.
+
+    Args:
+        args (argparse.Namespace): The parsed command line.
+
+    Returns:
+        int: The exit code.
+    """
+    stream = None if args.quiet else sys.stderr
+    if args.command == "stats":
+        source = open_endpoint(args.source).knowledge_base
+        stats = knowledge_base_stats(source, duplicates=args.duplicates)
+        print(json.dumps(stats, indent=2, ensure_ascii=False))
+        return 0
+    if args.command == "export" and not _is_file_uri(args.target):
+        raise ValueError(f"The target of export should be a file: {args.target}")
+    if args.command == "import" and not _is_file_uri(args.source):
+        raise ValueError(f"The source of import should be a file: {args.source}")
+    verbs = { "copy": "copied", "export": "exported", "import": "imported", "sync": "synced" }
+    # Opening the file knowledge bases loads them, which is included in the reported time.
+    progress = Progress(verbs[args.command], stream=stream)
+    source = open_endpoint(args.source).knowledge_base
+    target = open_endpoint(args.target, writable=True)
+    if args.command == "sync":
+        result = target.knowledge_base.sync_from(
+            source, delete=not args.keep, batch_size=args.batch_size
+        )
+        if target.save is not None:
+            target.save()
+        if stream is not None:
+            print(
+                f"added {result.added}, updated {result.updated}, deleted {result.deleted}, "
+                f"unchanged {result.unchanged} articles in "
+                f"{time.perf_counter() - progress.start:.1f} s",
+                file=stream,
+            )
+        return 0
+    copy_articles(
+        source, target, batch_size=args.batch_size, workers=args.workers, progress=progress
+    )
+    progress.finish()
+    return 0
 
 
 def main(args=None):
     args = parser.parse_args(args=args)
-    print(args.names)
+    if args.command is None:
+        parser.print_help()
+        return 0
+    try:
+        return run(args)
+    except (ValueError, KeyError, OSError) as error:
+        message = error.args[0] if isinstance(error, KeyError) and error.args else error
+        print(f"pyknowbase: error: {message}", file=sys.stderr)
+        return 1
@@ -0,0 +1,406 @@
+"""Vector embeddings of the articles and nearest-neighbour retrieval.
+
+This module requires the numpy python package.
+"""
+
+from typing import Any, Callable, Dict, Iterable, List, NamedTuple, Optional, Sequence, Tuple
+import json
+from pathlib import Path
+
+from .model import Article, KnowledgeBase, timestamp_micros
+from .storage import StrPath
+
+EmbedFunction = Callable[[List[str]], Any]
+"""Computes the embedding vectors of a batch of texts, returning a matrix-like object with one
+row for each text."""
+
+
+def _import_numpy():
+    try:
+        import numpy
+    except ImportError:
+        raise ValueError(
+            "Could not import numpy python package. "
+            "Please install it with `pip install numpy`."
+        )
+    return numpy
+
+
+class RefreshResult(NamedTuple):
+    """The outcome of EmbeddingIndex.refresh."""
+
+    embedded: int
+    """The number of new or changed articles that were embedded."""
+    removed: int
+    """The number of articles removed from the index."""
+
+
+class EmbeddingIndex:
+    """Embedding vectors of the articles of a knowledge base with cosine similarity search.
+
+    The vectors are normalized and stored in the rows of a contiguous NumPy matrix. Exact search
+    computes the similarities of a batch of queries to all rows with one matrix product.
+    For large corpora, build_ivf partitions the rows into clusters with k-means, and the
+    approximate search compares the queries only to the rows of the closest clusters.
+
+    The refresh method embeds only the articles that are new or whose last_modified timestamp
+    changed since the previous refresh, and removes the deleted articles from the index.
+
+    The index can be saved into a directory, and loaded with the matrix memory-mapped, so several
+    processes can share it.
+
+    Example::
+
+        index = EmbeddingIndex(kb, embed=model.encode)
+        index.refresh()
+        for article_id, score in index.search("How to reset my password?", k=5):
+            print(kb[article_id].text, score)
+
+    Args:
+        knowledge_base (KnowledgeBase): The knowledge base.
+        embed (EmbedFunction): Computes the embedding vectors of a batch of texts.
+        dtype (str): The data type of the stored vectors, for example "float32" or "float16".
+            Defaults to "float32".
+        batch_size (int): The number of texts passed to embed at once. Defaults to 64.
+    """
+
+    def __init__(self,
+        knowledge_base: KnowledgeBase,
+        embed: EmbedFunction,
+        dtype: str = "float32",
+        batch_size: int = 64,
+    ) -> None:
+        self.np = _import_numpy()
+        self.knowledge_base = knowledge_base
+        self.embed = embed
+        self.dtype = self.np.dtype(dtype)
+        self.batch_size = batch_size
+        self.vectors: Any = None
+        self._size = 0
+        self._ids: List[Optional[str]] = []
+        self._rows: Dict[str, int] = {}
+        self._timestamps: Dict[str, int] = {}
+        self._free: List[int] = []
+        # Marks the rows holding the vector of an article, the other rows are free.
+        self._live: Any = self.np.zeros(0, dtype=bool)
+        self.centroids: Any = None
+        self._assignments: Any = None
+
+    def __len__(self) -> int:
+        return len(self._rows)
+
+    def __contains__(self, article_id: object) -> bool:
+        return article_id in self._rows
+
+    def refresh(self) -> RefreshResult:
+        """Embeds the new and changed articles of the knowledge base, and removes the deleted ones.
+
+        The versions of the articles are listed with iter_versions, and only the changed articles
+        are read from the knowledge base, in batches of batch_size.
+
+        Returns:
+            RefreshResult: The number of embedded and removed articles.
+        """
+        seen = set()
+        changed: List[str] = []
+        embedded = 0
+        for article_id, last_modified in self.knowledge_base.iter_versions():
+            seen.add(article_id)
+            if self._timestamps.get(article_id) != timestamp_micros(last_modified):
+                changed.append(article_id)
+                if len(changed) >= self.batch_size:
+                    embedded += self._embed_changed(changed)
+                    changed = []
+        if changed:
+            embedded += self._embed_changed(changed)
+        removed = [article_id for article_id in self._rows if article_id not in seen]
+        for article_id in removed:
+            self.remove(article_id)
+        return RefreshResult(embedded=embedded, removed=len(removed))
+
+    def add(self, articles: Iterable[Article]) -> None:
+        """Embeds articles and adds them to the index, replacing the previous vectors.
+
+        Args:
+            articles (Iterable[Article]): The articles.
+        """
+        batch: List[Article] = []
+        for article in articles:
+            batch.append(article)
+            if len(batch) >= self.batch_size:
+                self._embed_articles(batch)
+                batch = []
+        if batch:
+            self._embed_articles(batch)
+
+    def remove(self, article_id: str) -> None:
+        """Removes an article from the index. Unknown identifiers are ignored.
+
+        Args:
+            article_id (str): The identifier of the article.
+        """
+        row = self._rows.pop(article_id, None)
+        if row is None:
+            return
+        del self._timestamps[article_id]
+        self._ids[row] = None
+        self._free.append(row)
+        self._live[row] = False
+
+    def _embed_changed(self, article_ids: List[str]) -> int:
+        articles = self.knowledge_base.get_many(article_ids)
+        if not articles:
+            return 0
+        return self._embed_articles([articles[i] for i in article_ids if i in articles])
+
+    def _embed_articles(self, articles: List[Article]) -> int:
+        np = self.np
+        vectors = self.embed([article.text for article in articles])
+        matrix = self._normalize(np.asarray(vectors, dtype="float32"))
+        if matrix.ndim != 2 or matrix.shape[0] != len(articles):
+            raise ValueError("The embed function must return one vector for each text.")
+        if self.vectors is None:
+            self.vectors = np.zeros((len(articles), matrix.shape[1]), dtype=self.dtype)
+        elif matrix.shape[1] != self.vectors.shape[1]:
+            raise ValueError(
+                f"Embedding dimension {matrix.shape[1]} does not match the index dimension "
+                f"{self.vectors.shape[1]}."
+            )
+        rows = [self._allocate_row(article.id) for article in articles]
+        self._reserve(self._size)
+        self.vectors[rows] = matrix
+        self._live[rows] = True
+        if self.centroids is not None:
+            self._assignments[rows] = self._nearest_centroids(matrix)
+        for article in articles:
+            self._timestamps[article.id] = timestamp_micros(article.last_modified)
+        return len(articles)
+
+    def _allocate_row(self, article_id: str) -> int:
+        row = self._rows.get(article_id)
+        if row is not None:
+            return row
+        if self._free:
+            row = self._free.pop()
+            self._ids[row] = article_id
+        else:
+            row = self._size
+            self._size += 1
+            self._ids.append(article_id)
+        self._rows[article_id] = row
+        return row
+
+    def _reserve(self, size: int) -> None:
+        np = self.np
+        if not isinstance(self.vectors, np.ndarray) or isinstance(self.vectors, np.memmap):
+            # A memory-mapped matrix is read-only, it is copied to the memory before changing it.
+            self.vectors = np.array(self.vectors, dtype=self.dtype)
+        capacity = self.vectors.shape[0]
+        if size > capacity:
+            capacity = max(size, 2 * capacity)
+            vectors = np.zeros((capacity, self.vectors.shape[1]), dtype=self.dtype)
+            vectors[:self.vectors.shape[0]] = self.vectors
+            self.vectors = vectors
+            if self._assignments is not None:
+                assignments = np.full(capacity, -1, dtype="int32")
+                assignments[:self._assignments.shape[0]] = self._assignments
+                self._assignments = assignments
+        if self._live.shape[0] < capacity:
+            live = np.zeros(capacity, dtype=bool)
+            live[:self._live.shape[0]] = self._live
+            self._live = live
+
+    def _normalize(self, matrix: Any) -> Any:
+        np = self.np
+        matrix = np.atleast_2d(matrix)
+        norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+        return matrix / np.maximum(norms, 1e-12)
+
+    def build_ivf(self, n_lists: int, n_iter: int = 10, seed: int = 0) -> None:
+        """Partitions the vectors into clusters for approximate search (inverted file index).
+
+        The clusters are computed with spherical k-means. Articles embedded later are assigned to
+        the closest existing cluster.
+
+        Args:
+            n_lists (int): The number of clusters.
+            n_iter (int): The number of k-means iterations. Defaults to 10.
+            seed (int): The seed of the random initialization. Defaults to 0.
+        """
+        np = self.np
+        rows = np.fromiter(self._rows.values(), dtype="int64", count=len(self._rows))
+        if len(rows) == 0:
+            raise ValueError("The index is empty.")
+        data = np.asarray(self.vectors[rows], dtype="float32")
+        n_lists = min(n_lists, len(rows))
+        rng = np.random.default_rng(seed)
+        centroids = data[rng.choice(len(rows), size=n_lists, replace=False)]
+        for _ in range(n_iter):
+            labels = np.argmax(data @ centroids.T, axis=1)
+            for cluster in range(n_lists):
+                members = data[labels == cluster]
+                if len(members):
+                    centroids[cluster] = members.sum(axis=0)
+            centroids = self._normalize(centroids)
+        self.centroids = centroids.astype("float32")
+        self._assignments = np.full(self.vectors.shape[0], -1, dtype="int32")
+        self._assignments[rows] = self._nearest_centroids(data)
+
+    def _nearest_centroids(self, matrix: Any) -> Any:
+        return self.np.argmax(self.np.asarray(matrix, dtype="float32") @ self.centroids.T, axis=1)
+
+    def search(self, query: str, k: int = 10, n_probe: Optional[int] = None
+    ) -> List[Tuple[str, float]]:
+        """Finds the articles most similar to a query.
+
+        Args:
+            query (str): The query.
+            k (int): The maximum number of results. Defaults to 10.
+            n_probe (Optional[int]): The number of clusters searched in approximate mode. If None,
+                the search is exact. Defaults to None.
+
+        Returns:
+            List[Tuple[str, float]]: The identifiers of the articles and their cosine
+            similarities to the query, in decreasing order of the similarities.
+        """
+        return self.search_batch([query], k=k, n_probe=n_probe)[0]
+
+    def search_batch(self, queries: Sequence[str], k: int = 10, n_probe: Optional[int] = None
+    ) -> List[List[Tuple[str, float]]]:
+        """Finds the articles most similar to each of a batch of queries.
+
+        Args:
+            queries (Sequence[str]): The queries, embedded in one call of the embed function.
+            k (int): The maximum number of results for each query. Defaults to 10.
+            n_probe (Optional[int]): The number of clusters searched in approximate mode. If None,
+                the search is exact. Defaults to None.
+
+        Returns:
+            List[List[Tuple[str, float]]]: The results for each query.
+        """
+        if not queries:
+            return []
+        return self.search_vectors(self.embed(list(queries)), k=k, n_probe=n_probe)
+
+    def search_vectors(self, vectors: Any, k: int = 10, n_probe: Optional[int] = None
+    ) -> List[List[Tuple[str, float]]]:
+        """Finds the articles most similar to each of a batch of query vectors.
+
+        Args:
+            vectors (matrix-like): The query vectors in the rows of a matrix.
+            k (int): The maximum number of results for each query. Defaults to 10.
+            n_probe (Optional[int]): The number of clusters searched in approximate mode. If None,
+                the search is exact. Defaults to None.
+
+        Raises:
+            ValueError: If n_probe is set but build_ivf was not called.
+
+        Returns:
+            List[List[Tuple[str, float]]]: The results for each query vector.
+        """
+        np = self.np
+        queries = self._normalize(np.asarray(vectors, dtype="float32"))
+        if not self._rows or k <= 0:
+            return [[] for _ in range(len(queries))]
+        if n_probe is None:
+            if len(self._rows) == self._size:
+                candidates = np.arange(self._size)
+                matrix = self.vectors[:self._size]
+            else:
+                candidates = np.flatnonzero(self._live[:self._size])
+                matrix = self.vectors[candidates]
+            scores = queries @ np.asarray(matrix, dtype="float32").T
+            return [self._top_k(candidates, row_scores, k) for row_scores in scores]
+        if self.centroids is None:
+            raise ValueError("Call build_ivf before the approximate search.")
+        probes = np.argsort(-(queries @ self.centroids.T), axis=1)[:, :n_probe]
+        assignments = self._assignments[:self._size]
+        live = self._live[:self._size]
+        results = []
+        for query, probe in zip(queries, probes):
+            candidates = np.flatnonzero(live & np.isin(assignments, probe))
+            scores = np.asarray(self.vectors[candidates], dtype="float32") @ query
+            results.append(self._top_k(candidates, scores, k))
+        return results
+
+    def _top_k(self, candidates: Any, scores: Any, k: int) -> List[Tuple[str, float]]:
+        np = self.np
+        if len(candidates) > k:
+            top = np.argpartition(-scores, k - 1)[:k]
+        else:
+            top = np.arange(len(candidates))
+        top = top[np.argsort(-scores[top])]
+        return [(self._ids[candidates[i]], float(scores[i])) for i in top]  # type: ignore[misc]
+
+    def save(self, directory: StrPath) -> None:
+        """Saves the index into a directory.
+
+        The vectors are saved in the NumPy .npy format, so they can be memory-mapped.
+
+        Args:
+            directory (StrPath): The directory, created if it does not exist.
+        """
+        np = self.np
+        path = Path(directory)
+        path.mkdir(parents=True, exist_ok=True)
+        vectors = self.vectors[:self._size] if self.vectors is not None else np.zeros((0, 0))
+        np.save(path / "vectors.npy", np.asarray(vectors, dtype=self.dtype))
+        if self.centroids is not None:
+            np.save(path / "centroids.npy", self.centroids)
+            np.save(path / "assignments.npy", self._assignments[:self._size])
+        else:
+            for name in ("centroids.npy", "assignments.npy"):
+                try:
+                    (path / name).unlink()
+                except FileNotFoundError:
+                    pass
+        meta = {
+            "dtype": self.dtype.name,
+            "ids": self._ids,
+            "timestamps": [self._timestamps.get(i) if i is not None else None for i in self._ids],
+        }
+        (path / "index.json").write_text(json.dumps(meta))
+
+    @classmethod
+    def load(cls,
+        directory: StrPath,
+        knowledge_base: KnowledgeBase,
+        embed: EmbedFunction,
+        mmap: bool = True,
+        **kwargs,
+    ) -> "EmbeddingIndex":
+        """Loads an index saved with the save method.
+
+        Args:
+            directory (StrPath): The directory of the saved index.
+            knowledge_base (KnowledgeBase): The knowledge base.
+            embed (EmbedFunction): Computes the embedding vectors of a batch of texts.
+            mmap (bool): Set to True to memory-map the vectors read-only. The vectors are copied
+                into the memory when the index is changed. Defaults to True.
+            **kwargs: Additional arguments of the EmbeddingIndex constructor.
+
+        Returns:
+            EmbeddingIndex: The loaded index.
+        """
+        path = Path(directory)
+        meta = json.loads((path / "index.json").read_text())
+        index = cls(knowledge_base, embed, dtype=meta["dtype"], **kwargs)
+        np = index.np
+        mmap_mode = "r" if mmap else None
+        vectors = np.load(path / "vectors.npy", mmap_mode=mmap_mode)
+        index._ids = meta["ids"]
+        index._size = len(index._ids)
+        if index._size:
+            index.vectors = vectors
+        for row, (article_id, timestamp) in enumerate(zip(meta["ids"], meta["timestamps"])):
+            if article_id is None:
+                index._free.append(row)
+            else:
+                index._rows[article_id] = row
+                index._timestamps[article_id] = timestamp
+        index._live = np.zeros(index._size, dtype=bool)
+        index._live[list(index._rows.values())] = True
+        if (path / "centroids.npy").is_file():
+            index.centroids = np.load(path / "centroids.npy")
+            index._assignments = np.array(np.load(path / "assignments.npy"))
+        return index
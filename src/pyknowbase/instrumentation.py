@@ -0,0 +1,348 @@
+"""Instrumentation hooks of the storage operations.
+
+The storage backends report their operations, for example loading and saving a file or a single
+DynamoDB API call, to the registered listeners. A listener is a callable receiving an
+OperationEvent with the latency, the number of items, the number of bytes and, for DynamoDB
+calls, the consumed capacity of the operation::
+
+    from pyknowbase import instrumentation
+
+    recorder = instrumentation.MetricsRecorder()
+    with instrumentation.listening(recorder):
+        kb = MutableJSONFileKnowledgeBase("kb.json")
+        kb.save()
+    print(recorder.stats["file.save"].mean_duration)
+
+The events can be exported as OpenTelemetry spans and metrics with OpenTelemetryListener.
+
+When no listener is registered, the backends skip the measurements altogether, and DynamoDB
+requests are sent without ``ReturnConsumedCapacity``.
+
+Listeners are called synchronously in the thread that executed the operation, which might be a
+worker thread of a parallel scan or batch write, so they should be fast and thread safe. The
+exceptions raised by listeners are logged and do not affect the operation.
+"""
+
+from typing import Any, Callable, Dict, Iterator, List, NamedTuple, Optional
+from contextlib import contextmanager
+import logging
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+
+class OperationEvent(NamedTuple):
+    """A finished storage operation."""
+
+    operation: str
+    """The name of the operation, for example ``file.save`` or ``dynamodb.Query``."""
+
+    start_time: float
+    """The start of the operation in seconds since the UNIX epoch."""
+
+    duration: float
+    """The duration of the operation in seconds."""
+
+    items: Optional[int]
+    """The number of articles or DynamoDB items read or written, if known."""
+
+    bytes: Optional[int]
+    """The number of bytes read or written, if known."""
+
+    consumed_capacity: Optional[float]
+    """The DynamoDB capacity units consumed by the operation, if known."""
+
+    error: Optional[str]
+    """The name of the exception or the DynamoDB error code if the operation failed."""
+
+    attributes: Dict[str, Any]
+    """Additional attributes, for example the path of the file or the name of the table."""
+
+
+Listener = Callable[[OperationEvent], None]
+
+_listeners: List[Listener] = []
+_listeners_lock = threading.Lock()
+
+
+def add_listener(listener: Listener) -> None:
+    """Registers a listener of the storage operations.
+
+    Args:
+        listener (Listener): A callable receiving the OperationEvent of each operation.
+    """
+    global _listeners
+    with _listeners_lock:
+        # The list is replaced rather than modified, so it can be iterated without locking.
+        _listeners = _listeners + [listener]
+
+
+def remove_listener(listener: Listener) -> None:
+    """Removes a listener registered with add_listener.
+
+    Args:
+        listener (Listener): The listener.
+
+    Raises:
+        ValueError: If the listener is not registered.
+    """
+    global _listeners
+    with _listeners_lock:
+        listeners = list(_listeners)
+        listeners.remove(listener)
+        _listeners = listeners
+
+
+@contextmanager
+def listening(listener: Listener) -> Iterator[Listener]:
+    """Registers a listener in a with block.
+
+    Args:
+        listener (Listener): The listener.
+
+    Returns:
+        Iterator[Listener]: The listener.
+    """
+    add_listener(listener)
+    try:
+        yield listener
+    finally:
+        remove_listener(listener)
+
+
+def is_enabled() -> bool:
+    """Tells if any listener is registered."""
+    return bool(_listeners)
+
+
+def emit(event: OperationEvent) -> None:
+    """Sends an event to the registered listeners.
+
+    A failing listener does not stop the other listeners, and its exception is logged instead of
+    being raised to the storage operation.
+
+    Args:
+        event (OperationEvent): The event.
+    """
+    for listener in _listeners:
+        try:
+            listener(event)
+        except Exception:
+            logger.exception("Instrumentation listener %r failed.", listener)
+
+
+class Operation:
+    """Measures a storage operation in a with block and emits its event at the end of the block.
+
+    The code in the block can set the items, bytes and consumed_capacity attributes. Use the
+    operation function to create instances.
+    """
+
+    recording = True
+    """False if the measurements are ignored, so the block can skip computing them."""
+
+    __slots__ = ("name", "attributes", "items", "bytes", "consumed_capacity", "_start", "_wall")
+
+    def __init__(self, name: str, attributes: Dict[str, Any]) -> None:
+        self.name = name
+        self.attributes = attributes
+        self.items: Optional[int] = None
+        self.bytes: Optional[int] = None
+        self.consumed_capacity: Optional[float] = None
+
+    def __enter__(self) -> "Operation":
+        self._wall = time.time()
+        self._start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback) -> None:
+        duration = time.perf_counter() - self._start
+        emit(OperationEvent(
+            operation=self.name,
+            start_time=self._wall,
+            duration=duration,
+            items=self.items,
+            bytes=self.bytes,
+            consumed_capacity=self.consumed_capacity,
+            error=exc_type.__name__ if exc_type is not None else None,
+            attributes=self.attributes,
+        ))
+
+
+class _DisabledOperation:
+    """The operation returned when no listener is registered, it records nothing."""
+
+    recording = False
+
+    __slots__ = ()
+
+    def __enter__(self) -> "_DisabledOperation":
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback) -> None:
+        pass
+
+    def __setattr__(self, name: str, value: Any) -> None:
+        pass
+
+
+_DISABLED_OPERATION = _DisabledOperation()
+
+
+def operation(name: str, **attributes: Any) -> Operation:
+    """Creates a context manager measuring a storage operation::
+
+        with instrumentation.operation("file.save", path=str(path)) as op:
+            op.items = write_articles(path)
+
+    Args:
+        name (str): The name of the operation.
+        **attributes: The attributes of the operation.
+
+    Returns:
+        Operation: The context manager. If no listener is registered, a shared instance that
+        ignores the measurements.
+    """
+    if not _listeners:
+        return _DISABLED_OPERATION  # type: ignore[return-value]
+    return Operation(name, attributes)
+
+
+class OperationStats:
+    """Aggregated statistics of the events of an operation."""
+
+    def __init__(self) -> None:
+        self.count = 0
+        self.errors = 0
+        self.total_duration = 0.0
+        self.max_duration = 0.0
+        self.items = 0
+        self.bytes = 0
+        self.consumed_capacity = 0.0
+
+    @property
+    def mean_duration(self) -> float:
+        """The mean duration of the operation in seconds."""
+        return self.total_duration / self.count if self.count else 0.0
+
+    def add(self, event: OperationEvent) -> None:
+        """Adds an event to the statistics.
+
+        Args:
+            event (OperationEvent): The event.
+        """
+        self.count += 1
+        if event.error is not None:
+            self.errors += 1
+        self.total_duration += event.duration
+        self.max_duration = max(self.max_duration, event.duration)
+        self.items += event.items or 0
+        self.bytes += event.bytes or 0
+        self.consumed_capacity += event.consumed_capacity or 0.0
+
+    def __repr__(self) -> str:
+        return (
+            f"<OperationStats count={self.count} errors={self.errors} "
+            f"mean_duration={self.mean_duration:.6f} items={self.items} bytes={self.bytes} "
+            f"consumed_capacity={self.consumed_capacity}>"
+        )
+
+
+class MetricsRecorder:
+    """A listener that aggregates the events by operation name.
+
+    For example the number of pages fetched by DynamoDB queries is the count of the
+    ``dynamodb.Query`` operation.
+    """
+
+    def __init__(self) -> None:
+        self.stats: Dict[str, OperationStats] = {}
+        self._lock = threading.Lock()
+
+    def __call__(self, event: OperationEvent) -> None:
+        with self._lock:
+            stats = self.stats.get(event.operation)
+            if stats is None:
+                stats = self.stats[event.operation] = OperationStats()
+            stats.add(event)
+
+    def reset(self) -> None:
+        """Clears the statistics."""
+        with self._lock:
+            self.stats = {}
+
+
+class OpenTelemetryListener:
+    """A listener that exports the events as OpenTelemetry spans and metrics.
+
+    Each event is recorded as a span with the timing of the operation, as a child of the span
+    that is current when the operation finishes. The durations are recorded in the
+    ``pyknowbase.operation.duration`` histogram, and the items, bytes and consumed capacity in
+    the ``pyknowbase.operation.items``, ``pyknowbase.operation.bytes`` and
+    ``pyknowbase.operation.consumed_capacity`` counters, all with the operation name as attribute.
+
+    Requires the opentelemetry-api package.
+
+    Args:
+        tracer (Optional[Any]): The OpenTelemetry tracer. If None, the tracer of the global
+            tracer provider is used. Defaults to None.
+        meter (Optional[Any]): The OpenTelemetry meter. If None, the meter of the global meter
+            provider is used. Defaults to None.
+    """
+
+    def __init__(self, tracer: Optional[Any] = None, meter: Optional[Any] = None) -> None:
+        try:
+            from opentelemetry import metrics, trace
+        except ImportError:
+            raise ValueError(
+                "Could not import opentelemetry python package. "
+                "Please install it with `pip install opentelemetry-api`."
+            )
+        self._error_status = trace.Status(trace.StatusCode.ERROR)
+        self.tracer = tracer or trace.get_tracer("pyknowbase")
+        meter = meter or metrics.get_meter("pyknowbase")
+        self.duration = meter.create_histogram(
+            "pyknowbase.operation.duration", unit="s",
+            description="The duration of the storage operations.",
+        )
+        self.items = meter.create_counter(
+            "pyknowbase.operation.items",
+            description="The number of articles or items read or written.",
+        )
+        self.bytes = meter.create_counter(
+            "pyknowbase.operation.bytes", unit="By",
+            description="The number of bytes read or written.",
+        )
+        self.consumed_capacity = meter.create_counter(
+            "pyknowbase.operation.consumed_capacity",
+            description="The consumed DynamoDB capacity units.",
+        )
+
+    def __call__(self, event: OperationEvent) -> None:
+        attributes = {
+            f"pyknowbase.{key}": value for key, value in event.attributes.items()
+            if isinstance(value, (str, bool, int, float))
+        }
+        start_ns = int(event.start_time * 1e9)
+        span = self.tracer.start_span(event.operation, start_time=start_ns, attributes=attributes)
+        for key, value in (
+            ("items", event.items),
+            ("bytes", event.bytes),
+            ("consumed_capacity", event.consumed_capacity),
+        ):
+            if value is not None:
+                span.set_attribute(f"pyknowbase.{key}", value)
+        if event.error is not None:
+            span.set_attribute("error.type", event.error)
+            span.set_status(self._error_status)
+        span.end(end_time=start_ns + int(event.duration * 1e9))
+
+        metric_attributes = { "pyknowbase.operation": event.operation }
+        self.duration.record(event.duration, metric_attributes)
+        if event.items:
+            self.items.add(event.items, metric_attributes)
+        if event.bytes:
+            self.bytes.add(event.bytes, metric_attributes)
+        if event.consumed_capacity:
+            self.consumed_capacity.add(event.consumed_capacity, metric_attributes)
@@ -1,22 +1,336 @@
-from typing import Dict, Any, Iterator, List, Optional
+from typing import (
+    Dict, Any, AsyncIterator, Iterator, List, Mapping, NamedTuple, Optional, Tuple, overload
+)
+import hashlib
+import itertools
+import json
 from abc import ABC, abstractmethod
 from collections.abc import Iterable
 
-from datetime import datetime, timezone
+from datetime import datetime, timedelta, timezone
 
 from pydantic import BaseModel, RootModel, Field
 
+def _utc_now() -> datetime:
+    return datetime.now(timezone.utc)
+
+
+def parse_datetime(value: Any) -> datetime:
+    """Parses an ISO 8601 timestamp as serialized by pydantic.
+
+    >>> parse_datetime("2024-01-01T12:00:00Z")
+    datetime.datetime(2024, 1, 1, 12, 0, tzinfo=datetime.timezone.utc)
+
+    Args:
+        value (Any): The timestamp string, or a datetime that is returned as is.
+
+    Raises:
+        ValueError: If the string is not a valid timestamp.
+
+    Returns:
+        datetime: The parsed timestamp.
+    """
+    if isinstance(value, datetime):
+        return value
+    if value.endswith("Z"):
+        # datetime.fromisoformat supports the Z suffix only since Python 3.11.
+        value = value[:-1] + "+00:00"
+    return datetime.fromisoformat(value)
+
+
+_set_attribute = object.__setattr__
+
+_ARTICLE_FIELDS_SET = frozenset(("id", "text", "metadata", "last_modified"))
+
+
 class Article(BaseModel):
     """Knowledge base article."""
     id: str
     text: str
-    metadata: Dict[str, Any] = {}
-    last_modified: datetime = Field(default_factory=lambda: datetime.now(timezone.utc))
+    metadata: Dict[str, Any] = Field(default_factory=dict)
+    last_modified: datetime = Field(default_factory=_utc_now)
+
+    @classmethod
+    def from_trusted(cls, data: Mapping[str, Any]) -> "Article":
+        """Creates an article from data that a knowledge base persisted itself, skipping the
+        validation.
+
+        Backends use this method to load their own items, for example the DynamoDB items
+        written from Article instances. The last_modified timestamp may be a datetime or an ISO
+        8601 string. External input should be validated with Article.model_validate instead.
+
+        Args:
+            data (Mapping[str, Any]): The fields of the article.
+
+        Returns:
+            Article: The article.
+        """
+        last_modified = data.get("last_modified")
+        try:
+            timestamp = parse_datetime(last_modified) if last_modified is not None else _utc_now()
+        except (AttributeError, ValueError):
+            return cls.model_validate(data)
+        # The same as model_construct with all fields set, without the overhead of the default
+        # handling of model_construct, that makes it slower than the validation.
+        article = cls.__new__(cls)
+        _set_attribute(article, "__dict__", {
+            "id": data["id"],
+            "text": data["text"],
+            "metadata": data.get("metadata") or {},
+            "last_modified": timestamp,
+        })
+        _set_attribute(article, "__pydantic_fields_set__", _ARTICLE_FIELDS_SET)
+        _set_attribute(article, "__pydantic_extra__", None)
+        _set_attribute(article, "__pydantic_private__", None)
+        return article
 
 
 Articles = RootModel[List[Article]]
 
 
+class ArticleHeader(BaseModel):
+    """The identifier, metadata and modification time of a knowledge base article, without its
+    text."""
+    id: str
+    metadata: Dict[str, Any] = Field(default_factory=dict)
+    last_modified: datetime = Field(default_factory=_utc_now)
+
+    @classmethod
+    def from_article(cls, article: Article) -> "ArticleHeader":
+        """Creates the header of an article."""
+        return cls.model_construct(
+            id=article.id, metadata=article.metadata, last_modified=article.last_modified
+        )
+
+
+ARTICLE_FIELDS = ("id", "text", "metadata", "last_modified")
+"""The names of the fields of the articles that can be requested with KnowledgeBase.get."""
+
+
+def check_fields(fields: Iterable[str]) -> Tuple[str, ...]:
+    """Validates the field names of a projection, and adds the id field if it is missing.
+
+    >>> check_fields(["metadata"])
+    ('id', 'metadata')
+
+    Args:
+        fields (Iterable[str]): The requested field names.
+
+    Raises:
+        ValueError: If a field name is not in ARTICLE_FIELDS.
+
+    Returns:
+        Tuple[str, ...]: The field names.
+    """
+    result = ["id"]
+    for field in fields:
+        if field not in ARTICLE_FIELDS:
+            raise ValueError(f"Unknown article field: {field}")
+        if field not in result:
+            result.append(field)
+    return tuple(result)
+
+EPOCH = datetime(1970, 1, 1, tzinfo=timezone.utc)
+
+
+def timestamp_micros(value: datetime) -> int:
+    """Converts a datetime to microseconds since the UNIX epoch. Naive datetimes are in UTC.
+
+    >>> timestamp_micros(datetime(1970, 1, 1, 0, 0, 1))
+    1000000
+
+    Args:
+        value (datetime): The datetime.
+
+    Returns:
+        int: The microseconds since the UNIX epoch.
+    """
+    if value.tzinfo is None:
+        value = value.replace(tzinfo=timezone.utc)
+    return (value - EPOCH) // timedelta(microseconds=1)
+
+
+def content_hash(article: Article) -> str:
+    """Computes the fingerprint of the content of an article.
+
+    The fingerprint is a hash of the text and the metadata of the article. It does not depend on
+    the identifier and the last_modified timestamp, so it detects both unchanged rewrites of an
+    article and different articles with the same content.
+
+    >>> a = Article(id="a", text="Hello", metadata={ "x": 1, "y": 2 })
+    >>> b = Article(id="b", text="Hello", metadata={ "y": 2, "x": 1 })
+    >>> content_hash(a) == content_hash(b)
+    True
+
+    Args:
+        article (Article): The article.
+
+    Returns:
+        str: The hexadecimal fingerprint.
+    """
+    digest = hashlib.blake2b(article.text.encode("utf-8"), digest_size=16)
+    digest.update(b"\0")
+    digest.update(json.dumps(
+        article.metadata, sort_keys=True, separators=(",", ":"), ensure_ascii=False, default=str
+    ).encode("utf-8"))
+    return digest.hexdigest()
+
+
+def unique_articles(
+    articles: Iterable[Article], duplicates: Optional[Dict[str, str]] = None
+) -> Iterator[Article]:
+    """Drops the articles having the same content as a previous article.
+
+    The articles are compared by their content_hash, so the input is processed as a stream, for
+    example during a bulk ingest::
+
+        duplicates: Dict[str, str] = {}
+        kb.put_articles(unique_articles(source, duplicates))
+        for duplicate_id, original_id in duplicates.items():
+            print(f"{duplicate_id} was skipped as a duplicate of {original_id}")
+
+    Args:
+        articles (Iterable[Article]): The articles.
+        duplicates (Optional[Dict[str, str]]): If specified, the identifiers of the dropped
+            articles are added to this dictionary, mapped to the identifier of the first article
+            with the same content. Defaults to None.
+
+    Returns:
+        Iterator[Article]: The articles with unique content.
+    """
+    seen: Dict[str, str] = {}
+    for article in articles:
+        original_id = seen.setdefault(content_hash(article), article.id)
+        if original_id == article.id:
+            yield article
+        elif duplicates is not None:
+            duplicates[article.id] = original_id
+
+
+def find_duplicates(articles: Iterable[Article]) -> List[List[str]]:
+    """Finds the groups of articles with the same content.
+
+    >>> find_duplicates([
+    ...     Article(id="a", text="x"), Article(id="b", text="y"), Article(id="c", text="x")
+    ... ])
+    [['a', 'c']]
+
+    Args:
+        articles (Iterable[Article]): The articles, for example a knowledge base.
+
+    Returns:
+        List[List[str]]: The identifiers of the articles in the groups of at least two articles
+        with the same content_hash.
+    """
+    groups: Dict[str, List[str]] = {}
+    for article in articles:
+        groups.setdefault(content_hash(article), []).append(article.id)
+    return [ids for ids in groups.values() if len(ids) > 1]
+
+
+ArticleFilter = Dict[str, Any]
+"""A filter of articles for the KnowledgeBase.query method.
+
+The keys of the filter are metadata keys, except for "last_modified" that refers to the
+last_modified attribute of the articles. The values are either the values the field should be
+equal to, or a dictionary of operators and operands. The supported operators are "eq", "in"
+(the operand is a list of the accepted values), and "gt", "gte", "lt", "lte". All conditions of
+the filter must be satisfied::
+
+    kb.query({
+        "language": "en",
+        "product": { "in": ["foo", "bar"] },
+        "last_modified": { "gte": datetime(2024, 1, 1, tzinfo=timezone.utc) },
+    })
+"""
+
+FILTER_OPERATORS = frozenset(("eq", "in", "gt", "gte", "lt", "lte"))
+
+
+def _filter_operators(condition: Any) -> Dict[str, Any]:
+    if isinstance(condition, dict) and condition and FILTER_OPERATORS.issuperset(condition):
+        return condition
+    return { "eq": condition }
+
+
+def _comparable(value: Any) -> Any:
+    if isinstance(value, datetime) and value.tzinfo is None:
+        return value.replace(tzinfo=timezone.utc)
+    return value
+
+
+def equality_values(condition: Any) -> Optional[List[Any]]:
+    """Returns the values accepted by a filter condition that uses only the eq or in operators.
+
+    Knowledge bases use this function to look up the candidate articles in an index.
+
+    Args:
+        condition (Any): A condition of an ArticleFilter.
+
+    Returns:
+        Optional[List[Any]]: The accepted values, or None if the condition uses other operators.
+    """
+    operators = _filter_operators(condition)
+    if len(operators) != 1:
+        return None
+    if "eq" in operators:
+        return [operators["eq"]]
+    if "in" in operators:
+        return list(operators["in"])
+    return None
+
+
+def article_matches(article: Article, filter: ArticleFilter) -> bool:
+    """Checks if an article satisfies all conditions of a filter.
+
+    Args:
+        article (Article): The article.
+        filter (ArticleFilter): The filter.
+
+    Returns:
+        bool: True if the article satisfies the filter.
+    """
+    for field, condition in filter.items():
+        if field == "last_modified":
+            value = article.last_modified
+        elif field in article.metadata:
+            value = article.metadata[field]
+        else:
+            return False
+        value = _comparable(value)
+        for operator, operand in _filter_operators(condition).items():
+            if operator == "in":
+                if value not in [_comparable(o) for o in operand]:
+                    return False
+                continue
+            operand = _comparable(operand)
+            try:
+                if not (
+                    (operator == "eq" and value == operand)
+                    or (operator == "gt" and value > operand)
+                    or (operator == "gte" and value >= operand)
+                    or (operator == "lt" and value < operand)
+                    or (operator == "lte" and value <= operand)
+                ):
+                    return False
+            except TypeError:
+                return False
+    return True
+
+
+class SyncResult(NamedTuple):
+    """The outcome of MutableKnowledgeBase.sync_from."""
+
+    added: int
+    """The number of articles copied that did not exist in the target knowledge base."""
+    updated: int
+    """The number of articles copied that were older in the target knowledge base."""
+    deleted: int
+    """The number of articles deleted from the target knowledge base."""
+    unchanged: int
+    """The number of articles that were up to date in the target knowledge base."""
+
+
 class KnowledgeBase(Iterable[Article]):
     """Abstract base class for knowledge bases.
 
@@ -26,12 +340,125 @@ class KnowledgeBase(Iterable[Article]):
     name: str
     metadata: Dict[str, Any] = {}
 
+    complete_versions: bool = True
+    """False if iter_versions may omit some articles, for example because it reads a sparse
+    index. Such knowledge bases can not be the source of sync_from with delete."""
+
     def __getitem__(self, __key: str) -> Article:
         raise NotImplementedError("KnowledgeBase.__getitem__ is an abstract method.")
 
     def __iter__(self) -> Iterator[Article]:
         raise NotImplementedError("KnowledgeBase.__iter__ is an abstract method.")
 
+    def get_many(self, ids: Iterable[str]) -> Dict[str, Article]:
+        """Retrieves several articles from the knowledge base.
+
+        Knowledge bases that support batched reads override this method to fetch the articles
+        with fewer round trips.
+
+        Args:
+            ids (Iterable[str]): The identifiers of the articles.
+
+        Returns:
+            Dict[str, Article]: The found articles keyed by their identifiers. Identifiers not
+            found in the knowledge base are omitted.
+        """
+        result = {}
+        for article_id in ids:
+            try:
+                result[article_id] = self[article_id]
+            except KeyError:
+                continue
+        return result
+
+    @overload
+    def get(self, article_id: str) -> Optional[Article]:
+        ...
+
+    @overload
+    def get(self, article_id: str, fields: Iterable[str]) -> Optional[Dict[str, Any]]:
+        ...
+
+    def get(self, article_id: str, fields: Optional[Iterable[str]] = None) -> Any:
+        """Retrieves an article, or some fields of an article, from the knowledge base.
+
+        Reading only some fields, for example the metadata without the text, lets the knowledge
+        bases skip reading and parsing the rest of the article::
+
+            header = kb.get("my_article", fields=["metadata", "last_modified"])
+
+        Args:
+            article_id (str): The identifier of the article.
+            fields (Optional[Iterable[str]]): The names of the requested fields, see
+                ARTICLE_FIELDS. If None, the whole article is returned. Defaults to None.
+
+        Raises:
+            ValueError: If a field name is unknown.
+
+        Returns:
+            Optional[Article]: The article if fields is None, otherwise a dictionary of the
+            requested fields, always including the id. None if the article does not exist.
+        """
+        if fields is None:
+            try:
+                return self[article_id]
+            except KeyError:
+                return None
+        return self._get_fields(article_id, check_fields(fields))
+
+    def _get_fields(self, article_id: str, fields: Tuple[str, ...]) -> Optional[Dict[str, Any]]:
+        article = self.get(article_id)
+        if article is None:
+            return None
+        return { field: getattr(article, field) for field in fields }
+
+    def iter_ids(self) -> Iterator[str]:
+        """Lists the identifiers of the articles.
+
+        This implementation iterates over the articles. Knowledge bases override this method to
+        list the identifiers without reading the articles.
+
+        Returns:
+            Iterator[str]: The article identifiers.
+        """
+        return (article.id for article in self)
+
+    def iter_headers(self) -> Iterator[ArticleHeader]:
+        """Lists the identifiers, the metadata and the modification times of the articles.
+
+        This implementation iterates over the articles. Knowledge bases override this method to
+        skip reading or parsing the texts of the articles.
+
+        Returns:
+            Iterator[ArticleHeader]: The article headers.
+        """
+        return (ArticleHeader.from_article(article) for article in self)
+
+    def iter_versions(self) -> Iterator[Tuple[str, datetime]]:
+        """Lists the identifiers and the last_modified timestamps of the articles.
+
+        This implementation uses iter_headers. Knowledge bases that can list the timestamps
+        cheaper override this method.
+
+        Returns:
+            Iterator[Tuple[str, datetime]]: The article identifiers and timestamps.
+        """
+        return ((header.id, header.last_modified) for header in self.iter_headers())
+
+    def query(self, filter: ArticleFilter) -> Iterator[Article]:
+        """Finds the articles satisfying a filter.
+
+        This implementation iterates over all articles. Knowledge bases with secondary indexes
+        override this method to read only the candidate articles.
+
+        Args:
+            filter (ArticleFilter): The filter.
+
+        Returns:
+            Iterator[Article]: The matching articles.
+        """
+        return (article for article in self if article_matches(article, filter))
+
     def __repr__(self) -> str:
         return f"<{self.__class__.__name__} name={self.name}, metadata={self.metadata}>"
 
@@ -62,11 +489,231 @@ class MutableKnowledgeBase(KnowledgeBase):
         """
         self[article.id] = article
 
+    def put_articles(self, articles: Iterable[Article]) -> None:
+        """Adds several articles to the knowledge base.
+
+        Knowledge bases that support bulk writes override this method to write the articles in
+        batches.
+
+        Args:
+            articles (Iterable[Article]): The articles to be added to the knowledge base.
+        """
+        for article in articles:
+            self.add(article)
+
+    def delete_articles(self, article_ids: Iterable[str]) -> None:
+        """Deletes several articles from the knowledge base.
+
+        Args:
+            article_ids (Iterable[str]): The identifiers of the articles to be deleted.
+        """
+        for article_id in article_ids:
+            del self[article_id]
+
     def copy_from(self, other: KnowledgeBase) -> None:
         """Copies all articles from another knowledge base to this one.
 
+        The articles are written with the put_articles method, so knowledge bases supporting
+        bulk writes will use them.
+
         Args:
             other (KnowledgeBase): The other knowledge base.
         """
-        for article in other:
-            self.add(article)
+        self.put_articles(other)
+
+    def sync_from(
+        self, other: KnowledgeBase, delete: bool = True, batch_size: int = 100
+    ) -> SyncResult:
+        """Incrementally updates this knowledge base to mirror another one.
+
+        The articles are compared by their last_modified timestamps listed with iter_versions,
+        and only the articles that are missing here or are newer in the other knowledge base are
+        fetched with get_many and written with put_articles. Articles that do not exist in the
+        other knowledge base are deleted.
+
+        Args:
+            other (KnowledgeBase): The source knowledge base.
+            delete (bool): Set to False to keep the articles missing from the source.
+                Defaults to True.
+            batch_size (int): The number of articles fetched at once. Defaults to 100.
+
+        Raises:
+            ValueError: If delete is True, but the versions listed by the source knowledge base
+                are not complete, see KnowledgeBase.complete_versions.
+
+        Returns:
+            SyncResult: The number of added, updated, deleted and unchanged articles.
+        """
+        if delete and not other.complete_versions:
+            raise ValueError(
+                f"The versions listed by knowledge base {other.name} may be incomplete, "
+                "sync_from can not delete the articles missing from it. Use delete=False."
+            )
+        local = { article_id: timestamp_micros(last_modified)
+                  for article_id, last_modified in self.iter_versions() }
+        added: List[str] = []
+        updated: List[str] = []
+        unchanged = 0
+        seen = set()
+        for article_id, last_modified in other.iter_versions():
+            seen.add(article_id)
+            local_timestamp = local.get(article_id)
+            if local_timestamp is None:
+                added.append(article_id)
+            elif timestamp_micros(last_modified) > local_timestamp:
+                updated.append(article_id)
+            else:
+                unchanged += 1
+        changed = iter(added + updated)
+        while True:
+            batch = list(itertools.islice(changed, batch_size))
+            if not batch:
+                break
+            self.put_articles(other.get_many(batch).values())
+        deleted = [article_id for article_id in local if article_id not in seen] if delete else []
+        if deleted:
+            self.delete_articles(deleted)
+        return SyncResult(
+            added=len(added), updated=len(updated), deleted=len(deleted), unchanged=unchanged
+        )
+
+
+class WrappedKnowledgeBase(KnowledgeBase):
+    """Base class for knowledge bases that serve the articles of another knowledge base.
+
+    All reads are forwarded to the wrapped knowledge base. Subclasses, for example caches and
+    search indexes, override only the methods whose behavior they change.
+
+    Args:
+        knowledge_base (KnowledgeBase): The wrapped knowledge base.
+    """
+
+    knowledge_base: KnowledgeBase
+
+    def __init__(self, knowledge_base: KnowledgeBase) -> None:
+        self.knowledge_base = knowledge_base
+        self.name = knowledge_base.name
+        self.metadata = knowledge_base.metadata
+
+    def __iter__(self) -> Iterator[Article]:
+        return iter(self.knowledge_base)
+
+    def __getitem__(self, __key: str) -> Article:
+        return self.knowledge_base[__key]
+
+    def get_many(self, ids: Iterable[str]) -> Dict[str, Article]:
+        return self.knowledge_base.get_many(ids)
+
+    def _get_fields(self, article_id: str, fields: Tuple[str, ...]) -> Optional[Dict[str, Any]]:
+        return self.knowledge_base.get(article_id, fields=fields)
+
+    def iter_ids(self) -> Iterator[str]:
+        return self.knowledge_base.iter_ids()
+
+    def iter_headers(self) -> Iterator[ArticleHeader]:
+        return self.knowledge_base.iter_headers()
+
+    @property
+    def complete_versions(self) -> bool:  # type: ignore[override]
+        return self.knowledge_base.complete_versions
+
+    def iter_versions(self) -> Iterator[Tuple[str, datetime]]:
+        return self.knowledge_base.iter_versions()
+
+    def query(self, filter: ArticleFilter) -> Iterator[Article]:
+        return self.knowledge_base.query(filter)
+
+
+class AsyncKnowledgeBase(ABC):
+    """Abstract base class for knowledge bases with an asyncio interface.
+
+    An async knowledge base should implement the async iterator protocol, and provide access to
+    the articles based on their identifier via the get method.
+    """
+    name: str
+    metadata: Dict[str, Any] = {}
+
+    @abstractmethod
+    async def get(self, article_id: str) -> Optional[Article]:
+        """Retrieves an article from the knowledge base.
+
+        Args:
+            article_id (str): The identifier of the article.
+
+        Returns:
+            Optional[Article]: The article, or None if it does not exist.
+        """
+        ...
+
+    async def get_many(self, ids: Iterable[str]) -> Dict[str, Article]:
+        """Retrieves several articles from the knowledge base.
+
+        Args:
+            ids (Iterable[str]): The identifiers of the articles.
+
+        Returns:
+            Dict[str, Article]: The found articles keyed by their identifiers.
+        """
+        result = {}
+        for article_id in ids:
+            article = await self.get(article_id)
+            if article is not None:
+                result[article_id] = article
+        return result
+
+    @abstractmethod
+    def __aiter__(self) -> AsyncIterator[Article]:
+        ...
+
+    def __repr__(self) -> str:
+        return f"<{self.__class__.__name__} name={self.name}, metadata={self.metadata}>"
+
+
+class AsyncMutableKnowledgeBase(AsyncKnowledgeBase):
+    """Abstract base class for mutable knowledge bases with an asyncio interface."""
+
+    @abstractmethod
+    async def put(self, article: Article) -> None:
+        """Adds or overwrites an article in the knowledge base.
+
+        Args:
+            article (Article): The article.
+        """
+        ...
+
+    @abstractmethod
+    async def delete(self, article_id: str) -> None:
+        """Deletes an article from the knowledge base.
+
+        Args:
+            article_id (str): The identifier of the article.
+        """
+        ...
+
+    async def put_articles(self, articles: Iterable[Article]) -> None:
+        """Adds several articles to the knowledge base.
+
+        Args:
+            articles (Iterable[Article]): The articles to be added to the knowledge base.
+        """
+        for article in articles:
+            await self.put(article)
+
+    async def copy_from(self, other: AsyncKnowledgeBase, batch_size: int = 100) -> None:
+        """Copies all articles from another async knowledge base to this one.
+
+        The articles are written in batches with the put_articles method.
+
+        Args:
+            other (AsyncKnowledgeBase): The other knowledge base.
+            batch_size (int): The number of articles written with a single put_articles call.
+                Defaults to 100.
+        """
+        batch: List[Article] = []
+        async for article in other:
+            batch.append(article)
+            if len(batch) >= batch_size:
+                await self.put_articles(batch)
+                batch = []
+        if batch:
+            await self.put_articles(batch)
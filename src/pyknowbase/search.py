@@ -0,0 +1,429 @@
+"""Full-text search over knowledge bases with an inverted index and BM25 ranking."""
+
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Optional, Set, Tuple
+from array import array
+from collections import Counter
+import heapq
+import json
+import math
+import os
+import re
+import struct
+import sys
+from pathlib import Path
+
+from .model import Article, KnowledgeBase, MutableKnowledgeBase, WrappedKnowledgeBase
+from .storage import StrPath
+
+MAGIC = b"PKBS"
+VERSION = 1
+
+HEADER = struct.Struct("<4sHQ")
+
+_TOKEN_PATTERN = re.compile(r"\w+", re.UNICODE)
+
+
+def tokenize(text: str) -> List[str]:
+    """Splits a text into lowercase word tokens.
+
+    >>> tokenize("Hello, World! Hello again.")
+    ['hello', 'world', 'hello', 'again']
+
+    Args:
+        text (str): The text.
+
+    Returns:
+        List[str]: The tokens.
+    """
+    return _TOKEN_PATTERN.findall(text.lower())
+
+
+class _Postings:
+    """The documents containing a term and the term frequencies, in two parallel arrays."""
+
+    __slots__ = ("docs", "freqs")
+
+    def __init__(self, docs: Optional[array] = None, freqs: Optional[array] = None) -> None:
+        self.docs = docs if docs is not None else array("I")
+        self.freqs = freqs if freqs is not None else array("I")
+
+
+class InvertedIndex:
+    """An inverted index of article texts ranking the matches with Okapi BM25.
+
+    The documents are numbered internally, and for each term the numbers of the documents
+    containing it and the term frequencies are stored in compact arrays. Removed documents are
+    only marked as deleted, and their postings are purged when they make up a large part of the
+    index.
+
+    Example::
+
+        index = InvertedIndex.from_knowledge_base(kb)
+        for article_id, score in index.search("reset password", k=5):
+            print(kb[article_id].text, score)
+
+    Args:
+        tokenizer (Callable[[str], List[str]]): Splits the texts and the queries into terms.
+            Defaults to tokenize.
+        k1 (float): The term frequency saturation parameter of BM25. Defaults to 1.2.
+        b (float): The document length normalization parameter of BM25. Defaults to 0.75.
+    """
+
+    purge_ratio: float = 0.25
+    """The ratio of deleted documents triggering the purge of the postings."""
+
+    def __init__(self,
+        tokenizer: Callable[[str], List[str]] = tokenize,
+        k1: float = 1.2,
+        b: float = 0.75,
+    ) -> None:
+        self.tokenizer = tokenizer
+        self.k1 = k1
+        self.b = b
+        self._postings: Dict[str, _Postings] = {}
+        self._doc_ids: List[Optional[str]] = []
+        self._doc_numbers: Dict[str, int] = {}
+        self._lengths = array("I")
+        self._total_length = 0
+        self._deleted: Set[int] = set()
+
+    @classmethod
+    def from_knowledge_base(cls, knowledge_base: KnowledgeBase, **kwargs) -> "InvertedIndex":
+        """Builds an index of all articles of a knowledge base.
+
+        Args:
+            knowledge_base (KnowledgeBase): The knowledge base.
+            **kwargs: The arguments of the InvertedIndex constructor.
+
+        Returns:
+            InvertedIndex: The new index.
+        """
+        index = cls(**kwargs)
+        for article in knowledge_base:
+            index.add(article.id, article.text)
+        return index
+
+    def __len__(self) -> int:
+        return len(self._doc_numbers)
+
+    def __contains__(self, article_id: object) -> bool:
+        return article_id in self._doc_numbers
+
+    def add(self, article_id: str, text: str) -> None:
+        """Adds or replaces an article in the index.
+
+        Args:
+            article_id (str): The identifier of the article.
+            text (str): The text of the article.
+        """
+        if article_id in self._doc_numbers:
+            self.remove(article_id)
+        doc = len(self._doc_ids)
+        tokens = self.tokenizer(text)
+        for term, freq in Counter(tokens).items():
+            postings = self._postings.get(term)
+            if postings is None:
+                postings = self._postings[term] = _Postings()
+            postings.docs.append(doc)
+            postings.freqs.append(freq)
+        self._doc_ids.append(article_id)
+        self._doc_numbers[article_id] = doc
+        self._lengths.append(len(tokens))
+        self._total_length += len(tokens)
+
+    def remove(self, article_id: str) -> None:
+        """Removes an article from the index. Unknown identifiers are ignored.
+
+        Args:
+            article_id (str): The identifier of the article.
+        """
+        doc = self._doc_numbers.pop(article_id, None)
+        if doc is None:
+            return
+        self._doc_ids[doc] = None
+        self._total_length -= self._lengths[doc]
+        self._deleted.add(doc)
+        if len(self._deleted) > self.purge_ratio * len(self._doc_ids):
+            self.purge()
+
+    def purge(self) -> None:
+        """Removes the deleted documents from the postings and renumbers the documents."""
+        if not self._deleted:
+            return
+        renumber = array("I", [0]) * len(self._doc_ids)
+        doc_ids: List[Optional[str]] = []
+        doc_numbers: Dict[str, int] = {}
+        lengths = array("I")
+        for doc, article_id in enumerate(self._doc_ids):
+            if article_id is not None:
+                renumber[doc] = doc_numbers[article_id] = len(doc_ids)
+                doc_ids.append(article_id)
+                lengths.append(self._lengths[doc])
+        deleted = self._deleted
+        for term in list(self._postings):
+            old = self._postings[term]
+            new = _Postings()
+            for doc, freq in zip(old.docs, old.freqs):
+                if doc not in deleted:
+                    new.docs.append(renumber[doc])
+                    new.freqs.append(freq)
+            if new.docs:
+                self._postings[term] = new
+            else:
+                del self._postings[term]
+        self._doc_ids = doc_ids
+        self._doc_numbers = doc_numbers
+        self._lengths = lengths
+        self._deleted = set()
+
+    def search(self, query: str, k: int = 10) -> List[Tuple[str, float]]:
+        """Finds the articles best matching a query.
+
+        Args:
+            query (str): The query.
+            k (int): The maximum number of results. Defaults to 10.
+
+        Returns:
+            List[Tuple[str, float]]: The identifiers of the matching articles and their BM25
+            scores, in decreasing order of the scores.
+        """
+        num_docs = len(self._doc_numbers)
+        if not num_docs or k <= 0:
+            return []
+        avg_length = self._total_length / num_docs or 1.0
+        k1, b = self.k1, self.b
+        lengths = self._lengths
+        deleted = self._deleted
+        scores: Dict[int, float] = {}
+        for term in set(self.tokenizer(query)):
+            postings = self._postings.get(term)
+            if postings is None:
+                continue
+            if deleted:
+                doc_freq = sum(1 for doc in postings.docs if doc not in deleted)
+            else:
+                doc_freq = len(postings.docs)
+            if not doc_freq:
+                continue
+            idf = math.log(1.0 + (num_docs - doc_freq + 0.5) / (doc_freq + 0.5))
+            for doc, freq in zip(postings.docs, postings.freqs):
+                if doc in deleted:
+                    continue
+                norm = k1 * (1.0 - b + b * lengths[doc] / avg_length)
+                scores[doc] = scores.get(doc, 0.0) + idf * freq * (k1 + 1.0) / (freq + norm)
+        top = heapq.nlargest(k, scores.items(), key=lambda item: item[1])
+        return [(self._doc_ids[doc], score) for doc, score in top]  # type: ignore[misc]
+
+    def save(self, path: StrPath, source: Optional[Dict[str, Any]] = None) -> None:
+        """Saves the index into a file atomically.
+
+        The file contains a JSON header with the article identifiers and the terms, followed by
+        the raw little-endian arrays of the document lengths and the postings.
+
+        Args:
+            path (StrPath): The path of the file.
+            source (Optional[Dict[str, Any]]): Information about the state of the indexed
+                knowledge base, used to detect a stale index file. Defaults to None.
+        """
+        self.purge()
+        terms = list(self._postings)
+        header = json.dumps({
+            "k1": self.k1,
+            "b": self.b,
+            "source": source,
+            "ids": self._doc_ids,
+            "terms": terms,
+            "counts": [len(self._postings[term].docs) for term in terms],
+        }).encode("utf-8")
+        path = Path(path)
+        tmp_path = path.with_name(path.name + ".tmp")
+        with open(tmp_path, "wb") as f:
+            f.write(HEADER.pack(MAGIC, VERSION, len(header)))
+            f.write(header)
+            _write_array(f, self._lengths)
+            for term in terms:
+                _write_array(f, self._postings[term].docs)
+            for term in terms:
+                _write_array(f, self._postings[term].freqs)
+        os.replace(tmp_path, path)
+
+    @classmethod
+    def load(cls,
+        path: StrPath,
+        source: Optional[Dict[str, Any]] = None,
+        tokenizer: Callable[[str], List[str]] = tokenize,
+    ) -> Optional["InvertedIndex"]:
+        """Loads an index saved with the save method.
+
+        Args:
+            path (StrPath): The path of the file.
+            source (Optional[Dict[str, Any]]): If not None, the index is loaded only if it was
+                saved with the same source information. Defaults to None.
+            tokenizer (Callable[[str], List[str]]): The tokenizer used to build the index.
+                Defaults to tokenize.
+
+        Raises:
+            ValueError: If the file is not a valid index file.
+
+        Returns:
+            Optional[InvertedIndex]: The index, or None if it is stale.
+        """
+        data = Path(path).read_bytes()
+        magic, version, header_len = HEADER.unpack_from(data)
+        if magic != MAGIC:
+            raise ValueError("Not a search index file.")
+        if version != VERSION:
+            raise ValueError(f"Unsupported search index version: {version}")
+        pos = HEADER.size
+        header = json.loads(data[pos:pos + header_len])
+        if source is not None and header["source"] != source:
+            return None
+        pos += header_len
+        index = cls(tokenizer=tokenizer, k1=header["k1"], b=header["b"])
+        index._doc_ids = header["ids"]
+        index._doc_numbers = { article_id: doc for doc, article_id in enumerate(index._doc_ids) }
+        index._lengths, pos = _read_array(data, pos, len(index._doc_ids))
+        index._total_length = sum(index._lengths)
+        all_docs = []
+        for count in header["counts"]:
+            docs, pos = _read_array(data, pos, count)
+            all_docs.append(docs)
+        for term, docs, count in zip(header["terms"], all_docs, header["counts"]):
+            freqs, pos = _read_array(data, pos, count)
+            index._postings[term] = _Postings(docs, freqs)
+        return index
+
+
+def _write_array(f, values: array) -> None:
+    if sys.byteorder == "big":
+        values = array(values.typecode, values)
+        values.byteswap()
+    f.write(values.tobytes())
+
+
+def _read_array(data: bytes, pos: int, count: int) -> Tuple[array, int]:
+    values = array("I")
+    end = pos + count * values.itemsize
+    values.frombytes(data[pos:end])
+    if sys.byteorder == "big":
+        values.byteswap()
+    return values, end
+
+
+class SearchableKnowledgeBase(WrappedKnowledgeBase):
+    """A knowledge base with full-text search.
+
+    The articles are served by the wrapped knowledge base, and an inverted index of their texts
+    is built when the SearchableKnowledgeBase is created.
+
+    The index can be persisted with the save_index method. When the wrapped knowledge base is a
+    file knowledge base, the index is stored next to its file (with an additional ``.search``
+    suffix) by default, and it is reused at the next start if the file has not changed since.
+
+    Example::
+
+        kb = SearchableKnowledgeBase(JsonKnowledgeBase("kb.json"))
+        kb.save_index()
+        results = kb.search("reset password", k=5)
+
+    Args:
+        knowledge_base (KnowledgeBase): The wrapped knowledge base.
+        index_path (Optional[StrPath]): The path of the persisted index. Defaults to None.
+        **kwargs: The arguments of the InvertedIndex constructor.
+    """
+
+    index: InvertedIndex
+
+    def __init__(self,
+        knowledge_base: KnowledgeBase,
+        index_path: Optional[StrPath] = None,
+        **kwargs,
+    ) -> None:
+        super().__init__(knowledge_base)
+        filepath: Optional[Path] = getattr(knowledge_base, "filepath", None)
+        if index_path is None and filepath is not None:
+            index_path = filepath.with_name(filepath.name + ".search")
+        self.index_path = Path(index_path) if index_path is not None else None
+        index = None
+        if self.index_path is not None and self.index_path.is_file():
+            index = InvertedIndex.load(
+                self.index_path,
+                source=self._source_state(),
+                tokenizer=kwargs.get("tokenizer", tokenize),
+            )
+        if index is not None:
+            # Explicit k1 and b arguments override the persisted ranking parameters.
+            index.k1 = kwargs.get("k1", index.k1)
+            index.b = kwargs.get("b", index.b)
+        else:
+            index = InvertedIndex.from_knowledge_base(knowledge_base, **kwargs)
+        self.index = index
+
+    def search(self, query: str, k: int = 10) -> List[Tuple[str, float]]:
+        """Finds the articles best matching a query.
+
+        Args:
+            query (str): The query.
+            k (int): The maximum number of results. Defaults to 10.
+
+        Returns:
+            List[Tuple[str, float]]: The identifiers of the matching articles and their BM25
+            scores, in decreasing order of the scores.
+        """
+        return self.index.search(query, k)
+
+    def save_index(self) -> None:
+        """Saves the index to index_path.
+
+        Raises:
+            ValueError: If index_path is not set.
+        """
+        if self.index_path is None:
+            raise ValueError("The index_path of the knowledge base is not set.")
+        self.index.save(self.index_path, source=self._source_state())
+
+    def _source_state(self) -> Optional[Dict[str, Any]]:
+        filepath: Optional[Path] = getattr(self.knowledge_base, "filepath", None)
+        if filepath is None:
+            return None
+        state: Dict[str, Any] = {}
+        paths = [filepath, filepath.with_name(filepath.name + ".log")]
+        for path in paths:
+            try:
+                stat = path.stat()
+            except OSError:
+                continue
+            state[path.name] = [stat.st_size, stat.st_mtime_ns]
+        return state
+
+
+class MutableSearchableKnowledgeBase(SearchableKnowledgeBase, MutableKnowledgeBase):
+    """A mutable knowledge base with full-text search.
+
+    Writes are forwarded to the wrapped knowledge base and update the index incrementally.
+    Saving a file knowledge base changes its file, so save_index should be called after save.
+    """
+
+    knowledge_base: MutableKnowledgeBase
+
+    def __setitem__(self, __key: str, __value: Article) -> None:
+        self.knowledge_base[__key] = __value
+        self.index.add(__key, __value.text)
+
+    def __delitem__(self, __key: str) -> None:
+        del self.knowledge_base[__key]
+        self.index.remove(__key)
+
+    def put_articles(self, articles: Iterable[Article]) -> None:
+        def indexing() -> Iterator[Article]:
+            for article in articles:
+                self.index.add(article.id, article.text)
+                yield article
+        self.knowledge_base.put_articles(indexing())
+
+    def delete_articles(self, article_ids: Iterable[str]) -> None:
+        def unindexing() -> Iterator[str]:
+            for article_id in article_ids:
+                self.index.remove(article_id)
+                yield article_id
+        self.knowledge_base.delete_articles(unindexing())
@@ -0,0 +1,416 @@
+"""A compact binary file format for knowledge bases that is read through memory mapping.
+
+The file starts with a fixed size header, followed by the article records, and an index of
+the records sorted by article identifier. All integers are little-endian.
+
+Header::
+
+    magic (4 bytes, b"PKBB") | version (uint16) | flags (uint16) |
+    count (uint64) | index offset (uint64)
+
+Article record::
+
+    last_modified (int64, microseconds since the UNIX epoch in UTC) |
+    metadata length (uint32) | text length (uint32) | id length (uint16) |
+    id (UTF-8) | metadata (JSON, UTF-8) | text (UTF-8)
+
+Index::
+
+    count * record offset (uint64), sorted by the UTF-8 encoded identifiers of the records
+
+If the FLAG_COMPRESSED bit of the flags is set, the text of each record starts with a codec byte:
+0 if the text is stored as is, otherwise the identifier of the compression codec of the text
+(see the compression module). The text length includes the codec byte.
+
+Opening a file reads only the header. Articles are looked up with a binary search in the index,
+and they are decoded from the memory-mapped file only when they are accessed, so several
+processes opening the same file share the page cache of the operating system.
+"""
+
+from typing import Any, Dict, Iterable, Iterator, MutableMapping, Optional, Set, Tuple
+from datetime import timedelta
+import json
+import mmap
+import os
+import struct
+from pathlib import Path
+
+from . import StrPath
+from .compression import TextCompression, get_codec_by_id
+from .file import FileArticleIndex, FileKnowledgeBase, MutableFileKnowledgeBase
+from ..model import EPOCH, KnowledgeBase, Article, ArticleHeader, timestamp_micros
+
+MAGIC = b"PKBB"
+VERSION = 1
+
+HEADER = struct.Struct("<4sHHQQ")
+RECORD = struct.Struct("<qIIH")
+OFFSET = struct.Struct("<Q")
+
+FLAG_COMPRESSED = 0x0001
+"""The header flag of the files with a codec byte before the text of each record."""
+
+
+def write_binary(
+    path: StrPath, articles: Iterable[Article], compression: Optional[TextCompression] = None
+) -> int:
+    """Writes articles into a binary knowledge base file.
+
+    The articles are written one at a time, only their identifiers and offsets are kept in the
+    memory until the index is written.
+
+    Args:
+        path (StrPath): The path of the file.
+        articles (Iterable[Article]): The articles.
+        compression (Optional[TextCompression]): The compression of the texts larger than its
+            threshold. If None, the texts are not compressed. Defaults to None.
+
+    Raises:
+        ValueError: If several articles have the same identifier, or the metadata of an article
+            is not JSON serializable.
+
+    Returns:
+        int: The number of written articles.
+    """
+    offsets: Dict[bytes, int] = {}
+    flags = FLAG_COMPRESSED if compression is not None else 0
+    with open(path, "wb") as f:
+        f.write(HEADER.pack(MAGIC, VERSION, flags, 0, 0))
+        offset = HEADER.size
+        for article in articles:
+            id_bytes = article.id.encode("utf-8")
+            if id_bytes in offsets:
+                raise ValueError(f"Duplicate article id: {article.id}")
+            meta_bytes = _encode_metadata(article) if article.metadata else b""
+            if compression is None:
+                text_bytes = article.text.encode("utf-8")
+            else:
+                compressed = compression.compress(article.text)
+                if compressed is None:
+                    text_bytes = b"\0" + article.text.encode("utf-8")
+                else:
+                    text_bytes = bytes((compression.codec.id,)) + compressed
+            record = RECORD.pack(
+                timestamp_micros(article.last_modified),
+                len(meta_bytes),
+                len(text_bytes),
+                len(id_bytes),
+            )
+            f.write(record)
+            f.write(id_bytes)
+            f.write(meta_bytes)
+            f.write(text_bytes)
+            offsets[id_bytes] = offset
+            offset += RECORD.size + len(id_bytes) + len(meta_bytes) + len(text_bytes)
+        index_offset = offset
+        for id_bytes in sorted(offsets):
+            f.write(OFFSET.pack(offsets[id_bytes]))
+        f.seek(0)
+        f.write(HEADER.pack(MAGIC, VERSION, flags, len(offsets), index_offset))
+    return len(offsets)
+
+
+def _encode_metadata(article: Article) -> bytes:
+    try:
+        return json.dumps(article.metadata, separators=(",", ":")).encode("utf-8")
+    except (TypeError, ValueError) as error:
+        raise ValueError(
+            f"The metadata of article {article.id} is not JSON serializable: {error}"
+        ) from error
+
+
+class BinaryArticleIndex(FileArticleIndex):
+    """A mapping of article identifiers to articles stored in a memory-mapped binary file.
+
+    Articles added to or deleted from the mapping are tracked in the memory, the file is never
+    modified. The records of the file that were deleted or overwritten are said to be shadowed.
+
+    Args:
+        buffer (bytes-like): The content of the binary file, usually memory-mapped.
+    """
+
+    def __init__(self, buffer) -> None:
+        self.buffer = buffer
+        magic, version, self.flags, self.count, self.index_offset = HEADER.unpack_from(buffer)
+        if magic != MAGIC:
+            raise ValueError("Not a binary knowledge base file.")
+        if version != VERSION:
+            raise ValueError(f"Unsupported binary knowledge base version: {version}")
+        self._added: Dict[str, Article] = {}
+        self._shadowed: Set[str] = set()
+
+    def _record_id(self, offset: int) -> bytes:
+        id_len = RECORD.unpack_from(self.buffer, offset)[3]
+        start = offset + RECORD.size
+        return bytes(self.buffer[start:start + id_len])
+
+    def find(self, article_id: str) -> Optional[int]:
+        """Finds the offset of the record of an article in the file with a binary search.
+
+        Args:
+            article_id (str): The identifier of the article.
+
+        Returns:
+            Optional[int]: The offset of the record, or None if it is not in the file.
+        """
+        key = article_id.encode("utf-8")
+        low, high = 0, self.count
+        while low < high:
+            middle = (low + high) // 2
+            offset = OFFSET.unpack_from(self.buffer, self.index_offset + middle * OFFSET.size)[0]
+            record_id = self._record_id(offset)
+            if record_id < key:
+                low = middle + 1
+            elif record_id > key:
+                high = middle
+            else:
+                return offset
+        return None
+
+    def decode(self, offset: int) -> Tuple[Article, int]:
+        """Decodes the record at offset.
+
+        Args:
+            offset (int): The offset of the record.
+
+        Returns:
+            Tuple[Article, int]: The article, and the offset of the next record.
+        """
+        timestamp, meta_len, text_len, id_len = RECORD.unpack_from(self.buffer, offset)
+        pos = offset + RECORD.size
+        article_id = str(self.buffer[pos:pos + id_len], "utf-8")
+        pos += id_len
+        metadata: Dict[str, Any] = json.loads(self.buffer[pos:pos + meta_len]) if meta_len else {}
+        pos += meta_len
+        text = self._decode_text(pos, text_len)
+        pos += text_len
+        article = Article.from_trusted({
+            "id": article_id,
+            "text": text,
+            "metadata": metadata,
+            "last_modified": EPOCH + timedelta(microseconds=timestamp),
+        })
+        return article, pos
+
+    def _decode_text(self, pos: int, text_len: int) -> str:
+        if not self.flags & FLAG_COMPRESSED:
+            return str(self.buffer[pos:pos + text_len], "utf-8")
+        codec_id = self.buffer[pos]
+        if codec_id == 0:
+            return str(self.buffer[pos + 1:pos + text_len], "utf-8")
+        data = get_codec_by_id(codec_id).decompress(self.buffer[pos + 1:pos + text_len])
+        return data.decode("utf-8")
+
+    def decode_header(self, offset: int) -> Tuple[ArticleHeader, int]:
+        """Decodes the record at offset without decoding the text of the article.
+
+        Args:
+            offset (int): The offset of the record.
+
+        Returns:
+            Tuple[ArticleHeader, int]: The header of the article, and the offset of the next
+            record.
+        """
+        timestamp, meta_len, text_len, id_len = RECORD.unpack_from(self.buffer, offset)
+        pos = offset + RECORD.size
+        article_id = str(self.buffer[pos:pos + id_len], "utf-8")
+        pos += id_len
+        metadata: Dict[str, Any] = json.loads(self.buffer[pos:pos + meta_len]) if meta_len else {}
+        header = ArticleHeader(
+            id=article_id,
+            metadata=metadata,
+            last_modified=EPOCH + timedelta(microseconds=timestamp),
+        )
+        return header, pos + meta_len + text_len
+
+    def get_header(self, key: str) -> ArticleHeader:
+        if key in self._added:
+            return ArticleHeader.from_article(self._added[key])
+        if key not in self._shadowed:
+            offset = self.find(key)
+            if offset is not None:
+                return self.decode_header(offset)[0]
+        raise KeyError(key)
+
+    def iter_headers(self) -> Iterator[ArticleHeader]:
+        offset = HEADER.size
+        while offset < self.index_offset:
+            header, offset = self.decode_header(offset)
+            if header.id not in self._shadowed:
+                yield header
+        for article in self._added.values():
+            yield ArticleHeader.from_article(article)
+
+    def iter_records(self) -> Iterator[Tuple[str, int]]:
+        """Iterates over the records of the file in file order.
+
+        Returns:
+            Iterator[Tuple[str, int]]: The article identifiers and the offsets of the records.
+        """
+        offset = HEADER.size
+        while offset < self.index_offset:
+            _, meta_len, text_len, id_len = RECORD.unpack_from(self.buffer, offset)
+            start = offset + RECORD.size
+            yield str(self.buffer[start:start + id_len], "utf-8"), offset
+            offset = start + id_len + meta_len + text_len
+
+    def __getitem__(self, __key: str) -> Article:
+        if __key in self._added:
+            return self._added[__key]
+        if __key not in self._shadowed:
+            offset = self.find(__key)
+            if offset is not None:
+                return self.decode(offset)[0]
+        raise KeyError(__key)
+
+    def __contains__(self, __key: object) -> bool:
+        if not isinstance(__key, str):
+            return False
+        if __key in self._added:
+            return True
+        return __key not in self._shadowed and self.find(__key) is not None
+
+    def __setitem__(self, __key: str, __value: Article) -> None:
+        if __key not in self._shadowed and self.find(__key) is not None:
+            self._shadowed.add(__key)
+        self._added[__key] = __value
+
+    def __delitem__(self, __key: str) -> None:
+        if __key in self._added:
+            del self._added[__key]
+        elif __key not in self._shadowed and self.find(__key) is not None:
+            self._shadowed.add(__key)
+        else:
+            raise KeyError(__key)
+
+    def __iter__(self) -> Iterator[str]:
+        for article_id, _ in self.iter_records():
+            if article_id not in self._shadowed:
+                yield article_id
+        yield from self._added
+
+    def __len__(self) -> int:
+        return self.count - len(self._shadowed) + len(self._added)
+
+    def values_in_file_order(self) -> Iterator[Article]:
+        """Decodes the articles sequentially, which is faster than looking them up one by one."""
+        offset = HEADER.size
+        while offset < self.index_offset:
+            article, offset = self.decode(offset)
+            if article.id not in self._shadowed:
+                yield article
+        yield from self._added.values()
+
+
+class BinaryKnowledgeBase(FileKnowledgeBase):
+    """A knowledge base stored in the compact binary file format of this module.
+
+    Opening the knowledge base only memory-maps the file and reads its header, the articles are
+    decoded when they are accessed. To convert another knowledge base, for example a JSON or YAML
+    file knowledge base, to the binary format use from_knowledge_base. To convert a binary
+    knowledge base to another format, use the copy_from method of the target knowledge base::
+
+        binary_kb = BinaryKnowledgeBase.from_knowledge_base(JsonKnowledgeBase("kb.json"), "kb.bin")
+        yaml_kb = MutableYamlKnowledgeBase("kb.yaml")
+        yaml_kb.copy_from(binary_kb)
+        yaml_kb.save()
+
+    Args:
+        filename (StrPath): The file name
+        name (Optional[str]): The name of the knowledge base. If None, the file name is used.
+            Defaults to None.
+    """
+
+    index: MutableMapping[str, Article]
+
+    def __init__(self, filename: StrPath, name: Optional[str] = None, **kwargs) -> None:
+        # The file is always memory-mapped.
+        kwargs.setdefault("lazy", True)
+        super().__init__(filename=filename, name=name, **kwargs)
+
+    @classmethod
+    def from_knowledge_base(
+        cls, source: KnowledgeBase, filename: StrPath, name: Optional[str] = None
+    ) -> "BinaryKnowledgeBase":
+        """Writes the articles of another knowledge base into a binary file and opens it.
+
+        The file is written next to its final path and renamed when it is complete, so a failure
+        does not leave a truncated file behind, and an existing file is replaced atomically.
+
+        Args:
+            source (KnowledgeBase): The knowledge base to convert.
+            filename (StrPath): The path of the binary file.
+            name (Optional[str]): The name of the new knowledge base. Defaults to None.
+
+        Raises:
+            ValueError: If the articles can not be written in the binary format.
+
+        Returns:
+            BinaryKnowledgeBase: The new knowledge base.
+        """
+        path = Path(filename)
+        tmp_path = path.with_name(path.name + ".tmp")
+        try:
+            write_binary(tmp_path, source)
+            os.replace(tmp_path, path)
+        except BaseException:
+            if tmp_path.exists():
+                tmp_path.unlink()
+            raise
+        return cls(filename=path, name=name)
+
+    def open_index(self) -> MutableMapping[str, Article]:
+        if not self.filepath.is_file() or self.filepath.stat().st_size == 0:
+            return {}
+        with open(self.filepath, "rb") as f:
+            buffer = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        return BinaryArticleIndex(buffer)
+
+    def load(self, **kwargs) -> Iterable[Article]:
+        with open(self.filepath, "rb") as f:
+            buffer = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        index = BinaryArticleIndex(buffer)
+        try:
+            # The decoded articles do not reference the buffer.
+            yield from index.values_in_file_order()
+        finally:
+            index.close()
+
+    def __iter__(self) -> Iterator[Article]:
+        if isinstance(self.index, BinaryArticleIndex):
+            return self.index.values_in_file_order()
+        return super().__iter__()
+
+
+class MutableBinaryKnowledgeBase(BinaryKnowledgeBase, MutableFileKnowledgeBase):
+    """A mutable knowledge base stored in the compact binary file format of this module.
+
+    Changes are kept in the memory until save is called. The texts larger than the threshold of
+    the compression are saved compressed, and they are decompressed only when the articles are
+    read, not when their headers are listed::
+
+        kb = MutableBinaryKnowledgeBase("kb.bin", compression=TextCompression(threshold=1024))
+
+    Args:
+        filename (StrPath): The file name
+        name (Optional[str]): The name of the knowledge base. If None, the file name is used.
+            Defaults to None.
+        compression (Optional[TextCompression]): The compression of the saved texts. If None,
+            the texts are saved uncompressed. Files are read regardless of this setting.
+            Defaults to None.
+        **kwargs: The arguments of MutableFileKnowledgeBase.
+    """
+
+    def __init__(self,
+        filename: StrPath,
+        name: Optional[str] = None,
+        compression: Optional[TextCompression] = None,
+        **kwargs,
+    ) -> None:
+        self.compression = compression
+        super().__init__(filename=filename, name=name, **kwargs)
+
+    def do_save(
+        self, articles: Iterable[Article], filepath: Optional[Path] = None, **kwargs
+    ) -> None:
+        write_binary(filepath or self.filepath, articles, compression=self.compression)
@@ -0,0 +1,269 @@
+from typing import Any, Callable, Deque, Dict, Iterable, Iterator, Optional, Tuple
+from collections import OrderedDict, deque
+import sys
+import threading
+import time
+
+from ..model import KnowledgeBase, MutableKnowledgeBase, WrappedKnowledgeBase, Article
+
+
+def article_size(article: Article) -> int:
+    """Returns the approximate memory footprint of the text of an article in bytes."""
+    return sys.getsizeof(article.text)
+
+
+class ArticleCache:
+    """A thread safe LRU cache of articles with optional time-to-live and size limits.
+
+    The cache can also store the information that an article does not exist (negative caching):
+    such entries hold None instead of an article.
+
+    Args:
+        max_items (Optional[int]): The maximum number of entries in the cache. None means no
+            limit. Defaults to 1024.
+        max_bytes (Optional[int]): The maximum total size of the cached article texts in bytes.
+            None means no limit. Defaults to None.
+        ttl (Optional[float]): The time-to-live of the entries in seconds. None means that the
+            entries never expire. Defaults to None.
+        timer (Callable[[], float]): The clock used to expire the entries.
+            Defaults to time.monotonic.
+    """
+
+    hits: int
+    """The number of lookups that found an entry in the cache."""
+
+    misses: int
+    """The number of lookups that did not find a valid entry in the cache."""
+
+    evictions: int
+    """The number of entries removed from the cache to respect the size limits."""
+
+    def __init__(self,
+        max_items: Optional[int] = 1024,
+        max_bytes: Optional[int] = None,
+        ttl: Optional[float] = None,
+        timer: Callable[[], float] = time.monotonic,
+    ) -> None:
+        self.max_items = max_items
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self.timer = timer
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.size = 0
+        self._entries: "OrderedDict[str, Tuple[Optional[Article], int, Optional[float]]]" = \
+            OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def __contains__(self, key: object) -> bool:
+        return key in self._entries
+
+    def get(self, key: str) -> Tuple[bool, Optional[Article]]:
+        """Looks up an entry in the cache.
+
+        Args:
+            key (str): The identifier of the article.
+
+        Returns:
+            Tuple[bool, Optional[Article]]: A tuple of a flag telling if a valid entry was found,
+            and the cached article. The article is None for negative entries.
+        """
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                article, _, expires = entry
+                if expires is None or expires > self.timer():
+                    self._entries.move_to_end(key)
+                    self.hits += 1
+                    return True, article
+                self._remove(key)
+            self.misses += 1
+            return False, None
+
+    def put(self, key: str, article: Optional[Article]) -> None:
+        """Adds or replaces an entry in the cache.
+
+        Args:
+            key (str): The identifier of the article.
+            article (Optional[Article]): The article, or None to cache that it does not exist.
+        """
+        size = article_size(article) if article is not None else 0
+        if self.max_bytes is not None and size > self.max_bytes:
+            self.invalidate(key)
+            return
+        expires = self.timer() + self.ttl if self.ttl is not None else None
+        with self._lock:
+            self._remove(key)
+            self._entries[key] = (article, size, expires)
+            self.size += size
+            while (
+                (self.max_items is not None and len(self._entries) > self.max_items)
+                or (self.max_bytes is not None and self.size > self.max_bytes)
+            ):
+                oldest = next(iter(self._entries))
+                self._remove(oldest)
+                self.evictions += 1
+
+    def invalidate(self, key: str) -> None:
+        """Removes an entry from the cache if it exists.
+
+        Args:
+            key (str): The identifier of the article.
+        """
+        with self._lock:
+            self._remove(key)
+
+    def clear(self) -> None:
+        """Removes all entries from the cache."""
+        with self._lock:
+            self._entries.clear()
+            self.size = 0
+
+    def _remove(self, key: str) -> None:
+        entry = self._entries.pop(key, None)
+        if entry is not None:
+            self.size -= entry[1]
+
+
+class CachedKnowledgeBase(WrappedKnowledgeBase):
+    """A read-through cache around another knowledge base.
+
+    Article lookups are served from an in-memory LRU cache, and only the missing articles are
+    fetched from the wrapped knowledge base. Iteration, listing and queries are delegated to the
+    wrapped knowledge base, so they use its projections and indexes, and they do not populate the
+    cache.
+
+    Example::
+
+        kb = CachedKnowledgeBase(kbs["my_knowledge_base"], max_items=10000, ttl=300)
+        article = kb["my_article"]
+        print(kb.cache.hits, kb.cache.misses)
+
+    Args:
+        knowledge_base (KnowledgeBase): The wrapped knowledge base.
+        max_items (Optional[int]): The maximum number of cached articles. Defaults to 1024.
+        max_bytes (Optional[int]): The maximum total size of the cached article texts in bytes.
+            Defaults to None.
+        ttl (Optional[float]): The time-to-live of the cached articles in seconds.
+            Defaults to None.
+        cache_missing (bool): Set to True to cache also the identifiers that were not found in the
+            wrapped knowledge base. Defaults to False.
+    """
+
+    cache: ArticleCache
+
+    def __init__(self,
+        knowledge_base: KnowledgeBase,
+        max_items: Optional[int] = 1024,
+        max_bytes: Optional[int] = None,
+        ttl: Optional[float] = None,
+        cache_missing: bool = False,
+    ) -> None:
+        super().__init__(knowledge_base)
+        self.cache = ArticleCache(max_items=max_items, max_bytes=max_bytes, ttl=ttl)
+        self.cache_missing = cache_missing
+
+    def __getitem__(self, __key: str) -> Article:
+        found, article = self.cache.get(__key)
+        if found:
+            if article is None:
+                raise KeyError(__key)
+            return article
+        try:
+            article = self.knowledge_base[__key]
+        except KeyError:
+            if self.cache_missing:
+                self.cache.put(__key, None)
+            raise
+        self.cache.put(__key, article)
+        return article
+
+    def get_many(self, ids: Iterable[str]) -> Dict[str, Article]:
+        result: Dict[str, Article] = {}
+        missing = []
+        for article_id in ids:
+            found, article = self.cache.get(article_id)
+            if not found:
+                missing.append(article_id)
+            elif article is not None:
+                result[article_id] = article
+        if missing:
+            fetched = self.knowledge_base.get_many(missing)
+            for article_id in missing:
+                article = fetched.get(article_id)
+                if article is not None:
+                    result[article_id] = article
+                    self.cache.put(article_id, article)
+                elif self.cache_missing:
+                    self.cache.put(article_id, None)
+        return result
+
+    def _get_fields(self, article_id: str, fields: Tuple[str, ...]) -> Optional[Dict[str, Any]]:
+        found, article = self.cache.get(article_id)
+        if found:
+            if article is None:
+                return None
+            return { field: getattr(article, field) for field in fields }
+        return self.knowledge_base.get(article_id, fields=fields)
+
+
+class MutableCachedKnowledgeBase(CachedKnowledgeBase, MutableKnowledgeBase):
+    """A read-through cache around a mutable knowledge base.
+
+    Writes are forwarded to the wrapped knowledge base and refresh the cached entries after the
+    write succeeded. During bulk writes the entries of the written articles are invalidated as
+    the articles are passed to the wrapped knowledge base.
+    """
+
+    knowledge_base: MutableKnowledgeBase
+
+    def __setitem__(self, __key: str, __value: Article) -> None:
+        self.knowledge_base[__key] = __value
+        self._refresh(__key, __value)
+
+    def __delitem__(self, __key: str) -> None:
+        del self.knowledge_base[__key]
+        self._forget(__key)
+
+    def put_articles(self, articles: Iterable[Article]) -> None:
+        # Only the last max_items articles can stay in the cache, older ones are not retained.
+        written: Deque[Article] = deque(maxlen=self.cache.max_items)
+
+        def invalidating() -> Iterator[Article]:
+            for article in articles:
+                self.cache.invalidate(article.id)
+                written.append(article)
+                yield article
+        self.knowledge_base.put_articles(invalidating())
+        for article in written:
+            self.cache.put(article.id, article)
+
+    def delete_articles(self, article_ids: Iterable[str]) -> None:
+        deleted: Deque[str] = deque(maxlen=self.cache.max_items)
+
+        def invalidating() -> Iterator[str]:
+            for article_id in article_ids:
+                self.cache.invalidate(article_id)
+                deleted.append(article_id)
+                yield article_id
+        self.knowledge_base.delete_articles(invalidating())
+        if self.cache_missing:
+            for article_id in deleted:
+                self.cache.put(article_id, None)
+
+    def _refresh(self, key: str, article: Article) -> None:
+        # An article stored under a different key is read back with that key as identifier.
+        if key == article.id:
+            self.cache.put(key, article)
+        else:
+            self.cache.invalidate(key)
+
+    def _forget(self, key: str) -> None:
+        if self.cache_missing:
+            self.cache.put(key, None)
+        else:
+            self.cache.invalidate(key)
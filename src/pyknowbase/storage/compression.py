@@ -0,0 +1,272 @@
+"""Compression of the texts of large articles, and blob stores for texts too large to be stored
+inline.
+
+The texts are compressed with zlib, or with zstd if the zstandard package is installed. Only the
+texts larger than a threshold are compressed, as compressing short texts saves little space and
+costs CPU time at each access.
+"""
+
+from typing import Callable, Dict, NamedTuple, Optional
+from abc import ABC, abstractmethod
+import hashlib
+import os
+from pathlib import Path
+import tempfile
+import zlib
+
+from . import StrPath
+
+
+class Codec(NamedTuple):
+    """A compression algorithm."""
+
+    name: str
+    """The name of the codec stored with the compressed texts."""
+    id: int
+    """The identifier of the codec in binary files, between 1 and 255."""
+    compress: Callable[[bytes, Optional[int]], bytes]
+    """Compresses data with an optional compression level."""
+    decompress: Callable[[bytes], bytes]
+    """Decompresses data."""
+
+
+def _zlib_compress(data: bytes, level: Optional[int]) -> bytes:
+    return zlib.compress(data, -1 if level is None else level)
+
+
+def _import_zstandard():
+    try:
+        import zstandard
+    except ImportError:
+        raise ValueError(
+            "Could not import zstandard python package. "
+            "Please install it with `pip install zstandard`."
+        )
+    return zstandard
+
+
+def _zstd_compress(data: bytes, level: Optional[int]) -> bytes:
+    zstandard = _import_zstandard()
+    return zstandard.ZstdCompressor(level=3 if level is None else level).compress(data)
+
+
+def _zstd_decompress(data: bytes) -> bytes:
+    return _import_zstandard().ZstdDecompressor().decompress(data)
+
+
+CODECS: Dict[str, Codec] = {
+    "zlib": Codec("zlib", 1, _zlib_compress, zlib.decompress),
+    "zstd": Codec("zstd", 2, _zstd_compress, _zstd_decompress),
+}
+"""The supported codecs by name."""
+
+_CODECS_BY_ID = { codec.id: codec for codec in CODECS.values() }
+
+
+def get_codec(name: str) -> Codec:
+    """Returns a codec by its name.
+
+    Args:
+        name (str): The name of the codec, "zlib" or "zstd".
+
+    Raises:
+        ValueError: If the codec is unknown.
+
+    Returns:
+        Codec: The codec.
+    """
+    try:
+        return CODECS[name]
+    except KeyError:
+        raise ValueError(f"Unknown compression codec: {name}") from None
+
+
+def get_codec_by_id(codec_id: int) -> Codec:
+    """Returns a codec by its identifier used in binary files.
+
+    Args:
+        codec_id (int): The identifier of the codec.
+
+    Raises:
+        ValueError: If the codec is unknown.
+
+    Returns:
+        Codec: The codec.
+    """
+    try:
+        return _CODECS_BY_ID[codec_id]
+    except KeyError:
+        raise ValueError(f"Unknown compression codec id: {codec_id}") from None
+
+
+class TextCompression:
+    """The settings of the compression of the article texts.
+
+    >>> compression = TextCompression(threshold=100)
+    >>> compression.compress("short") is None
+    True
+    >>> data = compression.compress("long text " * 100)
+    >>> decompress_text(data, compression.codec.name) == "long text " * 100
+    True
+
+    Args:
+        codec (str): The name of the codec, "zlib" or "zstd". Defaults to "zlib".
+        threshold (int): The texts shorter than this number of bytes (in UTF-8) are not
+            compressed. Defaults to 4096.
+        level (Optional[int]): The compression level. If None, the default level of the codec is
+            used. Defaults to None.
+
+    Raises:
+        ValueError: If the codec is unknown, or its package is not installed.
+    """
+
+    def __init__(self, codec: str = "zlib", threshold: int = 4096, level: Optional[int] = None):
+        self.codec = get_codec(codec)
+        if self.codec.name == "zstd":
+            _import_zstandard()
+        self.threshold = threshold
+        self.level = level
+
+    def compress(self, text: str) -> Optional[bytes]:
+        """Compresses a text if it is larger than the threshold.
+
+        Args:
+            text (str): The text.
+
+        Returns:
+            Optional[bytes]: The compressed text, or None if the text is below the threshold or
+            it does not compress.
+        """
+        if len(text) < self.threshold:
+            # The UTF-8 encoding is at least as long as the text.
+            return None
+        data = text.encode("utf-8")
+        if len(data) < self.threshold:
+            return None
+        compressed = self.codec.compress(data, self.level)
+        return compressed if len(compressed) < len(data) else None
+
+    def __repr__(self) -> str:
+        return (
+            f"TextCompression(codec={self.codec.name!r}, threshold={self.threshold}, "
+            f"level={self.level})"
+        )
+
+
+def decompress_text(data: bytes, codec: str) -> str:
+    """Decompresses a text compressed with TextCompression.
+
+    Args:
+        data (bytes): The compressed text.
+        codec (str): The name of the codec.
+
+    Raises:
+        ValueError: If the codec is unknown.
+
+    Returns:
+        str: The text.
+    """
+    return get_codec(codec).decompress(data).decode("utf-8")
+
+
+class BlobStore(ABC):
+    """Abstract base class of the stores of the article texts that are too large to be stored
+    together with the other attributes of the articles, for example in a DynamoDB item.
+
+    Implementations for object stores like Amazon S3 should make the keys safe for their naming
+    rules. LocalBlobStore stores the blobs in a local directory.
+    """
+
+    @abstractmethod
+    def put(self, key: str, data: bytes) -> None:
+        """Stores a blob, overwriting the existing blob with the same key.
+
+        Args:
+            key (str): The key of the blob.
+            data (bytes): The content of the blob.
+        """
+        ...
+
+    @abstractmethod
+    def get(self, key: str) -> bytes:
+        """Reads a blob.
+
+        Args:
+            key (str): The key of the blob.
+
+        Raises:
+            KeyError: If the blob does not exist.
+
+        Returns:
+            bytes: The content of the blob.
+        """
+        ...
+
+    @abstractmethod
+    def delete(self, key: str) -> None:
+        """Deletes a blob. Deleting a missing blob is not an error.
+
+        Args:
+            key (str): The key of the blob.
+        """
+        ...
+
+
+class LocalBlobStore(BlobStore):
+    """A blob store keeping the blobs in files of a local directory.
+
+    The file names are the SHA-256 hashes of the keys, spread into subdirectories by their first
+    two characters. The blobs are written atomically.
+
+    Args:
+        directory (StrPath): The directory of the blobs. It is created if it does not exist.
+    """
+
+    def __init__(self, directory: StrPath) -> None:
+        self.directory = Path(directory)
+        self.directory.mkdir(parents=True, exist_ok=True)
+
+    def path(self, key: str) -> Path:
+        """Returns the path of the file of a blob.
+
+        Args:
+            key (str): The key of the blob.
+
+        Returns:
+            Path: The file path.
+        """
+        digest = hashlib.sha256(key.encode("utf-8")).hexdigest()
+        return self.directory / digest[:2] / digest
+
+    def put(self, key: str, data: bytes) -> None:
+        path = self.path(key)
+        path.parent.mkdir(exist_ok=True)
+        # Writers storing the same blob use separate temporary files, and the data is persisted
+        # before the rename, so a reader never sees a partially written blob.
+        f = tempfile.NamedTemporaryFile(
+            dir=path.parent, prefix=path.name + ".", suffix=".tmp", delete=False
+        )
+        try:
+            with f:
+                f.write(data)
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(f.name, path)
+        except BaseException:
+            os.unlink(f.name)
+            raise
+
+    def get(self, key: str) -> bytes:
+        try:
+            return self.path(key).read_bytes()
+        except FileNotFoundError:
+            raise KeyError(key) from None
+
+    def delete(self, key: str) -> None:
+        try:
+            self.path(key).unlink()
+        except FileNotFoundError:
+            pass
+
+    def __repr__(self) -> str:
+        return f"LocalBlobStore({str(self.directory)!r})"
@@ -1,24 +1,35 @@
-from typing import Any, ItemsView, Iterator, KeysView, ValuesView, Mapping, MutableMapping
+from typing import (
+    Any, Callable, Dict, ItemsView, Iterable, Iterator, KeysView, ValuesView, Mapping,
+    MutableMapping, Optional, Tuple
+)
 
 from pyknowbase.model import Article
 
-from ..model import KnowledgeBase, MutableKnowledgeBase, Article
+from ..model import KnowledgeBase, MutableKnowledgeBase, Article, ArticleHeader, parse_datetime
+from .dynamo_utils import dynamodb_batch_get, dynamodb_parallel_scan, instrument_client
+
+
+def _projection(attrib_names: Iterable[str]) -> Dict[str, Any]:
+    names = { f"#{name}": name for name in attrib_names }
+    return { "ProjectionExpression": ", ".join(names), "ExpressionAttributeNames": names }
+
 
 class DynamoKnowledgeBaseValuesView(ValuesView):
 
-    def __init__(self, mapping) -> None:
+    def __init__(self, mapping, scan: Optional[Callable[[], Iterator[Dict]]] = None) -> None:
         self._mapping = mapping
+        self._scan = scan or mapping.scan
 
     def __contains__(self, v: object) -> bool:
-        for data in self._mapping.scan():
-            article = Article.model_validate(data)
+        for data in self._scan():
+            article = Article.from_trusted(data)
             if v is article or v == article:
                 return True
         return False
 
     def __iter__(self) -> Iterator:
-        for data in self._mapping.scan():
-            yield Article.model_validate(data)
+        for data in self._scan():
+            yield Article.from_trusted(data)
 
 
 class DynamoKnowledgeBaseItemsView(ItemsView):
@@ -28,14 +39,35 @@ class DynamoKnowledgeBaseItemsView(ItemsView):
 
     def __iter__(self) -> Iterator:
         for keys, data in self._mapping.items():
-            yield (keys, Article.model_validate(data))
+            yield (keys, Article.from_trusted(data))
 
 
 class DynamoKnowledgeBase(KnowledgeBase):
+    """A knowledge base backed by a DynamoDB table with the article identifier as primary key.
+
+    Iterating over the knowledge base scans the whole table. Large tables can be scanned faster
+    with a parallel scan: set scan_segments to a value greater than one to divide the table into
+    segments that are scanned concurrently. This setting is used also when the knowledge base is
+    the source of MutableKnowledgeBase.copy_from.
+
+    Args:
+        table_name (str): The name of the DynamoDB table.
+        scan_segments (int): The number of segments of the parallel scan. Defaults to 1, that is,
+            a sequential scan.
+        scan_workers (Optional[int]): The number of threads of the parallel scan. If None, one
+            thread is started for each segment. Defaults to None.
+        boto3_session (Optional[Any]): A boto3 Session used to access the table. If None, a new
+            session with the default configuration is created. Defaults to None.
+    """
 
     _mapping: MutableMapping[str, Any]
 
-    def __init__(self, table_name: str) -> None:
+    def __init__(self,
+        table_name: str,
+        scan_segments: int = 1,
+        scan_workers: Optional[int] = None,
+        boto3_session: Optional[Any] = None,
+    ) -> None:
         try:
             from dynamodb_mapping import DynamoDBMapping
         except ImportError:
@@ -43,7 +75,10 @@ class DynamoKnowledgeBase(KnowledgeBase):
                 "Could not import dynamodb_mapping python package. "
                 "Please install it with `pip install dynamodb_mapping`."
             )
-        self._mapping = DynamoDBMapping(table_name=table_name)
+        self._mapping = DynamoDBMapping(table_name=table_name, boto3_session=boto3_session)
+        instrument_client(self._mapping.table.meta.client)
+        self.scan_segments = scan_segments
+        self.scan_workers = scan_workers
 
     def __iter__(self) -> Iterator[Article]:
         return iter(self.values())
@@ -52,13 +87,85 @@ class DynamoKnowledgeBase(KnowledgeBase):
         return self._mapping.keys()
 
     def values(self) -> ValuesView[Article]:
-        return DynamoKnowledgeBaseValuesView(self._mapping)
+        return DynamoKnowledgeBaseValuesView(self._mapping, scan=self.scan)
 
     def items(self) -> ItemsView[str, Article]:
         return DynamoKnowledgeBaseItemsView(self._mapping)
 
     def __getitem__(self, __key: str) -> Article:
-        return self._mapping[__key]
+        return Article.from_trusted(self._mapping[__key])
+
+    def scan(
+        self, segments: Optional[int] = None, max_workers: Optional[int] = None, **kwargs
+    ) -> Iterator[Dict]:
+        """Scans the items of the table, optionally with a parallel scan.
+
+        Args:
+            segments (Optional[int]): The number of segments of the scan. If None, the
+                scan_segments attribute is used. Defaults to None.
+            max_workers (Optional[int]): The number of threads of the parallel scan. If None, the
+                scan_workers attribute is used. Defaults to None.
+            **kwargs: Additional keyword arguments of the DynamoDB scan operation.
+
+        Returns:
+            Iterator[Dict]: The items of the table.
+        """
+        table = self._mapping.table
+        return dynamodb_parallel_scan(
+            action=table.meta.client.scan,
+            kwargs={ "TableName": table.name, **kwargs },
+            total_segments=segments or self.scan_segments,
+            max_workers=max_workers or self.scan_workers,
+        )
+
+    def iter_ids(self) -> Iterator[str]:
+        """Lists the article identifiers with a scan that returns only the keys.
+
+        Returns:
+            Iterator[str]: The article identifiers.
+        """
+        key_name = self._mapping.key_names[0]
+        for item in self.scan(**_projection((key_name,))):
+            yield item[key_name]
+
+    def iter_headers(self) -> Iterator[ArticleHeader]:
+        """Lists the article headers with a scan that does not return the texts.
+
+        Returns:
+            Iterator[ArticleHeader]: The article headers.
+        """
+        for item in self.scan(**_projection(("id", "metadata", "last_modified"))):
+            yield ArticleHeader.model_validate(item)
+
+    def _get_fields(self, article_id: str, fields: Tuple[str, ...]) -> Optional[Dict[str, Any]]:
+        table = self._mapping.table
+        key_name = self._mapping.key_names[0]
+        response = table.get_item(Key={ key_name: article_id }, **_projection(fields))
+        if "Item" not in response:
+            return None
+        item = response["Item"]
+        if item.get("last_modified"):
+            item["last_modified"] = parse_datetime(item["last_modified"])
+        return item
+
+    def get_many(self, ids: Iterable[str]) -> Dict[str, Article]:
+        """Retrieves several articles with concurrent DynamoDB BatchGetItem calls.
+
+        Args:
+            ids (Iterable[str]): The identifiers of the articles.
+
+        Returns:
+            Dict[str, Article]: The found articles keyed by their identifiers.
+        """
+        table = self._mapping.table
+        key_name = self._mapping.key_names[0]
+        items = dynamodb_batch_get(
+            client=table.meta.client,
+            table_name=table.name,
+            keys=({ key_name: article_id } for article_id in ids),
+        )
+        articles = (Article.from_trusted(item) for item in items)
+        return { article.id: article for article in articles }
 
 
 class MutableDynamoKnowledgeBase(DynamoKnowledgeBase, MutableKnowledgeBase):
@@ -1,32 +1,37 @@
-from typing import Dict, Any, Iterator, Optional, Callable, cast
-from collections.abc import Iterable
-
-import boto3
-from boto3.dynamodb.conditions import Key
+from typing import Dict, Any, Iterable, Iterator, List, Optional, Tuple, cast
+from datetime import datetime, timedelta
+from decimal import Decimal
+import json
+import math
+import threading
 
 from pyknowbase.model import Article
 
-from ..model import KnowledgeBase, MutableKnowledgeBase, Article
-
-
-def dynamodb_paginator(action: Callable, kwargs: Dict) -> Iterator[Dict]:
-    while True:
-        response = action(**kwargs)
-        for item in response["Items"]:
-            yield item
-        if "LastEvaluatedKey" in response:
-            kwargs["ExclusiveStartKey"] = response["LastEvaluatedKey"]
-        else:
-            break
+from ..model import (
+    EPOCH, KnowledgeBase, MutableKnowledgeBase, Article, ArticleFilter, ArticleHeader,
+    article_matches, content_hash, equality_values, parse_datetime, timestamp_micros,
+)
+from .compression import BlobStore, TextCompression, decompress_text
+from .dynamo_utils import (
+    BATCH_GET_MAX_ITEMS, DEFAULT_MAX_POOL_CONNECTIONS, attr_condition, dynamodb_paginator,
+    dynamodb_parallel_scan, dynamodb_batch_write, dynamodb_batch_get, instrument_client,
+    key_condition, shared_dynamodb_resource,
+)
+from .parallel import chunked, iterate_parallel
+from .sharded import shard_of
 
 
 class DynamoMultiKnowledgeBase(MutableKnowledgeBase):
     """A knowledge base that exists in a DynamoDB table backed knowledge base collection.
 
+    The articles of a knowledge base with several shards are spread across several DynamoDB
+    partitions, see DynamoMultiKnowledgeBaseCollection.put_knowledge_base.
+
     Args:
         collection (DynamoMultiKnowledgeBaseCollection): The collection that manages this kb.
         name (str): The name of the knowledge base.
         metadata (Optional[Dict[str, Any]]): Optional metadata of the collection.
+        shards (int): The number of write shards of the knowledge base. Defaults to 1.
     """
 
     collection: "DynamoMultiKnowledgeBaseCollection"
@@ -34,14 +39,16 @@ class DynamoMultiKnowledgeBase(MutableKnowledgeBase):
     def __init__(self,
         collection: "DynamoMultiKnowledgeBaseCollection",
         name: str,
-        metadata: Optional[Dict[str, Any]] = None
+        metadata: Optional[Dict[str, Any]] = None,
+        shards: int = 1,
     ) -> None:
         self.name = name
         self.metadata = metadata or {}
         self.collection = collection
+        self.shards = shards
 
     def __iter__(self) -> Iterator[Article]:
-        return self.collection._get_articles(kb_name=self.name)
+        return self.collection._get_articles(kb_name=self.name, shards=self.shards)
 
     def __getitem__(self, __key: str) -> Article:
         article = self.get_article(article_id=__key)
@@ -50,50 +57,157 @@ class DynamoMultiKnowledgeBase(MutableKnowledgeBase):
         return article
 
     def __setitem__(self, __key: str, __value: Article) -> None:
-        self.collection._put_article(kb_name=self.name, article=__value, article_id=__key)
+        self.collection._put_article(
+            kb_name=self.name, article=__value, article_id=__key, shards=self.shards
+        )
+
+    def get_many(self, ids: Iterable[str]) -> Dict[str, Article]:
+        """Retrieves several articles with concurrent DynamoDB BatchGetItem calls.
+
+        Args:
+            ids (Iterable[str]): The identifiers of the articles.
+
+        Returns:
+            Dict[str, Article]: The found articles keyed by their identifiers.
+        """
+        return self.collection._get_many_articles(
+            kb_name=self.name, article_ids=ids, shards=self.shards
+        )
 
     def __delitem__(self, __key: str) -> None:
-        self.collection._delete_article(kb_name=self.name, article_id=__key)
+        self.collection._delete_article(kb_name=self.name, article_id=__key, shards=self.shards)
 
     def get_article(self, article_id: str) -> Optional[Article]:
-        return self.collection._get_article(kb_name=self.name, article_id=article_id)
+        return self.collection._get_article(
+            kb_name=self.name, article_id=article_id, shards=self.shards
+        )
 
-    def put_article(self, article: Article) -> None:
-        self.collection._put_article(kb_name=self.name, article=article, article_id=article.id)
+    def iter_ids(self) -> Iterator[str]:
+        """Lists the identifiers of the articles with iter_versions.
 
-    def del_article(self, article_id: str) -> None:
-        self.collection._delete_article(kb_name=self.name, article_id=article_id)
+        Returns:
+            Iterator[str]: The article identifiers.
+        """
+        return (article_id for article_id, _ in self.iter_versions())
 
+    def iter_headers(self) -> Iterator[ArticleHeader]:
+        """Lists the article headers with a query that does not return the texts.
 
-class DynamoMultiKnowledgeBaseCollection(Iterable[MutableKnowledgeBase]):
-    """A collection of knowledge bases, backed by an AWS DynamoDB table.
+        Returns:
+            Iterator[ArticleHeader]: The article headers.
+        """
+        return self.collection._get_headers(kb_name=self.name, shards=self.shards)
 
-    You can create a collection even if the table does not exists yet. In this case the collection
-    can create the table for you with the create_table method.
+    def _get_fields(self, article_id: str, fields: Tuple[str, ...]) -> Optional[Dict[str, Any]]:
+        return self.collection._get_article_fields(
+            kb_name=self.name, article_id=article_id, fields=fields, shards=self.shards
+        )
 
-    The collection implements the Iterable protocol so you can iterate over the knowledge bases
-    of the collection::
+    def iter_versions(self) -> Iterator[Tuple[str, datetime]]:
+        """Lists the identifiers and the last_modified timestamps of the articles.
 
-        kbs = DynamoMultiKnowledgeBaseCollection(...)
-        for knowledge_base in kbs:
-            print(knowledge_base)
+        If the collection has a last_modified index, the timestamps are read from this
+        keys-only index, so the articles themselves are not read. Articles written before the
+        index was introduced are not in the index, see complete_versions. Without the index, the
+        timestamps are read with a projected query of the knowledge base.
 
-    The bracket [] accessors are also implemented for reading and writing. The key should be the
-    name of the knowledge base::
+        Returns:
+            Iterator[Tuple[str, datetime]]: The article identifiers and timestamps.
+        """
+        return self.collection._get_versions(kb_name=self.name, shards=self.shards)
 
-        kb = kbs["my_knowledge_base"]
+    @property
+    def complete_versions(self) -> bool:  # type: ignore[override]
+        """False if the versions are listed from the last_modified index, which does not
+        contain the articles written before the index was introduced."""
+        return self.collection.last_modified_index_name is None
 
-    However, for creating a new knowledge base, you might prefer using the put_knowledge_base
-    method::
+    def query(self, filter: ArticleFilter) -> Iterator[Article]:
+        """Finds the articles satisfying a filter with DynamoDB queries.
 
-        kbs.put_knowledge_base(kb_name="my_knowledge_base", metadata={ "foo": "bar" })
+        Conditions on the indexed metadata keys of the collection are looked up in their global
+        secondary indexes, and ranges of last_modified in the last_modified index. The remaining
+        conditions are checked on the fetched articles.
 
-    Delete a knowledge base with the del operator::
+        Args:
+            filter (ArticleFilter): The filter.
 
-        del kbs["my_knowledge_base"]
+        Returns:
+            Iterator[Article]: The matching articles.
+        """
+        return self.collection._query_articles(
+            kb_name=self.name, filter=filter, shards=self.shards
+        )
 
-    Args:
-        table_name (str): The name of the DynamoDB table backing this collection.
+    def put_article(self, article: Article) -> bool:
+        """Adds or overwrites an article.
+
+        Args:
+            article (Article): The article.
+
+        Returns:
+            bool: False if the write was skipped because the article did not change, see the
+            skip_unchanged attribute of the collection.
+        """
+        return self.collection._put_article(
+            kb_name=self.name, article=article, article_id=article.id, shards=self.shards
+        )
+
+    def del_article(self, article_id: str) -> None:
+        self.collection._delete_article(
+            kb_name=self.name, article_id=article_id, shards=self.shards
+        )
+
+    def put_articles(
+        self, articles: Iterable[Article], max_workers: Optional[int] = None
+    ) -> None:
+        """Adds or overwrites several articles with DynamoDB BatchWriteItem calls.
+
+        Args:
+            articles (Iterable[Article]): The articles to be written.
+            max_workers (Optional[int]): The number of threads writing the batches concurrently.
+                If None, the max_workers attribute of the collection is used. Defaults to None.
+        """
+        self.collection._put_articles(
+            kb_name=self.name, articles=articles, max_workers=max_workers, shards=self.shards
+        )
+
+    def delete_articles(
+        self, article_ids: Iterable[str], max_workers: Optional[int] = None
+    ) -> None:
+        """Deletes several articles with DynamoDB BatchWriteItem calls.
+
+        Args:
+            article_ids (Iterable[str]): The identifiers of the articles to be deleted.
+            max_workers (Optional[int]): The number of threads deleting the batches concurrently.
+                If None, the max_workers attribute of the collection is used. Defaults to None.
+        """
+        self.collection._delete_articles(
+            kb_name=self.name, article_ids=article_ids, max_workers=max_workers,
+            shards=self.shards,
+        )
+
+
+def _normalize_numbers(value: Any) -> Any:
+    """Converts the integral numbers to int, so equal numbers have the same JSON encoding."""
+    if isinstance(value, bool):
+        return value
+    if isinstance(value, (float, Decimal)):
+        if math.isfinite(value) and value == int(value):
+            return int(value)
+        return float(value)
+    if isinstance(value, dict):
+        return { key: _normalize_numbers(item) for key, item in value.items() }
+    if isinstance(value, (list, tuple)):
+        return [_normalize_numbers(item) for item in value]
+    return value
+
+
+class DynamoMultiKnowledgeBaseSchema:
+    """The layout of a DynamoDB table storing a collection of knowledge bases.
+
+    This base class is shared by the synchronous and the asyncio implementations of the
+    collection.
     """
 
     table_name: str
@@ -104,7 +218,8 @@ class DynamoMultiKnowledgeBaseCollection(Iterable[MutableKnowledgeBase]):
 
     table_pk: str = "pk"
     """The name of the primary key (hash key) of the table. The primary key value is the name
-    of the knowledge base."""
+    of the knowledge base, followed by shard_separator and the shard index for the articles of
+    sharded knowledge bases."""
 
     table_sk: str = "sk"
     """The name of the secondary key (sort key) of the table. The secondary key value is the
@@ -122,14 +237,609 @@ class DynamoMultiKnowledgeBaseCollection(Iterable[MutableKnowledgeBase]):
     article_metadata_attrib_name = "metadata"
     """The name of the article attribute that contains the metadata."""
 
+    last_modified_index_name: Optional[str] = None
+    """The name of the keys-only global secondary index sorting the articles of each knowledge
+    base by last_modified, or None if the table does not have this index. The index contains
+    only the articles having the last_modified_key attribute, which is written since the index
+    was introduced, so enable it for new tables or after rewriting all articles."""
+
+    last_modified_key: str = "last_modified_us"
+    """The name of the numeric article attribute with last_modified in microseconds since the
+    UNIX epoch, the sort key of the last_modified index."""
+
+    indexed_fields: Tuple[str, ...] = ()
+    """The metadata keys of the articles having a keys-only global secondary index in the
+    table."""
+
+    metadata_index_prefix: str = "meta_"
+    """The prefix of the names of the global secondary indexes of the indexed metadata keys, and
+    of the names of their hash key attributes."""
+
+    kb_shards_attrib_name = "shards"
+    """The name of the knowledge base attribute that contains the number of write shards of
+    sharded knowledge bases."""
+
+    shard_separator = "#"
+    """The separator of the knowledge base name and the shard index in the primary key of the
+    articles of sharded knowledge bases."""
+
+    content_hash_attrib_name = "content_hash"
+    """The name of the article attribute that contains the content_hash of the article."""
+
+    skip_unchanged: bool = False
+    """If True, the writes of articles with the same content_hash as the stored article are
+    skipped."""
+
+    compression: Optional[TextCompression] = None
+    """The compression of the article texts. The compressed texts are stored as binary text
+    attributes, together with the name of the codec in text_codec_attrib_name."""
+
+    text_codec_attrib_name = "text_codec"
+    """The name of the article attribute that contains the codec of a compressed text."""
+
+    blob_store: Optional[BlobStore] = None
+    """The store of the texts larger than max_inline_text_bytes. If None, all texts are stored
+    in the items of the articles."""
+
+    text_blob_attrib_name = "text_blob"
+    """The name of the article attribute that contains the blob store key of the text of the
+    article, if the text is stored in the blob store."""
+
+    max_inline_text_bytes: int = 300_000
+    """The texts larger than this number of bytes, after compression, are stored in the blob
+    store. The size of a DynamoDB item is limited to 400 KB."""
+
+    def _partition_key(self, kb_name: str, article_id: str, shards: int) -> str:
+        """Returns the primary key value of an article."""
+        if shards <= 1:
+            return kb_name
+        return f"{kb_name}{self.shard_separator}{shard_of(article_id, shards)}"
+
+    def _partition_keys(self, kb_name: str, shards: int) -> List[str]:
+        """Returns the primary key values of all articles of a knowledge base."""
+        if shards <= 1:
+            return [kb_name]
+        return [f"{kb_name}{self.shard_separator}{shard}" for shard in range(shards)]
+
+    def _article_key(self, kb_name: str, article_id: str, shards: int) -> Dict[str, str]:
+        return {
+            self.table_pk: self._partition_key(kb_name, article_id, shards),
+            self.table_sk: article_id,
+        }
+
+    def _kb_item(self, kb_name: str, metadata: Dict[str, Any], shards: int) -> Dict[str, Any]:
+        item: Dict[str, Any] = {
+            self.table_pk: kb_name,
+            self.table_sk: self.kb_sk_value,
+            self.index_pk: kb_name,
+            self.kb_metadata_attrib_name: metadata,
+        }
+        if shards > 1:
+            item[self.kb_shards_attrib_name] = shards
+        return item
+
+    def _kb_shards(self, item: Dict[str, Any]) -> int:
+        return int(item.get(self.kb_shards_attrib_name, 1))
+
+    def _put_kb_condition(self, shards: int) -> Dict[str, Any]:
+        """Returns the put_item arguments that prevent changing the number of shards of an
+        existing knowledge base."""
+        if shards <= 1:
+            return {
+                "ConditionExpression": attr_condition(self.kb_shards_attrib_name).not_exists()
+            }
+        return {
+            "ConditionExpression": (
+                attr_condition(self.table_pk).not_exists()
+                | attr_condition(self.kb_shards_attrib_name).eq(shards)
+            )
+        }
+
+    def _article_from_item(self, item: Dict) -> Article:
+        return Article.from_trusted({
+            "id": item[self.table_sk],
+            "text": self._text_from_item(item),
+            "metadata": item.get(self.article_metadata_attrib_name),
+            "last_modified": item.get("last_modified"),
+        })
+
+    def _item_from_article(
+        self, kb_name: str, article: Article, article_id: Optional[str] = None, shards: int = 1
+    ) -> Dict[Any, Any]:
+        item = article.model_dump(mode="json")
+        a_id = item.pop("id")
+        article_id = article_id or a_id
+        item[self.table_pk] = self._partition_key(kb_name, article_id, shards)
+        item[self.table_sk] = article_id
+        item[self.last_modified_key] = timestamp_micros(article.last_modified)
+        item[self.content_hash_attrib_name] = content_hash(article)
+        self._encode_text(item)
+        for field in self.indexed_fields:
+            if field in article.metadata:
+                item[self.metadata_index_prefix + field] = self._metadata_index_key(
+                    kb_name, article.metadata[field]
+                )
+        return item
+
+    def _encode_text(self, item: Dict[str, Any]) -> None:
+        """Compresses the text of an article item if the collection has a compression."""
+        if self.compression is None:
+            return
+        data = self.compression.compress(item["text"])
+        if data is not None:
+            item["text"] = data
+            item[self.text_codec_attrib_name] = self.compression.codec.name
+
+    def _store_text_blob(self, item: Dict[str, Any]) -> None:
+        """Moves the text of an article item to the blob store if it is too large, and keeps
+        only the blob key in the item. Called just before the item is written."""
+        if self.blob_store is None:
+            return
+        text = item["text"]
+        if isinstance(text, str):
+            if len(text) <= self.max_inline_text_bytes // 4:
+                # A character is at most 4 bytes in UTF-8.
+                return
+            data = text.encode("utf-8")
+        else:
+            data = text
+        if len(data) <= self.max_inline_text_bytes:
+            return
+        key = self._blob_key(
+            item[self.table_pk], item[self.table_sk], item[self.content_hash_attrib_name]
+        )
+        self.blob_store.put(key, data)
+        del item["text"]
+        item[self.text_blob_attrib_name] = key
+
+    def _blob_key(self, partition_key: str, article_id: str, version: str) -> str:
+        # Each content has its own key, so writing a new version of an article does not change
+        # the blob of the stored version.
+        return f"{self.table_name}/{partition_key}/{article_id}/{version}"
+
+    def _item_key(self, item: Dict) -> Tuple[str, str]:
+        return item[self.table_pk], item[self.table_sk]
+
+    def _key_of(self, item: Dict) -> Dict[str, str]:
+        return { self.table_pk: item[self.table_pk], self.table_sk: item[self.table_sk] }
+
+    def _text_from_item(self, item: Dict[str, Any]) -> str:
+        """Returns the text of an article item, decompressing it or reading it from the blob
+        store if needed."""
+        blob_key = item.get(self.text_blob_attrib_name)
+        if blob_key is not None:
+            if self.blob_store is None:
+                raise ValueError(
+                    f"The text of article {item[self.table_sk]} is in a blob store, "
+                    "but the blob_store of the collection is not set."
+                )
+            data = self.blob_store.get(blob_key)
+        else:
+            data = item["text"]
+            if isinstance(data, str):
+                return data
+            # boto3 returns the binary attributes wrapped into Binary objects.
+            data = getattr(data, "value", data)
+        codec = item.get(self.text_codec_attrib_name)
+        if codec is None:
+            return bytes(data).decode("utf-8")
+        return decompress_text(data, codec)
+
+    def _delete_blobs(self, blob_keys: Iterable[Optional[str]]) -> None:
+        """Deletes blobs that are no longer referenced. None keys are ignored."""
+        if self.blob_store is None:
+            return
+        for blob_key in blob_keys:
+            if blob_key is not None:
+                self.blob_store.delete(blob_key)
+
+    def _replaced_blobs(
+        self, stored: Dict[Tuple[str, str], Dict], items: Iterable[Dict]
+    ) -> Iterator[str]:
+        """Lists the blobs of the stored items that the written items do not refer to."""
+        for item in items:
+            old_key = stored.get(self._item_key(item), {}).get(self.text_blob_attrib_name)
+            if old_key is not None and old_key != item.get(self.text_blob_attrib_name):
+                yield old_key
+
+    def _drop_unchanged(
+        self, stored: Dict[Tuple[str, str], Dict], items: Iterable[Dict]
+    ) -> Iterator[Dict]:
+        """Skips the items having the same content hash as the stored items."""
+        for item in items:
+            stored_hash = stored.get(self._item_key(item), {}).get(self.content_hash_attrib_name)
+            if stored_hash != item[self.content_hash_attrib_name]:
+                yield item
+
+    def _unreferenced_blobs(
+        self, stored: Dict[Tuple[str, str], Dict], items: Iterable[Dict]
+    ) -> Iterator[str]:
+        """Lists the blobs of items that failed to be written, and are not referred to by the
+        stored items."""
+        for item in items:
+            new_key = item.get(self.text_blob_attrib_name)
+            stored_key = stored.get(self._item_key(item), {}).get(self.text_blob_attrib_name)
+            if new_key is not None and new_key != stored_key:
+                yield new_key
+
+    def _put_article_condition(self, item: Dict[str, Any]) -> Dict[str, Any]:
+        """Returns the put_item arguments that skip writing an article item if the stored item
+        has the same content hash."""
+        attrib = attr_condition(self.content_hash_attrib_name)
+        return {
+            "ConditionExpression": (
+                attrib.not_exists() | attrib.ne(item[self.content_hash_attrib_name])
+            )
+        }
+
+    def _stored_hashes_request(self) -> Dict[str, Any]:
+        """Returns the BatchGetItem table parameters that read only the keys, the content hashes
+        and the blob keys of the items."""
+        return {
+            "ProjectionExpression": "#pk, #sk, #hash, #blob",
+            "ExpressionAttributeNames": {
+                "#pk": self.table_pk,
+                "#sk": self.table_sk,
+                "#hash": self.content_hash_attrib_name,
+                "#blob": self.text_blob_attrib_name,
+            },
+        }
+
+    def _metadata_index_key(self, kb_name: str, value: Any) -> str:
+        value = _normalize_numbers(value)
+        return f"{kb_name}#{json.dumps(value, sort_keys=True, default=str)}"
+
+    def _reads_keys_only(self, query: Dict[str, Any]) -> bool:
+        """Returns True if a query of _query_plan reads a keys-only index, so the articles have
+        to be fetched from the table."""
+        index_name = query.get("IndexName")
+        if index_name is None:
+            return False
+        return index_name == self.last_modified_index_name or any(
+            index_name == self.metadata_index_prefix + field for field in self.indexed_fields
+        )
+
+    def _query_plan(
+        self, kb_name: str, filter: ArticleFilter, shards: int = 1
+    ) -> List[Dict[str, Any]]:
+        """Translates a filter to the keyword arguments of the DynamoDB queries that fetch the
+        candidate articles."""
+        for field, condition in filter.items():
+            values = equality_values(condition) if field in self.indexed_fields else None
+            if values is not None:
+                attrib_name = self.metadata_index_prefix + field
+                index_keys = { self._metadata_index_key(kb_name, value) for value in values }
+                return [
+                    {
+                        "IndexName": attrib_name,
+                        "KeyConditionExpression": key_condition(attrib_name).eq(index_key),
+                    }
+                    for index_key in sorted(index_keys)
+                ]
+        partition_keys = self._partition_keys(kb_name, shards)
+        condition = filter.get("last_modified")
+        if condition is not None and self.last_modified_index_name is not None:
+            range_condition = self._last_modified_range(condition)
+            if range_condition is not None:
+                return [
+                    {
+                        "IndexName": self.last_modified_index_name,
+                        "KeyConditionExpression": (
+                            key_condition(self.table_pk).eq(key) & range_condition
+                        ),
+                    }
+                    for key in partition_keys
+                ]
+        return [
+            { "KeyConditionExpression": key_condition(self.table_pk).eq(key) }
+            for key in partition_keys
+        ]
+
+    def _projection(self, fields: Iterable[str]) -> Dict[str, Any]:
+        """Returns the query or get_item arguments that read only some fields of the articles."""
+        attrib_names = {
+            "id": self.table_sk,
+            "text": "text",
+            "metadata": self.article_metadata_attrib_name,
+            "last_modified": "last_modified",
+        }
+        names = { f"#{field}": attrib_names[field] for field in fields }
+        if "text" in fields:
+            names["#text_codec"] = self.text_codec_attrib_name
+            names["#text_blob"] = self.text_blob_attrib_name
+        return {
+            "ProjectionExpression": ", ".join(names),
+            "ExpressionAttributeNames": names,
+        }
+
+    def _fields_from_item(self, item: Dict, fields: Iterable[str]) -> Dict[str, Any]:
+        result: Dict[str, Any] = {}
+        for field in fields:
+            if field == "id":
+                result["id"] = item[self.table_sk]
+            elif field == "metadata":
+                result["metadata"] = item.get(self.article_metadata_attrib_name) or {}
+            elif field == "last_modified":
+                value = item.get("last_modified")
+                result["last_modified"] = parse_datetime(value) if value else None
+            elif field == "text":
+                result["text"] = self._text_from_item(item)
+            else:
+                result[field] = item[field]
+        return result
+
+    def _version_from_item(self, item: Dict) -> Tuple[str, datetime]:
+        if self.last_modified_key in item:
+            timestamp = int(item[self.last_modified_key])
+            return item[self.table_sk], EPOCH + timedelta(microseconds=timestamp)
+        return item[self.table_sk], parse_datetime(item["last_modified"])
+
+    def _versions_queries(self, kb_name: str, shards: int = 1) -> List[Dict[str, Any]]:
+        if self.last_modified_index_name is not None:
+            return [
+                {
+                    "IndexName": self.last_modified_index_name,
+                    "KeyConditionExpression": key_condition(self.table_pk).eq(key),
+                }
+                for key in self._partition_keys(kb_name, shards)
+            ]
+        return [
+            {
+                "KeyConditionExpression": key_condition(self.table_pk).eq(key),
+                "ProjectionExpression": "#sk, last_modified",
+                "ExpressionAttributeNames": { "#sk": self.table_sk },
+            }
+            for key in self._partition_keys(kb_name, shards)
+        ]
+
+    def _last_modified_range(self, condition: Any) -> Any:
+        operators = condition if isinstance(condition, dict) else { "eq": condition }
+        lower: Optional[int] = None
+        upper: Optional[int] = None
+        for operator, operand in operators.items():
+            if operator == "in":
+                return None
+            value = timestamp_micros(operand)
+            if operator in ("eq", "gte", "gt"):
+                value += 1 if operator == "gt" else 0
+                lower = value if lower is None else max(lower, value)
+            if operator in ("eq", "lte", "lt"):
+                value -= 1 if operator == "lt" else 0
+                upper = value if upper is None else min(upper, value)
+        key = key_condition(self.last_modified_key)
+        if lower is not None and upper is not None:
+            return key.between(lower, upper)
+        if lower is not None:
+            return key.gte(lower)
+        if upper is not None:
+            return key.lte(upper)
+        return None
+
+    def _table_definition(
+        self, kwargs: Dict[str, Any], gs_kwargs: Dict[str, Any]
+    ) -> Dict[str, Any]:
+        global_indexes = [
+            {
+                "IndexName": self.index_name,
+                "KeySchema": [
+                    {
+                        "AttributeName": self.index_pk,
+                        "KeyType": "HASH"
+                    }
+                ],
+                "Projection": {
+                    "ProjectionType": "ALL"
+                },
+                **gs_kwargs  # type: ignore
+            }
+        ]
+        attributes = [
+            {
+                "AttributeName": self.table_pk,
+                "AttributeType": "S"
+            },
+            {
+                "AttributeName": self.table_sk,
+                "AttributeType": "S"
+            },
+            {
+                "AttributeName": self.index_pk,
+                "AttributeType": "S"
+            }
+        ]
+        if self.last_modified_index_name is not None:
+            global_indexes.append({
+                "IndexName": self.last_modified_index_name,
+                "KeySchema": [
+                    { "AttributeName": self.table_pk, "KeyType": "HASH" },
+                    { "AttributeName": self.last_modified_key, "KeyType": "RANGE" },
+                ],
+                # The index is small, listing the article versions reads only the keys.
+                "Projection": { "ProjectionType": "KEYS_ONLY" },
+                **gs_kwargs  # type: ignore
+            })
+            attributes.append({ "AttributeName": self.last_modified_key, "AttributeType": "N" })
+        for field in self.indexed_fields:
+            attrib_name = self.metadata_index_prefix + field
+            global_indexes.append({
+                "IndexName": attrib_name,
+                "KeySchema": [
+                    { "AttributeName": attrib_name, "KeyType": "HASH" },
+                    { "AttributeName": self.table_sk, "KeyType": "RANGE" },
+                ],
+                # The matching articles are fetched from the table, so the index does not
+                # duplicate the texts.
+                "Projection": { "ProjectionType": "KEYS_ONLY" },
+                **gs_kwargs  # type: ignore
+            })
+            attributes.append({ "AttributeName": attrib_name, "AttributeType": "S" })
+        return dict(
+            TableName = self.table_name,
+            KeySchema = [
+                {
+                    "AttributeName": self.table_pk,
+                    "KeyType": "HASH"
+                },
+                {
+                    "AttributeName": self.table_sk,
+                    "KeyType": "RANGE"
+                }
+            ],
+            GlobalSecondaryIndexes = global_indexes,
+            AttributeDefinitions = attributes,
+            **kwargs
+        )
+
+
+class DynamoMultiKnowledgeBaseCollection(
+    DynamoMultiKnowledgeBaseSchema, Iterable[MutableKnowledgeBase]
+):
+    """A collection of knowledge bases, backed by an AWS DynamoDB table.
+
+    You can create a collection even if the table does not exists yet. In this case the collection
+    can create the table for you with the create_table method.
+
+    The collection implements the Iterable protocol so you can iterate over the knowledge bases
+    of the collection::
+
+        kbs = DynamoMultiKnowledgeBaseCollection(...)
+        for knowledge_base in kbs:
+            print(knowledge_base)
+
+    The bracket [] accessors are also implemented for reading and writing. The key should be the
+    name of the knowledge base::
+
+        kb = kbs["my_knowledge_base"]
+
+    However, for creating a new knowledge base, you might prefer using the put_knowledge_base
+    method::
+
+        kbs.put_knowledge_base(kb_name="my_knowledge_base", metadata={ "foo": "bar" })
+
+    Delete a knowledge base with the del operator::
+
+        del kbs["my_knowledge_base"]
+
+    Articles can be queried by metadata with the query method of the knowledge bases. Declare the
+    metadata keys used in the queries with the indexed_fields argument before creating the table,
+    so the queries are served by global secondary indexes. The indexes store only the keys of
+    the matching articles, which are then fetched from the table with BatchGetItem::
+
+        kbs = DynamoMultiKnowledgeBaseCollection("my_table", indexed_fields=["language"])
+        kbs.create_table()
+        english_articles = kbs["my_knowledge_base"].query({ "language": "en" })
+
+    The articles of a large knowledge base can be spread across several DynamoDB partitions to
+    avoid a hot partition::
+
+        kbs.put_knowledge_base(kb_name="my_large_knowledge_base", shards=8)
+
+    Each article item stores the content_hash of the article. With skip_unchanged, writing an
+    article with the same hash as the stored one is skipped, so re-ingesting unchanged articles
+    does not consume write capacity for rewriting them and keeps their last_modified timestamps.
+    Single writes use a conditional put, bulk writes read the stored hashes with BatchGetItem
+    before writing::
+
+        kbs = DynamoMultiKnowledgeBaseCollection("my_table", skip_unchanged=True)
+
+    Large texts inflate the consumed read and write capacity, and the size of a DynamoDB item is
+    limited to 400 KB. With compression, the texts larger than its threshold are stored
+    compressed in a binary attribute, and they are decompressed only when the text is read, not
+    when the headers or other fields of the articles are listed. Texts that are still larger than
+    max_inline_text_bytes are stored in the blob store, and the item keeps only their key.
+    LocalBlobStore stores the blobs in a local directory, for development and for servers with a
+    shared file system::
+
+        kbs = DynamoMultiKnowledgeBaseCollection(
+            "my_table",
+            compression=TextCompression(codec="zlib", threshold=4096),
+            blob_store=LocalBlobStore("/var/lib/pyknowbase/blobs"),
+        )
+
+    boto3 is imported, and the DynamoDB resource is created, only when the collection is first
+    used. Without a resource or a session passed to the constructor, the collections used by a
+    thread share a resource created with the default configuration, see
+    shared_dynamodb_resource, so creating a collection, for example in each invocation of an
+    AWS Lambda function, is cheap. Each thread that uses the collection gets its own resource,
+    because service resources are not thread safe; a resource passed to the constructor is used
+    as is, so it should be used by one thread at a time.
+
+    Args:
+        table_name (str): The name of the DynamoDB table backing this collection.
+        **kwargs: ``dynamodb_resource`` to pass a DynamoDB service resource to reuse,
+            ``boto3_session`` to pass a preconfigured boto3 Session, ``max_pool_connections``
+            to set the size of the connection pool, ``max_workers`` and
+            ``scan_segments`` to set the parallelism of the bulk operations,
+            ``indexed_fields`` to declare the indexed metadata keys,
+            ``last_modified_index_name`` to enable the last_modified index, e.g.
+            ``"gsi_last_modified"``, ``skip_unchanged`` to skip the writes of unchanged
+            articles, and ``compression``, ``blob_store`` and ``max_inline_text_bytes`` to
+            configure the storage of large texts.
+    """
+
+    max_workers: int = 1
+    """The default number of threads used by the bulk write operations."""
+
+    scan_segments: int = 1
+    """The number of segments of the parallel scans of the table. The default 1 means
+    sequential scans."""
+
     def __init__(self, table_name: str, **kwargs) -> None:
         self.table_name = table_name
-        session = (
-            kwargs.get("boto3_session")
-            or boto3.Session()
+        self._boto3_session = kwargs.get("boto3_session")
+        self._dynamodb_resource = kwargs.get("dynamodb_resource")
+        if self._dynamodb_resource is not None:
+            instrument_client(self._dynamodb_resource.meta.client)
+        # Service resources are not thread safe, so each thread creates its own resource and
+        # Table, unless a resource was passed to the constructor.
+        self._local = threading.local()
+        self._session_lock = threading.Lock()
+        self.max_pool_connections = kwargs.get(
+            "max_pool_connections", DEFAULT_MAX_POOL_CONNECTIONS
+        )
+        self.max_workers = kwargs.get("max_workers", self.max_workers)
+        self.skip_unchanged = kwargs.get("skip_unchanged", self.skip_unchanged)
+        self.compression = kwargs.get("compression", self.compression)
+        self.blob_store = kwargs.get("blob_store", self.blob_store)
+        self.max_inline_text_bytes = kwargs.get(
+            "max_inline_text_bytes", self.max_inline_text_bytes
+        )
+        self.scan_segments = kwargs.get("scan_segments", self.scan_segments)
+        self.indexed_fields = tuple(kwargs.get("indexed_fields", self.indexed_fields))
+        self.last_modified_index_name = kwargs.get(
+            "last_modified_index_name", self.last_modified_index_name
         )
-        self.dynamodb = session.resource("dynamodb")
-        self.table = self.dynamodb.Table(table_name)
+
+    @property
+    def dynamodb(self) -> Any:
+        """The DynamoDB service resource of the collection in the current thread, created when
+        it is first used."""
+        if self._dynamodb_resource is not None:
+            return self._dynamodb_resource
+        dynamodb = getattr(self._local, "dynamodb", None)
+        if dynamodb is None:
+            if self._boto3_session is not None:
+                from botocore.config import Config
+                # Sessions are not thread safe either.
+                with self._session_lock:
+                    dynamodb = self._boto3_session.resource(
+                        "dynamodb", config=Config(max_pool_connections=self.max_pool_connections)
+                    )
+            else:
+                dynamodb = shared_dynamodb_resource(
+                    max_pool_connections=self.max_pool_connections
+                )
+            instrument_client(dynamodb.meta.client)
+            self._local.dynamodb = dynamodb
+        return dynamodb
+
+    @property
+    def table(self) -> Any:
+        """The DynamoDB Table resource of the collection in the current thread."""
+        table = getattr(self._local, "table", None)
+        if table is None:
+            table = self._local.table = self.dynamodb.Table(self.table_name)
+        return table
 
     def __iter__(self) -> Iterator[MutableKnowledgeBase]:
         return self.get_knowledge_bases()
@@ -142,7 +852,8 @@ class DynamoMultiKnowledgeBaseCollection(Iterable[MutableKnowledgeBase]):
             return kb
 
     def __setitem__(self, __key: str, __value: KnowledgeBase) -> None:
-        self.put_knowledge_base(kb_name=__key, metadata=__value.metadata)
+        shards = __value.shards if isinstance(__value, DynamoMultiKnowledgeBase) else 1
+        self.put_knowledge_base(kb_name=__key, metadata=__value.metadata, shards=shards)
 
     def __delitem__(self, __key: str) -> None:
         self.delete_knowledge_base(kb_name=__key, delete_articles=True)
@@ -165,57 +876,18 @@ class DynamoMultiKnowledgeBaseCollection(Iterable[MutableKnowledgeBase]):
                 global secondary indexes configuration. You can set for example provisioned
                 capacity settings. Defaults to {}.
         """
-        self.dynamodb.create_table(
-            TableName = self.table_name,
-            KeySchema = [
-                {
-                    "AttributeName": self.table_pk,
-                    "KeyType": "HASH"
-                },
-                {
-                    "AttributeName": self.table_sk,
-                    "KeyType": "RANGE"
-                }
-            ],
-            GlobalSecondaryIndexes=[
-                {
-                    "IndexName": self.index_name,
-                    "KeySchema": [
-                        {
-                            "AttributeName": self.index_pk,
-                            "KeyType": "HASH"
-                        }
-                    ],
-                    "Projection": {
-                        "ProjectionType": "ALL"
-                    },
-                    **gs_kwargs  # type: ignore
-                }
-            ],
-            AttributeDefinitions = [
-                {
-                    "AttributeName": self.table_pk,
-                    "AttributeType": "S"
-                },
-                {
-                    "AttributeName": self.table_sk,
-                    "AttributeType": "S"
-                },
-                {
-                    "AttributeName": self.index_pk,
-                    "AttributeType": "S"
-                }
-            ],
-            **kwargs
-        )
+        self.dynamodb.create_table(**self._table_definition(kwargs, gs_kwargs))
 
     def get_knowledge_bases(self) -> Iterator[MutableKnowledgeBase]:
-        kwargs = { "IndexName": self.index_name }
-        for item in dynamodb_paginator(self.table.scan, kwargs):
+        kwargs = { "TableName": self.table_name, "IndexName": self.index_name }
+        for item in dynamodb_parallel_scan(
+            self.dynamodb.meta.client.scan, kwargs, total_segments=self.scan_segments
+        ):
             yield DynamoMultiKnowledgeBase(
                 collection=self,
                 name=item[self.index_pk],
                 metadata=item.get(self.kb_metadata_attrib_name),
+                shards=self._kb_shards(item),
             )
 
     def get_knowledge_base(self, kb_name: str) -> Optional[MutableKnowledgeBase]:
@@ -228,31 +900,46 @@ class DynamoMultiKnowledgeBaseCollection(Iterable[MutableKnowledgeBase]):
             collection=self,
             name=kb_name,
             metadata=item.get(self.kb_metadata_attrib_name),
+            shards=self._kb_shards(item),
         )
 
     def put_knowledge_base(
-            self, kb_name: str, metadata: Dict[str, Any] = {}
+            self, kb_name: str, metadata: Dict[str, Any] = {}, shards: int = 1
         ) -> MutableKnowledgeBase:
         """Creates or updates a knowledge base in the collection.
 
+        All articles of a knowledge base are stored in the same DynamoDB partition, which limits
+        the throughput of a large and busy knowledge base. Set shards to a number greater than
+        one to spread the articles across several partitions by the hash of their identifiers.
+        Lookups and writes are routed to the partition of the article, and iterations and queries
+        read the partitions concurrently. The number of shards can not be changed after the
+        knowledge base was created.
+
         Args:
-            kb_name (str): The name of the knowledge base.
+            kb_name (str): The name of the knowledge base. It should not contain shard_separator.
             metadata (Dict[str, Any], optional): The metadata of the knowledge base. Defaults to {}.
+            shards (int): The number of write shards. Defaults to 1.
+
+        Raises:
+            ValueError: If the knowledge base exists with a different number of shards.
 
         Returns:
             MutableKnowledgeBase: The newly created or updated knowledge base.
         """
-        item: Dict = {
-            self.table_pk: kb_name,
-            self.table_sk: self.kb_sk_value,
-            self.index_pk: kb_name,
-            self.kb_metadata_attrib_name: metadata,
-        }
-        self.table.put_item(Item=item)
+        client = self.dynamodb.meta.client
+        try:
+            self.table.put_item(
+                Item=self._kb_item(kb_name, metadata, shards), **self._put_kb_condition(shards)
+            )
+        except client.exceptions.ConditionalCheckFailedException:
+            raise ValueError(
+                f"Knowledge base {kb_name} already exists with a different number of shards."
+            ) from None
         return DynamoMultiKnowledgeBase(
             collection=self,
             name=kb_name,
             metadata=metadata,
+            shards=shards,
         )
 
     def delete_knowledge_base(self, kb_name: str, delete_articles: bool = True) -> None:
@@ -264,60 +951,268 @@ class DynamoMultiKnowledgeBaseCollection(Iterable[MutableKnowledgeBase]):
                 knowledge base. Defaults to True.
         """
         if delete_articles:
+            kb = self.get_knowledge_base(kb_name)
+            shards = kb.shards if isinstance(kb, DynamoMultiKnowledgeBase) else 1
+            blob_keys: List[str] = []
             with self.table.batch_writer() as batch:
-                query_kwargs = {
-                    "KeyConditionExpression": Key(self.table_pk).eq(kb_name),
-                    "ProjectionExpression": self.table_sk,
-                }
-                for item in dynamodb_paginator(self.table.query, query_kwargs):
-                    if item[self.table_sk] == self.kb_sk_value:
-                        continue
-                    else:
-                        batch.delete_item(
-                            Key={
-                                self.table_pk: kb_name,
+                for partition_key in self._partition_keys(kb_name, shards):
+                    query_kwargs = {
+                        "KeyConditionExpression": key_condition(self.table_pk).eq(partition_key),
+                        "ProjectionExpression": "#sk, #blob",
+                        "ExpressionAttributeNames": {
+                            "#sk": self.table_sk,
+                            "#blob": self.text_blob_attrib_name,
+                        },
+                    }
+                    for item in dynamodb_paginator(self.table.query, query_kwargs):
+                        if item[self.table_sk] == self.kb_sk_value:
+                            continue
+                        else:
+                            key = {
+                                self.table_pk: partition_key,
                                 self.table_sk: item[self.table_sk]
                             }
-                        )
+                            batch.delete_item(Key=key)
+                            if self.text_blob_attrib_name in item:
+                                blob_keys.append(item[self.text_blob_attrib_name])
+            # The batch writer flushed the deletes.
+            self._delete_blobs(blob_keys)
         key = { self.table_pk: kb_name, self.table_sk: self.kb_sk_value }
-        print("delete key:", key)
         self.table.delete_item(Key=key)
 
-    def _article_from_item(self, item: Dict) -> Article:
-        data = {
-            "id": item[self.table_sk],
-            "text": item["text"],
-            "metadata": item.get(self.article_metadata_attrib_name),
-        }
-        if "last_modified" in item:
-            data["last_modified"] = item["last_modified"]
-        return Article.model_validate(data)
-
-    def _item_from_article(
-        self, kb_name: str, article: Article, article_id: Optional[str] = None
-    ) -> Dict[Any, Any]:
-        item = article.model_dump(mode="json")
-        a_id = item.pop("id")
-        article_id = article_id or a_id
-        item[self.table_pk] = kb_name
-        item[self.table_sk] = article_id
-        return item
+    def _query_items(self, queries: List[Dict[str, Any]]) -> Iterator[Dict]:
+        """Runs several queries, concurrently if there are more than one, e.g. one for each shard
+        of a knowledge base."""
+        if len(queries) == 1:
+            return dynamodb_paginator(self.table.query, queries[0])
+        # Unlike the table resource, the client can be shared among the threads.
+        client = self.dynamodb.meta.client
+        sources = [
+            lambda kwargs=kwargs: dynamodb_paginator(
+                client.query, { "TableName": self.table_name, **kwargs }
+            )
+            for kwargs in queries
+        ]
+        return iterate_parallel(sources)
 
-    def _get_articles(self, kb_name: str) -> Iterator[Article]:
-        kwargs = { "KeyConditionExpression": Key(self.table_pk).eq(kb_name) }
-        for item in dynamodb_paginator(self.table.query, kwargs):
+    def _get_articles(self, kb_name: str, shards: int = 1) -> Iterator[Article]:
+        queries = [
+            { "KeyConditionExpression": key_condition(self.table_pk).eq(partition_key) }
+            for partition_key in self._partition_keys(kb_name, shards)
+        ]
+        for item in self._query_items(queries):
             if item[self.table_sk] == self.kb_sk_value:
                 continue
             else:
                 yield self._article_from_item(item)
 
-    def _get_article(self, kb_name: str, article_id: str) -> Optional[Article]:
-        response = self.table.get_item(Key={self.table_pk: kb_name, self.table_sk: article_id})
+    def _query_articles(
+        self, kb_name: str, filter: ArticleFilter, shards: int = 1
+    ) -> Iterator[Article]:
+        queries = self._query_plan(kb_name, filter, shards)
+        items = self._query_items(queries)
+        if self._reads_keys_only(queries[0]):
+            items = self._get_full_items(items)
+        for item in items:
+            if item[self.table_sk] == self.kb_sk_value:
+                continue
+            article = self._article_from_item(item)
+            if article_matches(article, filter):
+                yield article
+
+    def _get_full_items(self, key_items: Iterable[Dict]) -> Iterator[Dict]:
+        # Fetches the items found in a keys-only index.
+        for chunk in chunked(key_items, BATCH_GET_MAX_ITEMS):
+            yield from dynamodb_batch_get(
+                client=self.dynamodb.meta.client,
+                table_name=self.table_name,
+                keys=[{ self.table_pk: item[self.table_pk], self.table_sk: item[self.table_sk] }
+                      for item in chunk],
+            )
+
+    def _get_headers(self, kb_name: str, shards: int = 1) -> Iterator[ArticleHeader]:
+        projection = self._projection(("id", "metadata", "last_modified"))
+        queries = [
+            {
+                "KeyConditionExpression": key_condition(self.table_pk).eq(partition_key),
+                **projection,
+            }
+            for partition_key in self._partition_keys(kb_name, shards)
+        ]
+        for item in self._query_items(queries):
+            if item[self.table_sk] == self.kb_sk_value:
+                continue
+            data = {
+                "id": item[self.table_sk],
+                "metadata": item.get(self.article_metadata_attrib_name) or {},
+            }
+            if "last_modified" in item:
+                data["last_modified"] = item["last_modified"]
+            yield ArticleHeader.model_validate(data)
+
+    def _get_article_fields(
+        self, kb_name: str, article_id: str, fields: Tuple[str, ...], shards: int = 1
+    ) -> Optional[Dict[str, Any]]:
+        response = self.table.get_item(
+            Key=self._article_key(kb_name, article_id, shards),
+            **self._projection(fields),
+        )
+        return self._fields_from_item(response["Item"], fields) if "Item" in response else None
+
+    def _get_versions(self, kb_name: str, shards: int = 1) -> Iterator[Tuple[str, datetime]]:
+        for item in self._query_items(self._versions_queries(kb_name, shards)):
+            if item[self.table_sk] != self.kb_sk_value:
+                yield self._version_from_item(item)
+
+    def _get_article(self, kb_name: str, article_id: str, shards: int = 1) -> Optional[Article]:
+        response = self.table.get_item(Key=self._article_key(kb_name, article_id, shards))
         return self._article_from_item(response["Item"]) if "Item" in response else None
 
-    def _put_article(self, kb_name: str, article: Article, article_id: Optional[str] = None) -> None:
-        item = self._item_from_article(kb_name, article, article_id)
-        self.table.put_item(Item=item)
+    def _get_many_articles(
+        self, kb_name: str, article_ids: Iterable[str], shards: int = 1
+    ) -> Dict[str, Article]:
+        keys = (
+            self._article_key(kb_name, article_id, shards)
+            for article_id in article_ids
+            if article_id != self.kb_sk_value
+        )
+        items = dynamodb_batch_get(
+            client=self.dynamodb.meta.client,
+            table_name=self.table_name,
+            keys=keys,
+        )
+        return { item[self.table_sk]: self._article_from_item(item) for item in items }
+
+    def _put_article(
+        self, kb_name: str, article: Article, article_id: Optional[str] = None, shards: int = 1
+    ) -> bool:
+        item = self._item_from_article(kb_name, article, article_id, shards)
+        if self.blob_store is not None:
+            return self._put_item_with_blob(item)
+        if not self.skip_unchanged:
+            self.table.put_item(Item=item)
+            return True
+        client = self.dynamodb.meta.client
+        try:
+            self.table.put_item(Item=item, **self._put_article_condition(item))
+        except client.exceptions.ConditionalCheckFailedException:
+            return False
+        return True
+
+    def _put_item_with_blob(self, item: Dict) -> bool:
+        # The blob is stored before the item refers to it. The blob of the replaced item is
+        # deleted after the put, and the new blob if the put failed or was skipped.
+        self._store_text_blob(item)
+        condition = self._put_article_condition(item) if self.skip_unchanged else {}
+        client = self.dynamodb.meta.client
+        try:
+            response = self.table.put_item(Item=item, ReturnValues="ALL_OLD", **condition)
+        except client.exceptions.ConditionalCheckFailedException:
+            self._discard_blobs([item])
+            return False
+        except BaseException:
+            self._discard_blobs([item])
+            raise
+        old = { self._item_key(item): response.get("Attributes", {}) }
+        self._delete_blobs(self._replaced_blobs(old, [item]))
+        return True
+
+    def _discard_blobs(self, items: List[Dict]) -> None:
+        """Deletes the new blobs of items that failed to be written, unless they were written
+        after all."""
+        if not any(self.text_blob_attrib_name in item for item in items):
+            return
+        try:
+            stored = self._stored_items([self._key_of(item) for item in items])
+        except Exception:
+            # Without knowing the stored items, an orphaned blob is safer than a missing one.
+            return
+        self._delete_blobs(self._unreferenced_blobs(stored, items))
 
-    def _delete_article(self, kb_name, article_id: str) -> None:
-        self.table.delete_item(Key={ self.table_pk: kb_name, self.table_sk: article_id })
+    def _stored_items(self, keys: List[Dict]) -> Dict[Tuple[str, str], Dict]:
+        """Reads the keys, the content hashes and the blob keys of the stored items."""
+        stored = dynamodb_batch_get(
+            client=self.dynamodb.meta.client,
+            table_name=self.table_name,
+            keys=keys,
+            get_kwargs=self._stored_hashes_request(),
+        )
+        return { self._item_key(item): item for item in stored }
+
+    def _delete_article(self, kb_name, article_id: str, shards: int = 1) -> None:
+        key = self._article_key(kb_name, article_id, shards)
+        if self.blob_store is None:
+            self.table.delete_item(Key=key)
+            return
+        response = self.table.delete_item(Key=key, ReturnValues="ALL_OLD")
+        self._delete_blobs([response.get("Attributes", {}).get(self.text_blob_attrib_name)])
+
+    def _put_articles(
+        self,
+        kb_name: str,
+        articles: Iterable[Article],
+        max_workers: Optional[int] = None,
+        shards: int = 1,
+    ) -> None:
+        items: Iterable[Dict] = (
+            self._item_from_article(kb_name, article, shards=shards) for article in articles
+        )
+        if self.blob_store is not None:
+            for chunk in chunked(items, BATCH_GET_MAX_ITEMS):
+                self._put_chunk_with_blobs(chunk, max_workers)
+            return
+        if self.skip_unchanged:
+            items = self._changed_items(items)
+        requests = ({ "PutRequest": { "Item": item } } for item in items)
+        self._batch_write(requests, max_workers)
+
+    def _changed_items(self, items: Iterable[Dict]) -> Iterator[Dict]:
+        # BatchWriteItem does not support conditions, so the stored hashes are read first.
+        # Reading the keys and the hashes costs much less capacity than rewriting the articles.
+        for chunk in chunked(items, BATCH_GET_MAX_ITEMS):
+            stored = self._stored_items([self._key_of(item) for item in chunk])
+            yield from self._drop_unchanged(stored, chunk)
+
+    def _put_chunk_with_blobs(self, chunk: List[Dict], max_workers: Optional[int]) -> None:
+        # The stored items are read to find the blobs replaced by the chunk. Only the last
+        # version of each article is written, so no blob is stored for the earlier ones.
+        chunk = list({ self._item_key(item): item for item in chunk }.values())
+        stored = self._stored_items([self._key_of(item) for item in chunk])
+        if self.skip_unchanged:
+            chunk = list(self._drop_unchanged(stored, chunk))
+        for item in chunk:
+            self._store_text_blob(item)
+        try:
+            self._batch_write(({ "PutRequest": { "Item": item } } for item in chunk), max_workers)
+        except BaseException:
+            self._discard_blobs(chunk)
+            raise
+        self._delete_blobs(self._replaced_blobs(stored, chunk))
+
+    def _delete_articles(
+        self,
+        kb_name: str,
+        article_ids: Iterable[str],
+        max_workers: Optional[int] = None,
+        shards: int = 1,
+    ) -> None:
+        keys = (self._article_key(kb_name, article_id, shards) for article_id in article_ids)
+        if self.blob_store is None:
+            self._batch_write(({ "DeleteRequest": { "Key": key } } for key in keys), max_workers)
+            return
+        for chunk in chunked(keys, BATCH_GET_MAX_ITEMS):
+            stored = self._stored_items(chunk)
+            self._batch_write(({ "DeleteRequest": { "Key": key } } for key in chunk), max_workers)
+            self._delete_blobs(item.get(self.text_blob_attrib_name) for item in stored.values())
+
+    def _batch_write(
+        self, requests: Iterable[Dict], max_workers: Optional[int] = None
+    ) -> None:
+        # The client of the service resource is thread safe and serializes native python types.
+        dynamodb_batch_write(
+            client=self.dynamodb.meta.client,
+            table_name=self.table_name,
+            requests=requests,
+            key_names=(self.table_pk, self.table_sk),
+            max_workers=max_workers or self.max_workers,
+        )
@@ -0,0 +1,590 @@
+from typing import (
+    Dict, Any, AsyncIterator, Awaitable, Callable, Iterable, List, Optional, Set, Tuple
+)
+from contextlib import AsyncExitStack, suppress
+import asyncio
+
+from ..model import AsyncMutableKnowledgeBase, Article, ArticleFilter, article_matches
+from .dynamo_multi import DynamoMultiKnowledgeBaseSchema
+from .dynamo_utils import (
+    BATCH_GET_MAX_ITEMS, BATCH_WRITE_MAX_ITEMS, backoff_delay, instrument_client, key_condition,
+)
+from .parallel import chunked
+
+
+class AsyncDynamoMultiKnowledgeBase(AsyncMutableKnowledgeBase):
+    """An asyncio knowledge base that exists in a DynamoDB table backed knowledge base collection.
+
+    Args:
+        collection (AsyncDynamoMultiKnowledgeBaseCollection): The collection that manages this kb.
+        name (str): The name of the knowledge base.
+        metadata (Optional[Dict[str, Any]]): Optional metadata of the collection.
+        shards (int): The number of write shards of the knowledge base. Defaults to 1.
+    """
+
+    collection: "AsyncDynamoMultiKnowledgeBaseCollection"
+
+    def __init__(self,
+        collection: "AsyncDynamoMultiKnowledgeBaseCollection",
+        name: str,
+        metadata: Optional[Dict[str, Any]] = None,
+        shards: int = 1,
+    ) -> None:
+        self.name = name
+        self.metadata = metadata or {}
+        self.collection = collection
+        self.shards = shards
+
+    def __aiter__(self) -> AsyncIterator[Article]:
+        return self.collection._get_articles(kb_name=self.name, shards=self.shards)
+
+    async def get(self, article_id: str) -> Optional[Article]:
+        return await self.collection._get_article(
+            kb_name=self.name, article_id=article_id, shards=self.shards
+        )
+
+    async def get_many(self, ids: Iterable[str]) -> Dict[str, Article]:
+        return await self.collection._get_many_articles(
+            kb_name=self.name, article_ids=ids, shards=self.shards
+        )
+
+    def query(self, filter: ArticleFilter) -> AsyncIterator[Article]:
+        """Finds the articles satisfying a filter with DynamoDB queries.
+
+        See DynamoMultiKnowledgeBase.query for the details.
+
+        Args:
+            filter (ArticleFilter): The filter.
+
+        Returns:
+            AsyncIterator[Article]: The matching articles.
+        """
+        return self.collection._query_articles(
+            kb_name=self.name, filter=filter, shards=self.shards
+        )
+
+    async def put(self, article: Article) -> None:
+        """Adds or overwrites an article.
+
+        The write is skipped if the article did not change and the skip_unchanged attribute of
+        the collection is set.
+
+        Args:
+            article (Article): The article.
+        """
+        await self.collection._put_article(
+            kb_name=self.name, article=article, shards=self.shards
+        )
+
+    async def delete(self, article_id: str) -> None:
+        await self.collection._delete_article(
+            kb_name=self.name, article_id=article_id, shards=self.shards
+        )
+
+    async def put_articles(self, articles: Iterable[Article]) -> None:
+        await self.collection._put_articles(
+            kb_name=self.name, articles=articles, shards=self.shards
+        )
+
+    async def delete_articles(self, article_ids: Iterable[str]) -> None:
+        """Deletes several articles with concurrent DynamoDB BatchWriteItem calls.
+
+        Args:
+            article_ids (Iterable[str]): The identifiers of the articles to be deleted.
+        """
+        await self.collection._delete_articles(
+            kb_name=self.name, article_ids=article_ids, shards=self.shards
+        )
+
+
+class AsyncDynamoMultiKnowledgeBaseCollection(DynamoMultiKnowledgeBaseSchema):
+    """An asyncio collection of knowledge bases, backed by an AWS DynamoDB table.
+
+    This class is the asyncio counterpart of DynamoMultiKnowledgeBaseCollection and works on
+    tables with the same layout. It requires the aioboto3 package. The collection keeps a pool of
+    HTTP connections open, so it must be opened before use, preferably with an async context
+    manager::
+
+        async with AsyncDynamoMultiKnowledgeBaseCollection(table_name="my_table") as kbs:
+            kb = await kbs.get_knowledge_base("my_knowledge_base")
+            article = await kb.get("my_article")
+            async for article in kb:
+                print(article)
+
+    The number of concurrent DynamoDB requests issued by the collection is bounded by
+    max_concurrency, which is also the default size of the connection pool. The bulk writes
+    consume the articles lazily, with at most max_concurrency chunks of articles in flight.
+
+    The collection can be created outside of the event loop that uses it, the asyncio
+    primitives of the collection are created when it is opened.
+
+    Args:
+        table_name (str): The name of the DynamoDB table backing this collection.
+        max_concurrency (int): The maximum number of concurrent DynamoDB requests.
+            Defaults to 32.
+        **kwargs: ``dynamodb_resource`` to reuse an aioboto3 DynamoDB service resource that was
+            already entered, for example across the invocations of an AWS Lambda function (the
+            caller remains responsible for closing it), ``aioboto3_session`` to pass a
+            preconfigured aioboto3 Session,
+            ``max_pool_connections`` to set the size of the connection pool explicitly, and
+            ``indexed_fields``, ``last_modified_index_name``, ``skip_unchanged``,
+            ``compression``, ``blob_store`` and ``max_inline_text_bytes`` as in
+            DynamoMultiKnowledgeBaseCollection. The calls of the blob store are blocking, so it
+            should be fast, like LocalBlobStore.
+    """
+
+    def __init__(self, table_name: str, max_concurrency: int = 32, **kwargs) -> None:
+        try:
+            import aioboto3
+        except ImportError:
+            raise ValueError(
+                "Could not import aioboto3 python package. "
+                "Please install it with `pip install aioboto3`."
+            )
+        self.table_name = table_name
+        self.session = kwargs.get("aioboto3_session") or aioboto3.Session()
+        self._shared_dynamodb = kwargs.get("dynamodb_resource")
+        self.max_concurrency = max_concurrency
+        self.max_pool_connections = kwargs.get("max_pool_connections", max_concurrency)
+        self.indexed_fields = tuple(kwargs.get("indexed_fields", self.indexed_fields))
+        self.skip_unchanged = kwargs.get("skip_unchanged", self.skip_unchanged)
+        self.compression = kwargs.get("compression", self.compression)
+        self.blob_store = kwargs.get("blob_store", self.blob_store)
+        self.max_inline_text_bytes = kwargs.get(
+            "max_inline_text_bytes", self.max_inline_text_bytes
+        )
+        self.last_modified_index_name = kwargs.get(
+            "last_modified_index_name", self.last_modified_index_name
+        )
+        self._semaphore: Optional[asyncio.Semaphore] = None
+        self._exit_stack: Optional[AsyncExitStack] = None
+        self.dynamodb: Any = None
+        self.table: Any = None
+
+    async def open(self) -> "AsyncDynamoMultiKnowledgeBaseCollection":
+        """Opens the connection pool of the collection."""
+        from botocore.config import Config
+        if self._exit_stack is not None:
+            return self
+        # Created here, in the running event loop: before python 3.10 the semaphore is bound to
+        # the event loop of the thread where it was created.
+        self._semaphore = asyncio.Semaphore(self.max_concurrency)
+        exit_stack = AsyncExitStack()
+        if self._shared_dynamodb is not None:
+            self.dynamodb = self._shared_dynamodb
+        else:
+            config = Config(max_pool_connections=self.max_pool_connections)
+            self.dynamodb = await exit_stack.enter_async_context(
+                self.session.resource("dynamodb", config=config)
+            )
+        instrument_client(self.dynamodb.meta.client)
+        self.table = await self.dynamodb.Table(self.table_name)
+        self._exit_stack = exit_stack
+        return self
+
+    async def close(self) -> None:
+        """Closes the connection pool of the collection."""
+        if self._exit_stack is not None:
+            await self._exit_stack.aclose()
+            self._exit_stack = None
+            self._semaphore = None
+            self.dynamodb = None
+            self.table = None
+
+    async def __aenter__(self) -> "AsyncDynamoMultiKnowledgeBaseCollection":
+        return await self.open()
+
+    async def __aexit__(self, *exc_info) -> None:
+        await self.close()
+
+    def __aiter__(self) -> AsyncIterator[AsyncMutableKnowledgeBase]:
+        return self.get_knowledge_bases()
+
+    def __repr__(self) -> str:
+        return f"<{self.__class__.__name__} table_name={self.table_name}>"
+
+    async def _call(self, action: Callable[..., Awaitable[Dict]], **kwargs) -> Dict:
+        if self._exit_stack is None or self._semaphore is None:
+            raise ValueError(f"{self!r} is not open. Call the open method before using it.")
+        async with self._semaphore:
+            return await action(**kwargs)
+
+    async def _paginate(self, action: Callable, kwargs: Dict) -> AsyncIterator[Dict]:
+        while True:
+            response = await self._call(action, **kwargs)
+            for item in response["Items"]:
+                yield item
+            if "LastEvaluatedKey" in response:
+                kwargs["ExclusiveStartKey"] = response["LastEvaluatedKey"]
+            else:
+                break
+
+    async def _paginate_many(self, queries: List[Dict]) -> AsyncIterator[Dict]:
+        """Runs several queries concurrently, e.g. one for each shard of a knowledge base, and
+        yields the items as they arrive."""
+        if len(queries) == 1:
+            async for item in self._paginate(self.table.query, queries[0]):
+                yield item
+            return
+        results: "asyncio.Queue[Any]" = asyncio.Queue(maxsize=1000)
+        done = object()
+
+        async def produce(kwargs: Dict) -> None:
+            async for item in self._paginate(self.table.query, kwargs):
+                await results.put(item)
+
+        async def produce_all() -> None:
+            try:
+                await asyncio.gather(*(produce(kwargs) for kwargs in queries))
+            finally:
+                await results.put(done)
+
+        task = asyncio.ensure_future(produce_all())
+        try:
+            while True:
+                item = await results.get()
+                if item is done:
+                    break
+                yield item
+            # Re-raises the error of a failed query.
+            await task
+        finally:
+            if not task.done():
+                task.cancel()
+                with suppress(asyncio.CancelledError):
+                    await task
+
+    async def create_table(self,
+        kwargs: Dict[str, Any] = { "BillingMode": "PAY_PER_REQUEST" },
+        gs_kwargs: Dict[str, Any] = {}
+    ) -> None:
+        """Creates a DynamoDB table that can be used to store multiple knowledge bases.
+
+        See DynamoMultiKnowledgeBaseCollection.create_table for the arguments.
+        """
+        await self._call(
+            self.dynamodb.create_table, **self._table_definition(kwargs, gs_kwargs)
+        )
+
+    async def get_knowledge_bases(self) -> AsyncIterator[AsyncMutableKnowledgeBase]:
+        kwargs = { "IndexName": self.index_name }
+        async for item in self._paginate(self.table.scan, kwargs):
+            yield AsyncDynamoMultiKnowledgeBase(
+                collection=self,
+                name=item[self.index_pk],
+                metadata=item.get(self.kb_metadata_attrib_name),
+                shards=self._kb_shards(item),
+            )
+
+    async def get_knowledge_base(self, kb_name: str) -> Optional[AsyncMutableKnowledgeBase]:
+        kb_key = { self.table_pk: kb_name, self.table_sk: self.kb_sk_value }
+        result = await self._call(self.table.get_item, Key=kb_key)
+        if "Item" not in result:
+            return None
+        return AsyncDynamoMultiKnowledgeBase(
+            collection=self,
+            name=kb_name,
+            metadata=result["Item"].get(self.kb_metadata_attrib_name),
+            shards=self._kb_shards(result["Item"]),
+        )
+
+    async def put_knowledge_base(
+            self, kb_name: str, metadata: Dict[str, Any] = {}, shards: int = 1
+        ) -> AsyncMutableKnowledgeBase:
+        """Creates or updates a knowledge base in the collection.
+
+        See DynamoMultiKnowledgeBaseCollection.put_knowledge_base for the sharding of the
+        knowledge bases.
+
+        Args:
+            kb_name (str): The name of the knowledge base.
+            metadata (Dict[str, Any], optional): The metadata of the knowledge base. Defaults to {}.
+            shards (int): The number of write shards. Defaults to 1.
+
+        Raises:
+            ValueError: If the knowledge base exists with a different number of shards.
+
+        Returns:
+            AsyncMutableKnowledgeBase: The newly created or updated knowledge base.
+        """
+        client = self.dynamodb.meta.client
+        try:
+            await self._call(
+                self.table.put_item,
+                Item=self._kb_item(kb_name, metadata, shards),
+                **self._put_kb_condition(shards),
+            )
+        except client.exceptions.ConditionalCheckFailedException:
+            raise ValueError(
+                f"Knowledge base {kb_name} already exists with a different number of shards."
+            ) from None
+        return AsyncDynamoMultiKnowledgeBase(
+            collection=self, name=kb_name, metadata=metadata, shards=shards
+        )
+
+    async def delete_knowledge_base(self, kb_name: str, delete_articles: bool = True) -> None:
+        """Deletes a knowledge base from the collection.
+
+        Args:
+            kb_name (str): The name of the knowledge base.
+            delete_articles (bool, optional): Set to True to delete also all articles of the
+                knowledge base. Defaults to True.
+        """
+        if delete_articles:
+            kb = await self.get_knowledge_base(kb_name)
+            shards = kb.shards if isinstance(kb, AsyncDynamoMultiKnowledgeBase) else 1
+            queries = [
+                {
+                    "KeyConditionExpression": key_condition(self.table_pk).eq(partition_key),
+                    "ProjectionExpression": self.table_sk,
+                }
+                for partition_key in self._partition_keys(kb_name, shards)
+            ]
+            article_ids = [
+                item[self.table_sk]
+                async for item in self._paginate_many(queries)
+                if item[self.table_sk] != self.kb_sk_value
+            ]
+            await self._delete_articles(kb_name=kb_name, article_ids=article_ids, shards=shards)
+        key = { self.table_pk: kb_name, self.table_sk: self.kb_sk_value }
+        await self._call(self.table.delete_item, Key=key)
+
+    async def _get_articles(self, kb_name: str, shards: int = 1) -> AsyncIterator[Article]:
+        queries = [
+            { "KeyConditionExpression": key_condition(self.table_pk).eq(partition_key) }
+            for partition_key in self._partition_keys(kb_name, shards)
+        ]
+        async for item in self._paginate_many(queries):
+            if item[self.table_sk] != self.kb_sk_value:
+                yield self._article_from_item(item)
+
+    async def _query_articles(
+        self, kb_name: str, filter: ArticleFilter, shards: int = 1
+    ) -> AsyncIterator[Article]:
+        queries = self._query_plan(kb_name, filter, shards)
+        if self._reads_keys_only(queries[0]):
+            article_ids = [item[self.table_sk] async for item in self._paginate_many(queries)]
+            articles: Iterable[Article] = (
+                await self._get_many_articles(kb_name, article_ids, shards)
+            ).values()
+            for article in articles:
+                if article_matches(article, filter):
+                    yield article
+            return
+        async for item in self._paginate_many(queries):
+            if item[self.table_sk] == self.kb_sk_value:
+                continue
+            article = self._article_from_item(item)
+            if article_matches(article, filter):
+                yield article
+
+    async def _get_article(
+        self, kb_name: str, article_id: str, shards: int = 1
+    ) -> Optional[Article]:
+        key = self._article_key(kb_name, article_id, shards)
+        response = await self._call(self.table.get_item, Key=key)
+        return self._article_from_item(response["Item"]) if "Item" in response else None
+
+    async def _get_many_articles(
+        self, kb_name: str, article_ids: Iterable[str], shards: int = 1
+    ) -> Dict[str, Article]:
+        unique_ids = [
+            article_id for article_id in dict.fromkeys(article_ids)
+            if article_id != self.kb_sk_value
+        ]
+        chunks = chunked(
+            (self._article_key(kb_name, article_id, shards) for article_id in unique_ids),
+            BATCH_GET_MAX_ITEMS,
+        )
+        results = await asyncio.gather(*(self._batch_get(chunk) for chunk in chunks))
+        return {
+            item[self.table_sk]: self._article_from_item(item)
+            for items in results for item in items
+        }
+
+    async def _put_article(self, kb_name: str, article: Article, shards: int = 1) -> bool:
+        item = self._item_from_article(kb_name, article, shards=shards)
+        if self.blob_store is not None:
+            return await self._put_item_with_blob(item)
+        if not self.skip_unchanged:
+            await self._call(self.table.put_item, Item=item)
+            return True
+        client = self.dynamodb.meta.client
+        try:
+            await self._call(
+                self.table.put_item, Item=item, **self._put_article_condition(item)
+            )
+        except client.exceptions.ConditionalCheckFailedException:
+            return False
+        return True
+
+    async def _put_item_with_blob(self, item: Dict) -> bool:
+        # The blob is stored before the item refers to it. The blob of the replaced item is
+        # deleted after the put, and the new blob if the put failed or was skipped.
+        self._store_text_blob(item)
+        condition = self._put_article_condition(item) if self.skip_unchanged else {}
+        client = self.dynamodb.meta.client
+        try:
+            response = await self._call(
+                self.table.put_item, Item=item, ReturnValues="ALL_OLD", **condition
+            )
+        except client.exceptions.ConditionalCheckFailedException:
+            await self._discard_blobs([item])
+            return False
+        except BaseException:
+            await self._discard_blobs([item])
+            raise
+        old = { self._item_key(item): response.get("Attributes", {}) }
+        self._delete_blobs(self._replaced_blobs(old, [item]))
+        return True
+
+    async def _discard_blobs(self, items: List[Dict]) -> None:
+        """Deletes the new blobs of items that failed to be written, unless they were written
+        after all."""
+        if not any(self.text_blob_attrib_name in item for item in items):
+            return
+        try:
+            stored = await self._stored_items([self._key_of(item) for item in items])
+        except Exception:
+            # Without knowing the stored items, an orphaned blob is safer than a missing one.
+            return
+        self._delete_blobs(self._unreferenced_blobs(stored, items))
+
+    async def _stored_items(self, keys: List[Dict]) -> Dict[Tuple[str, str], Dict]:
+        """Reads the keys, the content hashes and the blob keys of the stored items."""
+        stored = await self._batch_get(keys, self._stored_hashes_request())
+        return { self._item_key(item): item for item in stored }
+
+    async def _delete_article(self, kb_name: str, article_id: str, shards: int = 1) -> None:
+        key = self._article_key(kb_name, article_id, shards)
+        if self.blob_store is None:
+            await self._call(self.table.delete_item, Key=key)
+            return
+        response = await self._call(self.table.delete_item, Key=key, ReturnValues="ALL_OLD")
+        self._delete_blobs([response.get("Attributes", {}).get(self.text_blob_attrib_name)])
+
+    async def _put_articles(
+        self, kb_name: str, articles: Iterable[Article], shards: int = 1
+    ) -> None:
+        items = (self._item_from_article(kb_name, article, shards=shards) for article in articles)
+
+        async def write(chunk: List[Dict]) -> None:
+            if self.blob_store is None and not self.skip_unchanged:
+                await self._batch_write([{ "PutRequest": { "Item": item } } for item in chunk])
+                return
+            # BatchWriteItem does not support conditions, so the stored hashes are read first.
+            # They also tell which blobs are replaced by the chunk.
+            stored = await self._stored_items([self._key_of(item) for item in chunk])
+            if self.skip_unchanged:
+                chunk = list(self._drop_unchanged(stored, chunk))
+            for item in chunk:
+                self._store_text_blob(item)
+            try:
+                await self._batch_write([{ "PutRequest": { "Item": item } } for item in chunk])
+            except BaseException:
+                await self._discard_blobs(chunk)
+                raise
+            self._delete_blobs(self._replaced_blobs(stored, chunk))
+
+        if self.skip_unchanged or self.blob_store is not None:
+            chunk_size = BATCH_GET_MAX_ITEMS
+        else:
+            chunk_size = BATCH_WRITE_MAX_ITEMS
+        await self._write_chunks(chunked(items, chunk_size), write)
+
+    async def _delete_articles(
+        self, kb_name: str, article_ids: Iterable[str], shards: int = 1
+    ) -> None:
+        keys = (self._article_key(kb_name, article_id, shards) for article_id in article_ids)
+
+        async def delete(chunk: List[Dict]) -> None:
+            stored = await self._stored_items(chunk) if self.blob_store is not None else {}
+            await self._batch_write([{ "DeleteRequest": { "Key": key } } for key in chunk])
+            self._delete_blobs(item.get(self.text_blob_attrib_name) for item in stored.values())
+
+        await self._write_chunks(chunked(keys, BATCH_WRITE_MAX_ITEMS), delete)
+
+    async def _write_chunks(
+        self, chunks: Iterable[List[Dict]], write: Callable[[List[Dict]], Awaitable[None]]
+    ) -> None:
+        """Writes chunks of items or keys concurrently, consuming the chunks lazily.
+
+        At most max_concurrency chunks are in flight. Duplicate keys are removed within each
+        chunk, keeping the last one, and a chunk waits for the chunks in flight with the same
+        keys, so the last write of each key wins also across chunks.
+        """
+        pending: Set["asyncio.Future[None]"] = set()
+        in_flight: Dict[Tuple[str, str], "asyncio.Future[None]"] = {}
+
+        async def write_after(chunk: List[Dict], previous: Set["asyncio.Future[None]"]) -> None:
+            if previous:
+                await asyncio.gather(*previous)
+            await write(chunk)
+
+        try:
+            for chunk in chunks:
+                if len(pending) >= self.max_concurrency:
+                    done, pending = await asyncio.wait(
+                        pending, return_when=asyncio.FIRST_COMPLETED
+                    )
+                    for task in done:
+                        task.result()
+                    in_flight = { key: task for key, task in in_flight.items() if not task.done() }
+                unique = list({ self._item_key(element): element for element in chunk }.values())
+                keys = [self._item_key(element) for element in unique]
+                previous = { in_flight[key] for key in keys if key in in_flight }
+                task = asyncio.ensure_future(write_after(unique, previous))
+                pending.add(task)
+                in_flight.update((key, task) for key in keys)
+            if pending:
+                await asyncio.gather(*pending)
+        except BaseException:
+            for task in pending:
+                task.cancel()
+            await asyncio.gather(*pending, return_exceptions=True)
+            raise
+
+    async def _batch_get(
+        self,
+        keys: List[Dict],
+        get_kwargs: Optional[Dict[str, Any]] = None,
+        max_retries: int = 8,
+        base_delay: float = 0.05,
+    ) -> List[Dict]:
+        items: List[Dict] = []
+        for attempt in range(max_retries + 1):
+            response = await self._call(
+                self.dynamodb.batch_get_item,
+                RequestItems={ self.table_name: { "Keys": keys, **(get_kwargs or {}) } },
+            )
+            items.extend(response.get("Responses", {}).get(self.table_name, []))
+            keys = response.get("UnprocessedKeys", {}).get(self.table_name, {}).get("Keys", [])
+            if not keys:
+                return items
+            if attempt < max_retries:
+                await asyncio.sleep(backoff_delay(attempt, base_delay, 5.0))
+        raise RuntimeError(
+            f"Could not read {len(keys)} items from table {self.table_name} "
+            f"after {max_retries} retries."
+        )
+
+    async def _batch_write(
+        self, requests: List[Dict], max_retries: int = 8, base_delay: float = 0.05
+    ) -> None:
+        async def write(chunk: List[Dict]) -> None:
+            for attempt in range(max_retries + 1):
+                response = await self._call(
+                    self.dynamodb.batch_write_item, RequestItems={ self.table_name: chunk }
+                )
+                chunk = response.get("UnprocessedItems", {}).get(self.table_name, [])
+                if not chunk:
+                    return
+                if attempt < max_retries:
+                    await asyncio.sleep(backoff_delay(attempt, base_delay, 5.0))
+            raise RuntimeError(
+                f"Could not write {len(chunk)} items to table {self.table_name} "
+                f"after {max_retries} retries."
+            )
+
+        await asyncio.gather(*(write(chunk) for chunk in chunked(requests, BATCH_WRITE_MAX_ITEMS)))
+
@@ -0,0 +1,477 @@
+from typing import Dict, Any, Iterator, Iterable, List, Optional, Sequence, Set, Callable, Tuple
+from concurrent.futures import ThreadPoolExecutor, Future, wait, FIRST_COMPLETED
+import random
+import threading
+import time
+
+from .. import instrumentation
+from .parallel import chunked, iterate_parallel
+
+BATCH_WRITE_MAX_ITEMS = 25
+"""The maximum number of write requests in a single DynamoDB BatchWriteItem call."""
+
+BATCH_GET_MAX_ITEMS = 100
+"""The maximum number of keys in a single DynamoDB BatchGetItem call."""
+
+DEFAULT_MAX_POOL_CONNECTIONS = 50
+"""The size of the connection pool of the shared DynamoDB resources."""
+
+_shared_resources = threading.local()
+_shared_resources_generation = 0
+
+
+def import_boto3() -> Any:
+    """Imports the boto3 package.
+
+    boto3 is imported only when a DynamoDB knowledge base is used, because importing it takes a
+    significant time, for example at the cold start of an AWS Lambda function.
+
+    Raises:
+        ValueError: If boto3 is not installed.
+
+    Returns:
+        The boto3 module.
+    """
+    try:
+        import boto3
+    except ImportError:
+        raise ValueError(
+            "Could not import boto3 python package. "
+            "Please install it with `pip install boto3`."
+        )
+    return boto3
+
+
+def key_condition(name: str) -> Any:
+    """Returns ``boto3.dynamodb.conditions.Key(name)``, importing boto3 lazily.
+
+    Args:
+        name (str): The name of the key attribute.
+
+    Returns:
+        Key: The key condition builder.
+    """
+    import_boto3()
+    from boto3.dynamodb.conditions import Key
+    return Key(name)
+
+
+def attr_condition(name: str) -> Any:
+    """Returns ``boto3.dynamodb.conditions.Attr(name)``, importing boto3 lazily.
+
+    Args:
+        name (str): The name of the attribute.
+
+    Returns:
+        Attr: The attribute condition builder.
+    """
+    import_boto3()
+    from boto3.dynamodb.conditions import Attr
+    return Attr(name)
+
+
+def shared_dynamodb_resource(
+    region_name: Optional[str] = None,
+    endpoint_url: Optional[str] = None,
+    max_pool_connections: int = DEFAULT_MAX_POOL_CONNECTIONS,
+) -> Any:
+    """Returns a DynamoDB service resource shared by the knowledge base collections used by the
+    current thread.
+
+    Service resources are not thread safe, so each thread gets its own resource. It is created
+    on the first call of the thread with a new boto3 Session, and it is reused by the later
+    calls of the thread with the same arguments, so the collections created for example in
+    consecutive invocations of an AWS Lambda function share the session, the credentials and
+    the HTTP connection pool. The client of the resource (``resource.meta.client``) is thread
+    safe, it can be passed to worker threads.
+
+    Args:
+        region_name (Optional[str]): The AWS region. If None, the region of the default
+            configuration is used. Defaults to None.
+        endpoint_url (Optional[str]): The URL of the DynamoDB endpoint, for example of a local
+            DynamoDB. If None, the default endpoint is used. Defaults to None.
+        max_pool_connections (int): The maximum number of HTTP connections kept open.
+            Defaults to DEFAULT_MAX_POOL_CONNECTIONS.
+
+    Returns:
+        ServiceResource: The DynamoDB service resource of the current thread.
+    """
+    generation = _shared_resources_generation
+    resources: Optional[Dict[Tuple[Any, ...], Any]] = getattr(_shared_resources, "resources", None)
+    if resources is None or _shared_resources.generation != generation:
+        resources = _shared_resources.resources = {}
+        _shared_resources.generation = generation
+    key = (region_name, endpoint_url, max_pool_connections)
+    resource = resources.get(key)
+    if resource is None:
+        boto3 = import_boto3()
+        from botocore.config import Config
+        resource = boto3.Session().resource(
+            "dynamodb",
+            region_name=region_name,
+            endpoint_url=endpoint_url,
+            config=Config(max_pool_connections=max_pool_connections),
+        )
+        resources[key] = resource
+    return resource
+
+
+def clear_shared_resources() -> None:
+    """Forgets the shared DynamoDB resources of all threads, for example after the credentials
+    changed."""
+    global _shared_resources_generation
+    _shared_resources_generation += 1
+
+
+_CONTEXT_KEY = "pyknowbase_operation"
+
+
+def _provide_client_params(params: Dict, model: Any, context: Dict, **kwargs) -> None:
+    if not instrumentation.is_enabled():
+        return
+    if "ReturnConsumedCapacity" in model.input_shape.members:
+        params.setdefault("ReturnConsumedCapacity", "TOTAL")
+    attributes = { "table": params.get("TableName") }
+    if "IndexName" in params:
+        attributes["index"] = params["IndexName"]
+    request_items = params.get("RequestItems")
+    if request_items:
+        attributes["table"] = ",".join(request_items)
+        if model.name == "BatchWriteItem":
+            attributes["requested_items"] = sum(len(r) for r in request_items.values())
+    context[_CONTEXT_KEY] = (model.name, attributes, time.time(), time.perf_counter())
+
+
+def _before_call(params: Dict, context: Dict, **kwargs) -> None:
+    if _CONTEXT_KEY in context:
+        body = params.get("body")
+        if isinstance(body, (bytes, str)):
+            context[_CONTEXT_KEY][1]["request_bytes"] = len(body)
+
+
+def _item_count(operation: str, parsed: Dict, attributes: Dict) -> Optional[int]:
+    if "Count" in parsed:
+        return parsed["Count"]
+    if "Responses" in parsed:
+        return sum(len(items) for items in parsed["Responses"].values())
+    if operation == "GetItem":
+        return 1 if "Item" in parsed else 0
+    if operation == "BatchWriteItem":
+        unprocessed = parsed.get("UnprocessedItems") or {}
+        return attributes["requested_items"] - sum(len(r) for r in unprocessed.values())
+    if operation in ("PutItem", "DeleteItem", "UpdateItem"):
+        return 1
+    return None
+
+
+def _consumed_capacity(parsed: Dict) -> Optional[float]:
+    capacity = parsed.get("ConsumedCapacity")
+    if capacity is None:
+        return None
+    if isinstance(capacity, dict):
+        capacity = [capacity]
+    return float(sum(c.get("CapacityUnits", 0) for c in capacity))
+
+
+def _emit_call(
+    context: Dict, parsed: Dict, error: Optional[str], response_bytes: Optional[int]
+) -> None:
+    operation, attributes, start_time, start = context.pop(_CONTEXT_KEY)
+    duration = time.perf_counter() - start
+    if response_bytes is not None:
+        attributes["response_bytes"] = response_bytes
+    sizes = [attributes[key] for key in ("request_bytes", "response_bytes") if key in attributes]
+    instrumentation.emit(instrumentation.OperationEvent(
+        operation=f"dynamodb.{operation}",
+        start_time=start_time,
+        duration=duration,
+        items=_item_count(operation, parsed, attributes) if error is None else None,
+        bytes=sum(sizes) if sizes else None,
+        consumed_capacity=_consumed_capacity(parsed),
+        error=error,
+        attributes=attributes,
+    ))
+
+
+def _after_call(http_response: Any, parsed: Dict, context: Dict, **kwargs) -> None:
+    if _CONTEXT_KEY not in context:
+        return
+    content_length = http_response.headers.get("content-length")
+    if content_length is not None:
+        response_bytes: Optional[int] = int(content_length)
+    else:
+        # The body was already read for parsing, the content property of aiobotocore would
+        # return a coroutine.
+        content = getattr(http_response, "_content", None)
+        response_bytes = len(content) if isinstance(content, bytes) else None
+    error = None
+    if http_response.status_code >= 300:
+        error = parsed.get("Error", {}).get("Code", "Error")
+    _emit_call(context, parsed, error, response_bytes)
+
+
+def _after_call_error(exception: Exception, context: Dict, **kwargs) -> None:
+    if _CONTEXT_KEY in context:
+        _emit_call(context, {}, type(exception).__name__, None)
+
+
+def instrument_client(client: Any) -> Any:
+    """Reports the API calls of a DynamoDB client to the instrumentation listeners.
+
+    The calls are reported as ``dynamodb.<OperationName>`` events, for example each page fetched
+    by dynamodb_paginator is a ``dynamodb.Query`` or ``dynamodb.Scan`` event. While listeners
+    are registered, the requests ask for the consumed capacity with ``ReturnConsumedCapacity``,
+    unless the caller set it explicitly. Instrumenting a client more than once has no effect.
+
+    Args:
+        client: A boto3 or aiobotocore DynamoDB client, for example the client of a service
+            resource (``resource.meta.client``).
+
+    Returns:
+        The client.
+    """
+    events = client.meta.events
+    for event, handler in (
+        ("provide-client-params.dynamodb", _provide_client_params),
+        ("before-call.dynamodb", _before_call),
+        ("after-call.dynamodb", _after_call),
+        ("after-call-error.dynamodb", _after_call_error),
+    ):
+        events.register(event, handler, unique_id=f"pyknowbase-{event}")
+    return client
+
+
+def dynamodb_paginator(action: Callable, kwargs: Dict) -> Iterator[Dict]:
+    while True:
+        response = action(**kwargs)
+        for item in response["Items"]:
+            yield item
+        if "LastEvaluatedKey" in response:
+            kwargs["ExclusiveStartKey"] = response["LastEvaluatedKey"]
+        else:
+            break
+
+
+def dynamodb_parallel_scan(
+    action: Callable,
+    kwargs: Dict,
+    total_segments: int,
+    max_workers: Optional[int] = None,
+    queue_size: int = 1000,
+) -> Iterator[Dict]:
+    """Scans a DynamoDB table or index with a parallel scan.
+
+    The table is divided into total_segments segments that are scanned concurrently by worker
+    threads. The items are streamed to the caller through a bounded queue, so the memory usage
+    stays flat regardless of the size of the table. The order of the items is not specified.
+
+    Args:
+        action (Callable): The scan method of a DynamoDB client. Clients, unlike service
+            resources, can be shared among threads.
+        kwargs (Dict): The keyword arguments of the scan method, including ``TableName``.
+        total_segments (int): The number of segments.
+        max_workers (Optional[int]): The number of worker threads. If None, one thread is started
+            for each segment. Defaults to None.
+        queue_size (int): The maximum number of items buffered in the queue. Defaults to 1000.
+
+    Returns:
+        Iterator[Dict]: The scanned items.
+    """
+    if total_segments <= 1:
+        return dynamodb_paginator(action, dict(kwargs))
+
+    def segment_scanner(segment: int) -> Callable[[], Iterator[Dict]]:
+        segment_kwargs = { **kwargs, "Segment": segment, "TotalSegments": total_segments }
+        return lambda: dynamodb_paginator(action, segment_kwargs)
+
+    sources = [segment_scanner(segment) for segment in range(total_segments)]
+    return iterate_parallel(sources, max_workers=max_workers, queue_size=queue_size)
+
+
+def backoff_delay(attempt: int, base_delay: float, max_delay: float) -> float:
+    """Exponential backoff with full jitter."""
+    return random.uniform(0, min(max_delay, base_delay * 2 ** attempt))  # noqa: S311
+
+
+def _request_key(request: Dict, key_names: Sequence[str]) -> tuple:
+    if "PutRequest" in request:
+        item = request["PutRequest"]["Item"]
+    else:
+        item = request["DeleteRequest"]["Key"]
+    return tuple(item[name] for name in key_names)
+
+
+def _dedupe_requests(requests: Iterable[Dict], key_names: Sequence[str]) -> List[Dict]:
+    # BatchWriteItem rejects requests that contain the same key twice: keep the last one.
+    return list({ _request_key(request, key_names): request for request in requests }.values())
+
+
+def _batch_write_chunk(
+    client: Any,
+    table_name: str,
+    requests: List[Dict],
+    max_retries: int,
+    base_delay: float,
+    max_delay: float,
+) -> None:
+    for attempt in range(max_retries + 1):
+        response = client.batch_write_item(RequestItems={ table_name: requests })
+        requests = response.get("UnprocessedItems", {}).get(table_name, [])
+        if not requests:
+            return
+        if attempt < max_retries:
+            time.sleep(backoff_delay(attempt, base_delay, max_delay))
+    raise RuntimeError(
+        f"Could not write {len(requests)} items to table {table_name} "
+        f"after {max_retries} retries."
+    )
+
+
+def dynamodb_batch_write(
+    client: Any,
+    table_name: str,
+    requests: Iterable[Dict],
+    key_names: Optional[Sequence[str]] = None,
+    max_workers: int = 1,
+    max_retries: int = 8,
+    base_delay: float = 0.05,
+    max_delay: float = 5.0,
+) -> None:
+    """Executes DynamoDB write requests with BatchWriteItem calls.
+
+    The requests are sent in chunks of 25 items. Unprocessed items returned by DynamoDB are
+    retried with exponential backoff. The requests iterable is consumed lazily, so even a very
+    large number of requests can be written with a bounded memory footprint. With key_names,
+    duplicate keys are removed within each chunk, and with several workers a chunk waits for
+    the chunks in flight with the same keys, so the last request of each key wins also across
+    chunks.
+
+    Args:
+        client: A DynamoDB client. The client of a DynamoDB service resource
+            (``resource.meta.client``) accepts native Python types in the items.
+        table_name (str): The name of the DynamoDB table.
+        requests (Iterable[Dict]): The ``PutRequest`` or ``DeleteRequest`` write requests.
+        key_names (Optional[Sequence[str]]): The names of the key attributes of the table. If
+            specified, requests with duplicate keys are deduplicated, keeping the last one.
+            Defaults to None.
+        max_workers (int): The number of threads that send the chunks concurrently. Defaults to 1.
+        max_retries (int): The maximum number of retries of the unprocessed items. Defaults to 8.
+        base_delay (float): The base delay of the exponential backoff in seconds.
+            Defaults to 0.05.
+        max_delay (float): The maximum delay between two retries in seconds. Defaults to 5.0.
+
+    Raises:
+        RuntimeError: If some items could not be written after max_retries retries.
+    """
+    def write(chunk: List[Dict], previous: Iterable[Future] = ()) -> None:
+        # The executor starts the chunks in order, so the previous chunks are already running.
+        for future in previous:
+            future.result()
+        _batch_write_chunk(client, table_name, chunk, max_retries, base_delay, max_delay)
+
+    chunks = chunked(requests, BATCH_WRITE_MAX_ITEMS)
+    if key_names:
+        chunks = (_dedupe_requests(chunk, key_names) for chunk in chunks)
+    if max_workers <= 1:
+        for chunk in chunks:
+            write(chunk)
+        return
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        pending: Set[Future] = set()
+        in_flight: Dict[tuple, Future] = {}
+        for chunk in chunks:
+            # Bound the number of in-flight chunks, so the input is not materialized at once.
+            if len(pending) >= 2 * max_workers:
+                done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                for future in done:
+                    future.result()
+                in_flight = {
+                    key: future for key, future in in_flight.items() if future in pending
+                }
+            keys = [_request_key(request, key_names) for request in chunk] if key_names else []
+            previous = { in_flight[key] for key in keys if key in in_flight }
+            future = executor.submit(write, chunk, previous)
+            pending.add(future)
+            in_flight.update((key, future) for key in keys)
+        for future in pending:
+            future.result()
+
+
+def _batch_get_chunk(
+    client: Any,
+    table_name: str,
+    keys: List[Dict],
+    get_kwargs: Dict[str, Any],
+    max_retries: int,
+    base_delay: float,
+    max_delay: float,
+) -> List[Dict]:
+    items: List[Dict] = []
+    for attempt in range(max_retries + 1):
+        request = { table_name: { "Keys": keys, **get_kwargs } }
+        response = client.batch_get_item(RequestItems=request)
+        items.extend(response.get("Responses", {}).get(table_name, []))
+        keys = response.get("UnprocessedKeys", {}).get(table_name, {}).get("Keys", [])
+        if not keys:
+            return items
+        if attempt < max_retries:
+            time.sleep(backoff_delay(attempt, base_delay, max_delay))
+    raise RuntimeError(
+        f"Could not read {len(keys)} items from table {table_name} "
+        f"after {max_retries} retries."
+    )
+
+
+def dynamodb_batch_get(
+    client: Any,
+    table_name: str,
+    keys: Iterable[Dict],
+    get_kwargs: Optional[Dict[str, Any]] = None,
+    max_workers: int = 8,
+    max_retries: int = 8,
+    base_delay: float = 0.05,
+    max_delay: float = 5.0,
+) -> Iterator[Dict]:
+    """Retrieves items from a DynamoDB table with BatchGetItem calls.
+
+    The keys are requested in chunks of 100 items, and the chunks are sent concurrently. Keys
+    returned as unprocessed by DynamoDB are retried with exponential backoff. Items that do not
+    exist in the table are silently omitted from the result, and the order of the returned items
+    is not specified.
+
+    Args:
+        client: A DynamoDB client. The client of a DynamoDB service resource
+            (``resource.meta.client``) accepts and returns native Python types.
+        table_name (str): The name of the DynamoDB table.
+        keys (Iterable[Dict]): The keys of the items to be retrieved. Duplicate keys are
+            requested only once.
+        get_kwargs (Optional[Dict[str, Any]]): Additional parameters of the table in the
+            BatchGetItem request, for example ``ProjectionExpression``. Defaults to None.
+        max_workers (int): The maximum number of threads that send the chunks concurrently.
+            Defaults to 8.
+        max_retries (int): The maximum number of retries of the unprocessed keys. Defaults to 8.
+        base_delay (float): The base delay of the exponential backoff in seconds.
+            Defaults to 0.05.
+        max_delay (float): The maximum delay between two retries in seconds. Defaults to 5.0.
+
+    Raises:
+        RuntimeError: If some items could not be read after max_retries retries.
+
+    Returns:
+        Iterator[Dict]: The retrieved items.
+    """
+    unique_keys = list({ tuple(sorted(key.items())): key for key in keys }.values())
+    chunks = list(chunked(unique_keys, BATCH_GET_MAX_ITEMS))
+
+    def read(chunk: List[Dict]) -> List[Dict]:
+        return _batch_get_chunk(
+            client, table_name, chunk, get_kwargs or {}, max_retries, base_delay, max_delay
+        )
+
+    if len(chunks) <= 1 or max_workers <= 1:
+        for chunk in chunks:
+            yield from read(chunk)
+        return
+    with ThreadPoolExecutor(max_workers=min(max_workers, len(chunks))) as executor:
+        for items in executor.map(read, chunks):
+            yield from items
@@ -1,41 +1,367 @@
-from typing import Union, Optional, List, Iterable
+from typing import (
+    Any, Union, Optional, List, Iterable, Iterator, Callable, Dict, Tuple, MutableMapping
+)
 from abc import ABC, abstractmethod
+import json
+import mmap
 import os
 from pathlib import Path
 
-from .memory import InMemoryKnowledgeBase, MutableInMemoryKnowledgeBase
-from ..model import Article
+from .. import instrumentation
+from .cached import ArticleCache
+from .memory import InMemoryKnowledgeBase, MetadataIndex, MutableInMemoryKnowledgeBase
+from ..model import Article, ArticleHeader, content_hash
 
 StrPath = Union[str, os.PathLike]
 
+ArticleOffsets = Dict[str, Tuple[int, int]]
+"""Maps article identifiers to the byte offset and byte length of the articles in a file."""
+
+
+def _fsync_directory(path: Path) -> None:
+    """Persists the renames in a directory. Skipped where directories can not be opened."""
+    try:
+        fd = os.open(path, os.O_RDONLY)
+    except OSError:
+        return
+    try:
+        os.fsync(fd)
+    except OSError:
+        pass
+    finally:
+        os.close(fd)
+
+
+class FileArticleIndex(MutableMapping[str, Article]):
+    """Base class of the article indexes that read the articles from a memory-mapped file."""
+
+    buffer: Any
+
+    def get_header(self, key: str) -> ArticleHeader:
+        """Reads the header of an article, skipping its text if the file format allows it.
+
+        Args:
+            key (str): The identifier of the article.
+
+        Raises:
+            KeyError: If the article does not exist.
+
+        Returns:
+            ArticleHeader: The header of the article.
+        """
+        return ArticleHeader.from_article(self[key])
+
+    def iter_headers(self) -> Iterator[ArticleHeader]:
+        """Reads the headers of all articles.
+
+        Returns:
+            Iterator[ArticleHeader]: The article headers.
+        """
+        return (self.get_header(key) for key in self)
+
+    def close(self) -> None:
+        """Releases the memory-mapped file."""
+        if isinstance(self.buffer, mmap.mmap):
+            self.buffer.close()
+
+
+class LazyArticleIndex(FileArticleIndex):
+    """A mapping of article identifiers to articles that are parsed on demand.
+
+    The raw bytes of the articles are read from a memory-mapped file, and an article is parsed
+    only when it is accessed. The parsed articles can be kept in an optional bounded cache.
+    Articles added to the mapping are kept in the memory.
+
+    Args:
+        buffer (bytes-like): The memory-mapped file.
+        offsets (ArticleOffsets): The position of the articles in the file.
+        parse (Callable[[bytes], Article]): Parses the raw bytes of an article.
+        cache_size (Optional[int]): The maximum number of parsed articles kept in the memory.
+            If None or 0, the articles are parsed at each access. Defaults to None.
+        parse_header (Optional[Callable[[bytes], ArticleHeader]]): Parses the header of an
+            article from its raw bytes. If None, the whole article is parsed. Defaults to None.
+    """
+
+    def __init__(self,
+        buffer,
+        offsets: ArticleOffsets,
+        parse: Callable[[bytes], Article],
+        cache_size: Optional[int] = None,
+        parse_header: Optional[Callable[[bytes], ArticleHeader]] = None,
+    ) -> None:
+        self.buffer = buffer
+        self.parse = parse
+        self.parse_header = parse_header
+        self.cache = ArticleCache(max_items=cache_size) if cache_size else None
+        self._entries: Dict[str, Union[Tuple[int, int], Article]] = dict(offsets)
+
+    def __getitem__(self, __key: str) -> Article:
+        entry = self._entries[__key]
+        if isinstance(entry, Article):
+            return entry
+        if self.cache is not None:
+            found, article = self.cache.get(__key)
+            if found and article is not None:
+                return article
+        offset, length = entry
+        article = self.parse(self.buffer[offset:offset + length])
+        if self.cache is not None:
+            self.cache.put(__key, article)
+        return article
+
+    def get_header(self, key: str) -> ArticleHeader:
+        entry = self._entries[key]
+        if isinstance(entry, Article) or self.parse_header is None:
+            return super().get_header(key)
+        if self.cache is not None:
+            found, article = self.cache.get(key)
+            if found and article is not None:
+                return ArticleHeader.from_article(article)
+        offset, length = entry
+        return self.parse_header(self.buffer[offset:offset + length])
+
+    def __setitem__(self, __key: str, __value: Article) -> None:
+        self._entries[__key] = __value
+        if self.cache is not None:
+            self.cache.invalidate(__key)
+
+    def __delitem__(self, __key: str) -> None:
+        del self._entries[__key]
+        if self.cache is not None:
+            self.cache.invalidate(__key)
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self._entries)
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def __contains__(self, __key: object) -> bool:
+        return __key in self._entries
+
+
 class FileKnowledgeBase(InMemoryKnowledgeBase):
     """Abstract base class for knowledge bases that load the articles from a local file.
 
     The FileKnowledgeBase maintains a cache of the articles in the memory.
 
+    In lazy mode the articles are not loaded when the knowledge base is opened. Instead, the
+    file is memory-mapped, and an index of the positions of the articles in the file is built.
+    The index is persisted in a sidecar file next to the data file (with an additional ``.idx``
+    suffix), so the next time the knowledge base is opened the file does not have to be scanned.
+    The articles are parsed only when they are accessed. Lazy mode is supported by the file
+    formats implementing the scan_offsets method. Close the knowledge base, or use it as a
+    context manager, to release the memory-mapped file::
+
+        with JsonKnowledgeBase("kb.json", lazy=True) as kb:
+            article = kb["my_article"]
+
     Args:
         filename (StrPath): The file name
         name (Optional[str]): The name of the knowledge base. If None, FileKnowledgeBase will
             generate a name based on the file name. Defaults to None.
+        lazy (bool): Set to True to open the file in lazy mode. Defaults to False.
+        cache_size (Optional[int]): The maximum number of parsed articles kept in the memory in
+            lazy mode. Defaults to None, meaning that the articles are parsed at each access.
+        indexed_fields (Iterable[str]): The metadata keys to be indexed for the query method.
+            The indexes are built when the file is opened, which parses all articles also in
+            lazy mode. Defaults to ().
     """
 
     filepath: Path
 
-    def __init__(self, filename: StrPath, name: Optional[str] = None) -> None:
+    def __init__(self,
+        filename: StrPath,
+        name: Optional[str] = None,
+        lazy: bool = False,
+        cache_size: Optional[int] = None,
+        indexed_fields: Iterable[str] = (),
+    ) -> None:
         self.filepath = Path(filename)
         self.name = name or self.filepath.name
-        if self.filepath.is_file():
-            articles = self.load()
-            self.index = { a.id: a for a in articles }
-        else:
-            self.index = {}
+        self.lazy = lazy
+        self.cache_size = cache_size
+        self.metadata_indexes = { field: MetadataIndex(field) for field in indexed_fields }
+        self.open()
+
+    def open(self) -> None:
+        """(Re)loads the articles from the file and replays the journal if it exists."""
+        with instrumentation.operation(
+            "file.open", backend=type(self).__name__, path=str(self.filepath), lazy=self.lazy
+        ) as op:
+            self.index = self.open_index()
+            self._journal_size: Optional[int] = None
+            if self.journal_filepath.is_file():
+                self._replay_journal()
+            self.rebuild_indexes()
+            if op.recording:
+                op.items = len(self.index)
+                op.bytes = self.filepath.stat().st_size if self.filepath.is_file() else 0
+
+    def close(self) -> None:
+        """Releases the memory-mapped file in lazy mode. The knowledge base can not be used
+        afterwards, and the unsaved changes of a mutable knowledge base are lost."""
+        if isinstance(self.index, FileArticleIndex):
+            self.index.close()
+        self.index = {}
+
+    def __enter__(self) -> "FileKnowledgeBase":
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.close()
+
+    def open_index(self) -> MutableMapping[str, Article]:
+        """Creates the index of the articles in the file.
+
+        Returns:
+            MutableMapping[str, Article]: The article index.
+        """
+        if not self.filepath.is_file():
+            return {}
+        if self.lazy:
+            return self.open_lazy_index()
+        return { a.id: a for a in self.load() }
+
+    @property
+    def journal_filepath(self) -> Path:
+        """The path of the journal file recording the changes since the last full save."""
+        return self.filepath.with_name(self.filepath.name + ".log")
+
+    def _replay_journal(self) -> None:
+        with open(self.journal_filepath, "rb") as f:
+            lines = f.readlines()
+        size = 0
+        for line_no, line in enumerate(lines):
+            try:
+                if not line.endswith(b"\n"):
+                    raise ValueError("Missing line end")
+                entry = json.loads(line)
+            except ValueError:
+                if line_no == len(lines) - 1:
+                    # A partially written last entry, e.g. because of a crash during save. It is
+                    # cut off before the next append, so the new entries start on a new line.
+                    self._journal_size = size
+                    break
+                raise ValueError(
+                    f"Corrupt journal file {self.journal_filepath} at line {line_no + 1}."
+                ) from None
+            size += len(line)
+            if entry["op"] == "put":
+                self.index[entry["id"]] = Article.from_trusted(entry["article"])
+            elif entry["id"] in self.index:
+                del self.index[entry["id"]]
+
+    @property
+    def index_filepath(self) -> Path:
+        """The path of the sidecar file storing the article offsets in lazy mode."""
+        return self.filepath.with_name(self.filepath.name + ".idx")
+
+    def open_lazy_index(self) -> LazyArticleIndex:
+        """Memory-maps the file and creates a lazy index of its articles.
+
+        Returns:
+            LazyArticleIndex: The lazy article index.
+        """
+        with open(self.filepath, "rb") as f:
+            stat = os.fstat(f.fileno())
+            buffer = (
+                mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) if stat.st_size > 0 else b""
+            )
+        offsets = self._read_offsets(stat)
+        if offsets is None:
+            offsets = { article_id: (offset, length)
+                        for article_id, offset, length in self.scan_offsets(buffer) }
+            self._write_offsets(stat, offsets)
+        return LazyArticleIndex(
+            buffer=buffer,
+            offsets=offsets,
+            parse=self.parse_article,
+            cache_size=self.cache_size,
+            parse_header=self.parse_header,
+        )
+
+    def scan_offsets(self, buffer) -> Iterator[Tuple[str, int, int]]:
+        """Finds the articles in the file for lazy mode.
+
+        Args:
+            buffer (bytes-like): The content of the file.
+
+        Returns:
+            Iterator[Tuple[str, int, int]]: The identifier, the byte offset, and the byte length
+            of the articles in the file.
+        """
+        raise NotImplementedError(f"{self.__class__.__name__} does not support lazy mode.")
+
+    def parse_article(self, data: bytes) -> Article:
+        """Parses an article from the bytes found by scan_offsets in lazy mode.
+
+        Args:
+            data (bytes): The raw article.
+
+        Returns:
+            Article: The parsed article.
+        """
+        return Article.model_validate_json(data)
+
+    def parse_header(self, data: bytes) -> ArticleHeader:
+        """Parses the header of an article from the bytes found by scan_offsets in lazy mode.
+
+        Args:
+            data (bytes): The raw article.
+
+        Returns:
+            ArticleHeader: The parsed header, without the text of the article.
+        """
+        return ArticleHeader.model_validate_json(data)
+
+    def iter_headers(self) -> Iterator[ArticleHeader]:
+        if isinstance(self.index, FileArticleIndex):
+            return self.index.iter_headers()
+        return super().iter_headers()
+
+    def _get_fields(self, article_id: str, fields: Tuple[str, ...]) -> Optional[Dict[str, Any]]:
+        if "text" in fields or not isinstance(self.index, FileArticleIndex):
+            return super()._get_fields(article_id, fields)
+        try:
+            header = self.index.get_header(article_id)
+        except KeyError:
+            return None
+        return { field: getattr(header, field) for field in fields }
+
+    def _read_offsets(self, stat: os.stat_result) -> Optional[ArticleOffsets]:
+        try:
+            data = json.loads(self.index_filepath.read_text())
+        except (OSError, ValueError):
+            return None
+        if data.get("size") != stat.st_size or data.get("mtime_ns") != stat.st_mtime_ns:
+            return None
+        return { article_id: (offset, length) for article_id, offset, length in data["offsets"] }
+
+    def _write_offsets(self, stat: os.stat_result, offsets: ArticleOffsets) -> None:
+        data = {
+            "size": stat.st_size,
+            "mtime_ns": stat.st_mtime_ns,
+            "offsets": [[article_id, offset, length]
+                        for article_id, (offset, length) in offsets.items()],
+        }
+        tmp_path = self.index_filepath.with_name(self.index_filepath.name + ".tmp")
+        try:
+            tmp_path.write_text(json.dumps(data))
+            os.replace(tmp_path, self.index_filepath)
+        except OSError:
+            # The sidecar is only an optimization, e.g. the directory might be read-only.
+            pass
 
     @abstractmethod
-    def load(self, **kwargs) -> List[Article]:
+    def load(self, **kwargs) -> Iterable[Article]:
         """Abstract method to load the articles from the file.
 
+        Implementations may return a lazy iterator, so that the articles are added to the
+        in-memory index one at a time.
+
         Returns:
-            List[Article]: A list of the loaded articles.
+            Iterable[Article]: The loaded articles.
         """
         ...
 
@@ -45,17 +371,151 @@ class MutableFileKnowledgeBase(FileKnowledgeBase, MutableInMemoryKnowledgeBase):
 
     Mutating the knowledge base changes the articles only in the in-memory cache and they are not
     saved automatically. Users should explicitly call the save method.
+
+    Saving rewrites the whole file. The new content is written into a temporary file that
+    replaces the original one only when it is complete, so a crash during save does not corrupt
+    the knowledge base.
+
+    In journal mode, save appends only the changes made since the previous save to a journal file
+    next to the data file (with an additional ``.log`` suffix). The journal is replayed over the
+    data file when the knowledge base is opened, and it is merged into the data file by the
+    compact method.
+
+    Saving a knowledge base that was not modified since it was opened or saved does not write
+    the file. With skip_unchanged, writing an article with the same content_hash as the stored
+    article with the same identifier is ignored, so re-ingesting unchanged articles neither
+    modifies the knowledge base nor bumps the last_modified timestamps of the stored articles.
+
+    Args:
+        journal (bool): Set to True to save the changes into a journal file. Defaults to False.
+        skip_unchanged (bool): Set to True to ignore the writes that do not change the content
+            of the articles. Defaults to False.
+        **kwargs: The arguments of FileKnowledgeBase.
     """
 
-    def save(self, **kwargs) -> None:
-        """Saves the in-memory copy of the articles to the file."""
-        self.do_save(articles=self.index.values(), **kwargs)
+    def __init__(
+        self, *args, journal: bool = False, skip_unchanged: bool = False, **kwargs
+    ) -> None:
+        self.journal = journal
+        self.skip_unchanged = skip_unchanged
+        self._pending: Dict[str, Optional[Article]] = {}
+        self._modified = False
+        super().__init__(*args, **kwargs)
+
+    def open(self) -> None:
+        super().open()
+        self._modified = False
+
+    def __setitem__(self, __key: str, __value: Article) -> None:
+        if self.skip_unchanged:
+            stored = self.index.get(__key)
+            if stored is not None and content_hash(stored) == content_hash(__value):
+                return
+        super().__setitem__(__key, __value)
+        self._modified = True
+        if self.journal:
+            self._pending[__key] = __value
+
+    def __delitem__(self, __key: str) -> None:
+        super().__delitem__(__key)
+        self._modified = True
+        if self.journal:
+            self._pending[__key] = None
+
+    @property
+    def modified(self) -> bool:
+        """True if the knowledge base was modified since it was opened or saved."""
+        return self._modified
+
+    def save(self, force: bool = False, **kwargs) -> None:
+        """Saves the in-memory copy of the articles to the file.
+
+        In journal mode only the changes since the previous save are appended to the journal.
+        Nothing is written if the knowledge base was not modified, unless the file or the journal
+        has to be (re)created.
+
+        Args:
+            force (bool): Set to True to rewrite the file even if nothing changed.
+                Defaults to False.
+        """
+        if self.journal:
+            self._append_journal()
+        elif (
+            force
+            or self._modified
+            or not self.filepath.is_file()
+            or self.journal_filepath.exists()
+        ):
+            self.compact(**kwargs)
+
+    def compact(self, **kwargs) -> None:
+        """Rewrites the file with all articles atomically and removes the journal."""
+        tmp_path = self.filepath.with_name(self.filepath.name + ".tmp")
+        with instrumentation.operation(
+            "file.save", backend=type(self).__name__, path=str(self.filepath)
+        ) as op:
+            self.do_save(articles=iter(self), filepath=tmp_path, **kwargs)
+            with open(tmp_path, "rb+") as f:
+                os.fsync(f.fileno())
+                if op.recording:
+                    op.items = len(self.index)
+                    op.bytes = os.fstat(f.fileno()).st_size
+            old_index = self.index if isinstance(self.index, FileArticleIndex) else None
+            if old_index is not None:
+                # A memory-mapped file can not be replaced on Windows.
+                old_index.close()
+            try:
+                os.replace(tmp_path, self.filepath)
+            except BaseException:
+                if old_index is not None and isinstance(old_index.buffer, mmap.mmap):
+                    with open(self.filepath, "rb") as f:
+                        old_index.buffer = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+                raise
+            _fsync_directory(self.filepath.parent)
+        # Replaying the journal over the new file would be idempotent, so a crash here is safe.
+        try:
+            self.journal_filepath.unlink()
+        except FileNotFoundError:
+            pass
+        self._journal_size = None
+        self._pending.clear()
+        self._modified = False
+        if self.lazy or old_index is not None:
+            self.open()
+
+    def _append_journal(self) -> None:
+        if not self._pending:
+            return
+        if self._journal_size is not None:
+            os.truncate(self.journal_filepath, self._journal_size)
+            self._journal_size = None
+        with instrumentation.operation(
+            "file.append_journal", backend=type(self).__name__, path=str(self.journal_filepath)
+        ) as op, open(self.journal_filepath, "ab") as f:
+            start = f.tell()
+            for key, article in self._pending.items():
+                if article is None:
+                    entry = { "op": "delete", "id": key }
+                else:
+                    entry = { "op": "put", "id": key, "article": article.model_dump(mode="json") }
+                f.write(json.dumps(entry).encode("utf-8"))
+                f.write(b"\n")
+            f.flush()
+            os.fsync(f.fileno())
+            op.items = len(self._pending)
+            op.bytes = f.tell() - start
+        self._pending.clear()
+        self._modified = False
 
     @abstractmethod
-    def do_save(self, articles: Iterable[Article], **kwargs) -> None:
+    def do_save(
+        self, articles: Iterable[Article], filepath: Optional[Path] = None, **kwargs
+    ) -> None:
         """Abstract method to save the articles to the file.
 
         Args:
             articles (Iterable[Article]): The articles to be saved.
+            filepath (Optional[Path]): The path of the file to write. Defaults to None, meaning
+                the filepath attribute.
         """
         ...
@@ -1,19 +1,244 @@
-from typing import Iterable, Iterator, Dict, List, Optional
+from typing import Any, Iterable, Iterator, Dict, List, Optional, TextIO, Tuple
 from pathlib import Path
+import json
+import re
 
 from pyknowbase.model import Article
 
+from . import StrPath
 from .file import FileKnowledgeBase, MutableFileKnowledgeBase
 from ..model import Articles
 
+_WHITESPACE = " \t\n\r"
+_STRUCTURAL = re.compile(r'["\[\]{},]')
+_STRING_SPECIAL = re.compile(r'["\\]')
+
+
+def iter_json_array(fp: TextIO, chunk_size: int = 1 << 16) -> Iterator[Any]:
+    """Incrementally decodes the elements of a JSON array from a text file.
+
+    The file is read in chunks, and only the currently decoded element is kept in the memory.
+    The end of each element is found by scanning its characters once, and the element is decoded
+    only when the delimiter following it was found, so the decoding time is linear also for
+    elements that span many chunks.
+
+    Args:
+        fp (TextIO): The file containing a JSON array.
+        chunk_size (int): The number of characters read from the file at once.
+            Defaults to 65536.
+
+    Raises:
+        ValueError: If the file does not contain a valid JSON array.
+
+    Returns:
+        Iterator[Any]: The decoded elements of the array.
+    """
+    for element, _, _ in _scan_json_array(fp, chunk_size, track_offsets=False):
+        yield element
+
+
+def iter_json_array_offsets(
+    fp: TextIO, chunk_size: int = 1 << 16
+) -> Iterator[Tuple[Any, int, int]]:
+    """Incrementally decodes the elements of a JSON array from an UTF-8 encoded text file, and
+    returns also their position in the file.
+
+    The offsets are counted on the characters read from the file, so the file should be opened
+    with ``newline=""``: with the default universal newlines mode, the line breaks of files with
+    CRLF line endings are read as a single character, and the offsets would be wrong.
+
+    Args:
+        fp (TextIO): The file containing a JSON array, opened with UTF-8 encoding.
+        chunk_size (int): The number of characters read from the file at once.
+            Defaults to 65536.
+
+    Raises:
+        ValueError: If the file does not contain a valid JSON array.
+
+    Returns:
+        Iterator[Tuple[Any, int, int]]: Tuples of the decoded elements, and the byte offset and
+        the byte length of their JSON representation in the file.
+    """
+    return _scan_json_array(fp, chunk_size, track_offsets=True)
+
+
+def _scan_json_array(
+    fp: TextIO, chunk_size: int, track_offsets: bool
+) -> Iterator[Tuple[Any, int, int]]:
+    buffer = ""
+    pos = 0
+    # The byte offset in the file of the character at char_pos in the buffer.
+    char_pos = 0
+    byte_pos = 0
+
+    def byte_offset(index: int) -> int:
+        nonlocal char_pos, byte_pos
+        if track_offsets:
+            byte_pos += len(buffer[char_pos:index].encode("utf-8"))
+            char_pos = index
+        return byte_pos
+
+    def fill() -> bool:
+        # Called only when the whole buffer was consumed.
+        nonlocal buffer, pos, char_pos
+        chunk = fp.read(chunk_size)
+        if not chunk:
+            return False
+        byte_offset(len(buffer))
+        buffer = chunk
+        pos = 0
+        char_pos = 0
+        return True
+
+    def next_char() -> str:
+        nonlocal pos
+        while True:
+            while pos < len(buffer) and buffer[pos] in _WHITESPACE:
+                pos += 1
+            if pos < len(buffer):
+                return buffer[pos]
+            if not fill():
+                raise ValueError("Unexpected end of JSON array.")
+
+    def read_element() -> str:
+        # Finds the delimiter after the element at pos, keeping the position of the scan and the
+        # nesting state across the chunks, so each character is scanned only once. The text of
+        # the element is returned, and pos is left at the delimiter.
+        nonlocal pos
+        pieces: List[str] = []
+        depth = 0
+        in_string = False
+        scan = pos
+        while True:
+            match = (_STRING_SPECIAL if in_string else _STRUCTURAL).search(buffer, scan)
+            if match is None:
+                pieces.append(buffer[pos:])
+                # An escape character at the end of the chunk escapes the first character of
+                # the next chunk.
+                carry = max(0, scan - len(buffer))
+                pos = len(buffer)
+                if not fill():
+                    raise ValueError("Unexpected end of JSON array.")
+                scan = carry
+                continue
+            index = match.start()
+            char = buffer[index]
+            scan = index + 1
+            if in_string:
+                if char == "\\":
+                    scan += 1
+                else:
+                    in_string = False
+            elif char == '"':
+                in_string = True
+            elif char in "[{":
+                depth += 1
+            elif depth == 0 and char in ",]":
+                pieces.append(buffer[pos:index])
+                pos = index
+                return "".join(pieces)
+            elif char in "]}":
+                if depth == 0:
+                    raise ValueError(f"Invalid JSON array: unexpected character {char!r}.")
+                depth -= 1
+
+    if next_char() != "[":
+        raise ValueError("The JSON document is not an array.")
+    pos += 1
+    if next_char() == "]":
+        return
+    while True:
+        next_char()
+        start_offset = byte_offset(pos)
+        text = read_element()
+        try:
+            element = json.loads(text)
+        except json.JSONDecodeError as error:
+            raise ValueError(f"Invalid JSON array: {error}") from error
+        length = len(text.rstrip(_WHITESPACE).encode("utf-8")) if track_offsets else 0
+        yield element, start_offset, length
+        separator = buffer[pos]
+        pos += 1
+        if separator == "]":
+            return
+
+
+def write_json_array(fp: TextIO, articles: Iterable[Article], **kwargs) -> None:
+    """Writes articles into a text file as a JSON array, one article at a time.
+
+    Args:
+        fp (TextIO): The file to write to.
+        articles (Iterable[Article]): The articles.
+        **kwargs: Keyword arguments of Article.model_dump_json, for example indent.
+    """
+    separator = "["
+    for article in articles:
+        fp.write(separator)
+        fp.write(article.model_dump_json(**kwargs))
+        separator = ","
+    fp.write("]" if separator == "," else "[]")
+
+
 class JsonKnowledgeBase(FileKnowledgeBase):
+    """A knowledge base loaded from a JSON file containing an array of articles.
+
+    In streaming mode the file is decoded incrementally, one article at a time, so the peak
+    memory usage of loading is not a multiple of the file size. The decoded articles are
+    trusted to have been written by this library, see Article.from_trusted, unless validate is
+    set. Without streaming, the whole file is validated, which is faster than decoding it first.
+
+    The knowledge base supports also the lazy mode of FileKnowledgeBase.
+
+    Args:
+        filename (StrPath): The file name
+        name (Optional[str]): The name of the knowledge base. Defaults to None.
+        streaming (bool): Set to True to load and save the file incrementally.
+            Defaults to False.
+        validate (bool): Set to True to validate the articles also in streaming mode, for
+            example if the file is edited by hand. Defaults to False.
+        **kwargs: Additional keyword arguments of FileKnowledgeBase, for example lazy.
+    """
 
-    def load(self, **kwargs) -> List[Article]:
+    def __init__(
+        self,
+        filename: StrPath,
+        name: Optional[str] = None,
+        streaming: bool = False,
+        validate: bool = False,
+        **kwargs,
+    ) -> None:
+        self.streaming = streaming
+        self.validate = validate
+        super().__init__(filename=filename, name=name, **kwargs)
+
+    def load(self, **kwargs) -> Iterable[Article]:
+        if self.streaming:
+            return self._iter_articles(**kwargs)
         return Articles.model_validate_json(self.filepath.read_text(), **kwargs).root
 
+    def scan_offsets(self, buffer) -> Iterator[Tuple[str, int, int]]:
+        with open(self.filepath, encoding="utf-8", newline="") as fp:
+            for data, offset, length in iter_json_array_offsets(fp):
+                yield data["id"], offset, length
+
+    def _iter_articles(self, **kwargs) -> Iterator[Article]:
+        with open(self.filepath, encoding="utf-8") as fp:
+            for data in iter_json_array(fp):
+                if self.validate:
+                    yield Article.model_validate(data, **kwargs)
+                else:
+                    yield Article.from_trusted(data)
+
 
 class MutableJSONFileKnowledgeBase(JsonKnowledgeBase, MutableFileKnowledgeBase):
 
-    def do_save(self, articles: Iterable[Article], **kwargs) -> None:
+    def do_save(
+        self, articles: Iterable[Article], filepath: Optional[Path] = None, **kwargs
+    ) -> None:
+        filepath = filepath or self.filepath
+        if self.streaming:
+            with open(filepath, "w", encoding="utf-8") as fp:
+                write_json_array(fp, articles, **kwargs)
+            return
         arts =  Articles(list(articles))
-        self.filepath.write_text(arts.model_dump_json(**kwargs))
+        filepath.write_text(arts.model_dump_json(**kwargs))
@@ -0,0 +1,68 @@
+from typing import Iterable, Iterator, Optional, TextIO, Tuple
+import json
+from pathlib import Path
+
+from .file import FileKnowledgeBase, MutableFileKnowledgeBase
+from ..model import Article
+
+
+def iter_json_lines(fp: TextIO, **kwargs) -> Iterator[Article]:
+    """Reads articles from a JSON Lines text file, one article at a time.
+
+    Args:
+        fp (TextIO): The file containing one JSON encoded article per line. Empty lines are
+            ignored.
+        **kwargs: Keyword arguments of Article.model_validate_json.
+
+    Returns:
+        Iterator[Article]: The articles.
+    """
+    for line in fp:
+        if line.strip():
+            yield Article.model_validate_json(line, **kwargs)
+
+
+def write_json_lines(fp: TextIO, articles: Iterable[Article]) -> None:
+    """Writes articles into a text file in JSON Lines format, one article at a time.
+
+    Args:
+        fp (TextIO): The file to write to.
+        articles (Iterable[Article]): The articles.
+    """
+    for article in articles:
+        fp.write(article.model_dump_json())
+        fp.write("\n")
+
+
+class JsonLinesKnowledgeBase(FileKnowledgeBase):
+    """A knowledge base loaded from a JSON Lines file that contains one article per line.
+
+    The file is always loaded incrementally, so the peak memory usage of loading is bounded by
+    the in-memory index and a single article. The knowledge base supports also the lazy mode of
+    FileKnowledgeBase.
+    """
+
+    def load(self, **kwargs) -> Iterable[Article]:
+        with open(self.filepath, encoding="utf-8") as fp:
+            yield from iter_json_lines(fp, **kwargs)
+
+    def scan_offsets(self, buffer) -> Iterator[Tuple[str, int, int]]:
+        offset = 0
+        size = len(buffer)
+        while offset < size:
+            end = buffer.find(b"\n", offset)
+            if end < 0:
+                end = size
+            line = buffer[offset:end]
+            if line.strip():
+                yield json.loads(line)["id"], offset, end - offset
+            offset = end + 1
+
+
+class MutableJsonLinesKnowledgeBase(JsonLinesKnowledgeBase, MutableFileKnowledgeBase):
+
+    def do_save(
+        self, articles: Iterable[Article], filepath: Optional[Path] = None, **kwargs
+    ) -> None:
+        with open(filepath or self.filepath, "w", encoding="utf-8") as fp:
+            write_json_lines(fp, articles)
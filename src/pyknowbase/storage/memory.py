@@ -1,16 +1,81 @@
-from typing import Dict, Iterator
+from typing import Any, Dict, Iterable, Iterator, List, MutableMapping, Optional, Set
 
 from pyknowbase.model import Article
 
-from ..model import KnowledgeBase, MutableKnowledgeBase, Article
+from ..model import (
+    KnowledgeBase, MutableKnowledgeBase, Article, ArticleFilter, article_matches, equality_values
+)
+
+
+class MetadataIndex:
+    """A secondary index mapping the values of a metadata key to the keys of the articles.
+
+    Only hashable metadata values are indexed.
+
+    Args:
+        field (str): The metadata key.
+    """
+
+    def __init__(self, field: str) -> None:
+        self.field = field
+        self.keys: Dict[Any, Set[str]] = {}
+
+    def add(self, key: str, article: Article) -> None:
+        value = article.metadata.get(self.field)
+        try:
+            self.keys.setdefault(value, set()).add(key)
+        except TypeError:
+            pass
+
+    def remove(self, key: str, article: Article) -> None:
+        value = article.metadata.get(self.field)
+        try:
+            keys = self.keys.get(value)
+        except TypeError:
+            return
+        if keys is not None:
+            keys.discard(key)
+            if not keys:
+                del self.keys[value]
+
+    def lookup(self, values: Iterable[Any]) -> Optional[Set[str]]:
+        """Finds the keys of the articles having any of the values.
+
+        Args:
+            values (Iterable[Any]): The values.
+
+        Returns:
+            Optional[Set[str]]: The keys, or None if some of the values can not be looked up.
+        """
+        result: Set[str] = set()
+        for value in values:
+            try:
+                result |= self.keys.get(value, set())
+            except TypeError:
+                return None
+        return result
+
 
 class InMemoryKnowledgeBase(KnowledgeBase):
+    """A knowledge base keeping the articles in a dictionary.
+
+    Secondary indexes can be declared on metadata keys, so the query method looks up the articles
+    with equality and "in" conditions on these keys without iterating over the knowledge base.
+
+    Args:
+        name (str): The name of the knowledge base.
+        indexed_fields (Iterable[str]): The metadata keys to be indexed. Defaults to ().
+    """
 
-    index: Dict[str, Article]
+    index: MutableMapping[str, Article]
+    metadata_indexes: Dict[str, MetadataIndex]
 
-    def __init__(self, name: str) -> None:
+    def __init__(self, name: str, indexed_fields: Iterable[str] = ()) -> None:
         self.name = name
         self.index = {}
+        self.metadata_indexes = {}
+        for field in indexed_fields:
+            self.create_index(field)
 
     def __iter__(self) -> Iterator[Article]:
         return iter(self.index.values())
@@ -18,11 +83,63 @@ class InMemoryKnowledgeBase(KnowledgeBase):
     def __getitem__(self, __key: str) -> Article:
         return self.index[__key]
 
+    def get_many(self, ids: Iterable[str]) -> Dict[str, Article]:
+        index = self.index
+        return { article_id: index[article_id] for article_id in ids if article_id in index }
+
+    def iter_ids(self) -> Iterator[str]:
+        return iter(self.index)
+
+    def create_index(self, field: str) -> None:
+        """Creates a secondary index on a metadata key.
+
+        Args:
+            field (str): The metadata key.
+        """
+        metadata_index = MetadataIndex(field)
+        for key, article in self.index.items():
+            metadata_index.add(key, article)
+        self.metadata_indexes[field] = metadata_index
+
+    def rebuild_indexes(self) -> None:
+        """Rebuilds the secondary indexes from the articles."""
+        for field in list(self.metadata_indexes):
+            self.create_index(field)
+
+    def query(self, filter: ArticleFilter) -> Iterator[Article]:
+        candidates: Optional[Set[str]] = None
+        for field, condition in filter.items():
+            metadata_index = self.metadata_indexes.get(field)
+            values = equality_values(condition) if metadata_index is not None else None
+            keys = metadata_index.lookup(values) if values is not None else None
+            if keys is not None:
+                candidates = keys if candidates is None else candidates & keys
+        if candidates is None:
+            return super().query(filter)
+        articles: List[Article] = []
+        for key in candidates:
+            article = self.index.get(key)
+            if article is not None and article_matches(article, filter):
+                articles.append(article)
+        return iter(articles)
+
 
 class MutableInMemoryKnowledgeBase(InMemoryKnowledgeBase, MutableKnowledgeBase):
 
     def __setitem__(self, __key: str, __value: Article) -> None:
+        if self.metadata_indexes:
+            self._unindex(__key)
+            for metadata_index in self.metadata_indexes.values():
+                metadata_index.add(__key, __value)
         self.index[__key] = __value
 
     def __delitem__(self, __key: str) -> None:
+        if self.metadata_indexes:
+            self._unindex(__key)
         del self.index[__key]
+
+    def _unindex(self, key: str) -> None:
+        previous = self.index.get(key)
+        if previous is not None:
+            for metadata_index in self.metadata_indexes.values():
+                metadata_index.remove(key, previous)
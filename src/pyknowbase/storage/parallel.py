@@ -0,0 +1,156 @@
+from typing import Callable, Iterable, Iterator, List, Optional, Sequence, TypeVar
+import itertools
+import queue
+import threading
+
+T = TypeVar("T")
+
+_DONE = object()
+
+
+def chunked(iterable: Iterable[T], size: int) -> Iterator[List[T]]:
+    """Splits an iterable into lists of at most size elements, consuming it lazily."""
+    iterator = iter(iterable)
+    while True:
+        chunk = list(itertools.islice(iterator, size))
+        if not chunk:
+            return
+        yield chunk
+
+
+class _Failure:
+
+    def __init__(self, error: BaseException) -> None:
+        self.error = error
+
+
+def iterate_parallel(
+    sources: Sequence[Callable[[], Iterable[T]]],
+    max_workers: Optional[int] = None,
+    queue_size: int = 1000,
+) -> Iterator[T]:
+    """Consumes several iterables concurrently and yields their elements as they arrive.
+
+    Each source is a callable returning an iterable, that is consumed in a worker thread. The
+    elements are passed to the caller through a bounded queue, so the workers are paused when
+    the caller does not keep up with them, and the memory usage stays flat. The order of the
+    elements is not specified. If a source raises an exception, it is re-raised in the caller.
+    Closing the returned generator stops the workers.
+
+    Args:
+        sources (Sequence[Callable[[], Iterable[T]]]): The factories of the iterables.
+        max_workers (Optional[int]): The number of worker threads. If None, one thread is started
+            for each source. Defaults to None.
+        queue_size (int): The maximum number of elements buffered in the queue. Defaults to 1000.
+
+    Returns:
+        Iterator[T]: The elements of all iterables.
+    """
+    pending: "queue.Queue[Callable[[], Iterable[T]]]" = queue.Queue()
+    for source in sources:
+        pending.put(source)
+    results: "queue.Queue" = queue.Queue(maxsize=queue_size)
+    stopped = threading.Event()
+    num_workers = min(max_workers or len(sources), len(sources))
+
+    def put(element: object) -> bool:
+        while not stopped.is_set():
+            try:
+                results.put(element, timeout=0.1)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    def work() -> None:
+        try:
+            while not stopped.is_set():
+                try:
+                    source = pending.get_nowait()
+                except queue.Empty:
+                    break
+                for element in source():
+                    if not put(element):
+                        return
+        except BaseException as error:  # noqa: B036
+            put(_Failure(error))
+        finally:
+            put(_DONE)
+
+    workers = [threading.Thread(target=work, daemon=True) for _ in range(num_workers)]
+    for worker in workers:
+        worker.start()
+    try:
+        running = num_workers
+        while running:
+            element = results.get()
+            if element is _DONE:
+                running -= 1
+            elif isinstance(element, _Failure):
+                raise element.error
+            else:
+                yield element
+    finally:
+        stopped.set()
+        for worker in workers:
+            worker.join()
+
+
+def consume_parallel(
+    elements: Iterable[T],
+    consume: Callable[[T], None],
+    max_workers: int = 1,
+    queue_size: Optional[int] = None,
+) -> None:
+    """Processes the elements of an iterable with a pool of worker threads.
+
+    The iterable is consumed in the calling thread, and the elements are passed to the workers
+    through a bounded queue, so reading is paused when the workers do not keep up with it, and
+    the memory usage stays flat. This is the counterpart of iterate_parallel for writing, for
+    example the batches of articles read from a knowledge base can be written into another one
+    while the next batches are being read. If consume raises an exception, the remaining elements
+    are skipped, and the exception is re-raised in the caller.
+
+    Args:
+        elements (Iterable[T]): The elements.
+        consume (Callable[[T], None]): The function processing an element in a worker thread.
+        max_workers (int): The number of worker threads. Defaults to 1.
+        queue_size (Optional[int]): The maximum number of elements waiting in the queue. If None,
+            twice the number of workers. Defaults to None.
+    """
+    tasks: "queue.Queue" = queue.Queue(maxsize=queue_size or 2 * max_workers)
+    stopped = threading.Event()
+    errors: List[BaseException] = []
+
+    def work() -> None:
+        while True:
+            element = tasks.get()
+            if element is _DONE:
+                return
+            if stopped.is_set():
+                # Drain the queue so the producer is not blocked.
+                continue
+            try:
+                consume(element)
+            except BaseException as error:  # noqa: B036
+                errors.append(error)
+                stopped.set()
+
+    workers = [threading.Thread(target=work, daemon=True) for _ in range(max_workers)]
+    for worker in workers:
+        worker.start()
+    try:
+        for element in elements:
+            if stopped.is_set():
+                break
+            tasks.put(element)
+    except BaseException:
+        stopped.set()
+        raise
+    finally:
+        for _ in workers:
+            tasks.put(_DONE)
+        for worker in workers:
+            worker.join()
+    if errors:
+        raise errors[0]
@@ -0,0 +1,189 @@
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Optional, Sequence, Tuple, TypeVar
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+import zlib
+
+from ..model import (
+    KnowledgeBase, MutableKnowledgeBase, Article, ArticleFilter, ArticleHeader
+)
+from .parallel import chunked, iterate_parallel
+
+T = TypeVar("T")
+
+WRITE_CHUNK_SIZE = 1000
+"""The number of articles distributed to the shards at once by the bulk writes."""
+
+
+def shard_of(article_id: str, shards: int) -> int:
+    """Assigns an article identifier to a shard.
+
+    The assignment is stable across processes and python versions, unlike the built-in hash of
+    strings.
+
+    Args:
+        article_id (str): The identifier of the article.
+        shards (int): The number of shards.
+
+    Returns:
+        int: The index of the shard, between 0 and shards - 1.
+    """
+    return zlib.crc32(article_id.encode("utf-8")) % shards
+
+
+class ShardedKnowledgeBase(KnowledgeBase):
+    """A knowledge base partitioned across several child knowledge bases by article identifier.
+
+    Each article lives in exactly one shard, chosen by shard_of. Lookups are routed to the
+    shard of the article, and iteration, listing and queries fan out to all shards concurrently,
+    so the order of the articles is not specified. The shards can be any knowledge bases, for
+    example knowledge bases in different DynamoDB tables or files::
+
+        kb = MutableShardedKnowledgeBase([
+            MutableJsonLinesKnowledgeBase(f"kb-{shard}.jsonl") for shard in range(4)
+        ])
+
+    The number and the order of the shards must not change after articles were written, because
+    that would move the articles to different shards.
+
+    Args:
+        shards (Sequence[KnowledgeBase]): The child knowledge bases.
+        name (Optional[str]): The name of the knowledge base. If None, the name of the first
+            shard is used. Defaults to None.
+        max_workers (Optional[int]): The number of threads reading the shards concurrently. If
+            None, one thread is used for each shard. Defaults to None.
+
+    Raises:
+        ValueError: If no shards are given.
+    """
+
+    shards: Sequence[KnowledgeBase]
+
+    def __init__(self,
+        shards: Sequence[KnowledgeBase],
+        name: Optional[str] = None,
+        max_workers: Optional[int] = None,
+    ) -> None:
+        if not shards:
+            raise ValueError("A sharded knowledge base needs at least one shard.")
+        self.shards = list(shards)
+        self.name = name or self.shards[0].name
+        self.max_workers = max_workers
+
+    def shard(self, article_id: str) -> KnowledgeBase:
+        """Returns the shard storing an article.
+
+        Args:
+            article_id (str): The identifier of the article.
+
+        Returns:
+            KnowledgeBase: The shard.
+        """
+        return self.shards[shard_of(article_id, len(self.shards))]
+
+    def _fan_out(self, method: Callable[[Any], Iterable[T]]) -> Iterator[T]:
+        if len(self.shards) == 1:
+            return iter(method(self.shards[0]))
+        sources = [lambda shard=shard: method(shard) for shard in self.shards]
+        return iterate_parallel(sources, max_workers=self.max_workers)
+
+    def _group(self, keys: Iterable[str]) -> Dict[int, List[str]]:
+        groups: Dict[int, List[str]] = {}
+        for key in keys:
+            groups.setdefault(shard_of(key, len(self.shards)), []).append(key)
+        return groups
+
+    def __iter__(self) -> Iterator[Article]:
+        return self._fan_out(iter)
+
+    def __getitem__(self, __key: str) -> Article:
+        return self.shard(__key)[__key]
+
+    def get_many(self, ids: Iterable[str]) -> Dict[str, Article]:
+        """Retrieves several articles with concurrent get_many calls of the shards.
+
+        Args:
+            ids (Iterable[str]): The identifiers of the articles.
+
+        Returns:
+            Dict[str, Article]: The found articles keyed by their identifiers.
+        """
+        groups = list(self._group(ids).items())
+        if len(groups) <= 1:
+            return { key: article for index, keys in groups
+                     for key, article in self.shards[index].get_many(keys).items() }
+        result: Dict[str, Article] = {}
+        with ThreadPoolExecutor(max_workers=self.max_workers or len(groups)) as executor:
+            for found in executor.map(lambda group: self.shards[group[0]].get_many(group[1]),
+                                      groups):
+                result.update(found)
+        return result
+
+    def _get_fields(self, article_id: str, fields: Tuple[str, ...]) -> Optional[Dict[str, Any]]:
+        return self.shard(article_id).get(article_id, fields=fields)
+
+    def iter_ids(self) -> Iterator[str]:
+        return self._fan_out(lambda shard: shard.iter_ids())
+
+    def iter_headers(self) -> Iterator[ArticleHeader]:
+        return self._fan_out(lambda shard: shard.iter_headers())
+
+    @property
+    def complete_versions(self) -> bool:  # type: ignore[override]
+        return all(shard.complete_versions for shard in self.shards)
+
+    def iter_versions(self) -> Iterator[Tuple[str, datetime]]:
+        return self._fan_out(lambda shard: shard.iter_versions())
+
+    def query(self, filter: ArticleFilter) -> Iterator[Article]:
+        return self._fan_out(lambda shard: shard.query(filter))
+
+
+class MutableShardedKnowledgeBase(ShardedKnowledgeBase, MutableKnowledgeBase):
+    """A mutable knowledge base partitioned across several child knowledge bases.
+
+    Writes are routed to the shard of the article. Bulk writes are split into chunks of
+    WRITE_CHUNK_SIZE articles, and the articles of each chunk are written to their shards
+    concurrently, one thread per shard. Set max_workers to 1 if the shards share a resource that
+    is not thread safe.
+    """
+
+    shards: Sequence[MutableKnowledgeBase]
+
+    def __init__(self,
+        shards: Sequence[MutableKnowledgeBase],
+        name: Optional[str] = None,
+        max_workers: Optional[int] = None,
+    ) -> None:
+        super().__init__(shards=shards, name=name, max_workers=max_workers)
+
+    def __setitem__(self, __key: str, __value: Article) -> None:
+        self.shards[shard_of(__key, len(self.shards))][__key] = __value
+
+    def __delitem__(self, __key: str) -> None:
+        del self.shards[shard_of(__key, len(self.shards))][__key]
+
+    def put_articles(self, articles: Iterable[Article]) -> None:
+        for chunk in chunked(articles, WRITE_CHUNK_SIZE):
+            groups: Dict[int, List[Article]] = {}
+            for article in chunk:
+                groups.setdefault(shard_of(article.id, len(self.shards)), []).append(article)
+            self._write(groups, lambda shard, group: shard.put_articles(group))
+
+    def delete_articles(self, article_ids: Iterable[str]) -> None:
+        for chunk in chunked(article_ids, WRITE_CHUNK_SIZE):
+            self._write(self._group(chunk), lambda shard, group: shard.delete_articles(group))
+
+    def _write(
+        self,
+        groups: Dict[int, List[Any]],
+        write: Callable[[MutableKnowledgeBase, List[Any]], None],
+    ) -> None:
+        if len(groups) <= 1:
+            for index, group in groups.items():
+                write(self.shards[index], group)
+            return
+        with ThreadPoolExecutor(max_workers=self.max_workers or len(groups)) as executor:
+            futures = [executor.submit(write, self.shards[index], group)
+                       for index, group in groups.items()]
+            for future in futures:
+                future.result()
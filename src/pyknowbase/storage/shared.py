@@ -0,0 +1,145 @@
+"""A read-only knowledge base shared by several processes, for example the workers of a
+gunicorn server or of a multiprocessing pool.
+
+The articles are stored once, in the binary file format of the binary module, and every process
+memory-maps the same file. The operating system keeps a single copy of the file in its page
+cache, so adding workers does not multiply the memory used by the articles. By default the file
+is created in the shared memory file system (``/dev/shm``) if it is available.
+
+The parent process publishes the knowledge base, and the workers attach to it::
+
+    shared_kb = SharedKnowledgeBase.publish(MutableJSONFileKnowledgeBase("kb.json"))
+
+    def work(kb: SharedKnowledgeBase, article_id: str) -> str:
+        return kb[article_id].text
+
+    with multiprocessing.Pool() as pool:
+        texts = pool.starmap(work, [(shared_kb, article_id) for article_id in article_ids])
+
+    shared_kb.unlink()
+
+A SharedKnowledgeBase is pickled as the path of its file, so passing it to a worker process
+only attaches the worker to the file. Forked workers inherit the memory mapping of the parent.
+"""
+
+from typing import Any, Optional, Tuple, cast
+from pathlib import Path
+import os
+import tempfile
+
+from . import StrPath
+from .binary import BinaryArticleIndex, BinaryKnowledgeBase
+from ..model import KnowledgeBase
+
+SHARED_MEMORY_DIR = Path("/dev/shm")
+"""The directory of the shared memory file system on Linux."""
+
+
+def _default_directory() -> Optional[str]:
+    return str(SHARED_MEMORY_DIR) if SHARED_MEMORY_DIR.is_dir() else None
+
+
+class SharedKnowledgeBase(BinaryKnowledgeBase):
+    """A read-only knowledge base memory-mapped from a binary knowledge base file.
+
+    Opening the knowledge base is cheap: only the header of the file is read, and the articles
+    are decoded from the shared pages when they are accessed. The file is never modified, a new
+    version of the knowledge base is published by replacing the file atomically, and the
+    processes switch to the new version with the refresh method.
+
+    Args:
+        filename (StrPath): The path of the binary knowledge base file.
+        name (Optional[str]): The name of the knowledge base. If None, the file name is used.
+            Defaults to None.
+
+    Raises:
+        FileNotFoundError: If the file does not exist.
+    """
+
+    def __init__(self, filename: StrPath, name: Optional[str] = None) -> None:
+        self._version: Optional[Tuple[int, int]] = None
+        super().__init__(filename=filename, name=name, lazy=True)
+
+    @classmethod
+    def publish(
+        cls,
+        source: KnowledgeBase,
+        filename: Optional[StrPath] = None,
+        name: Optional[str] = None,
+    ) -> "SharedKnowledgeBase":
+        """Writes the articles of a knowledge base into a file that other processes can attach to.
+
+        The file is written next to its final path and renamed when it is complete, so the
+        processes attached to a previous version of the file keep reading that version until
+        they refresh.
+
+        Args:
+            source (KnowledgeBase): The knowledge base to share.
+            filename (Optional[StrPath]): The path of the file. If None, a new file is created
+                in the shared memory file system if it exists, otherwise in the temporary
+                directory. Defaults to None.
+            name (Optional[str]): The name of the knowledge base. If None, the name of the
+                source knowledge base is used. Defaults to None.
+
+        Raises:
+            ValueError: If the articles can not be written in the binary format.
+
+        Returns:
+            SharedKnowledgeBase: The knowledge base attached to the new file.
+        """
+        name = name or source.name
+        if filename is not None:
+            return cast(SharedKnowledgeBase, cls.from_knowledge_base(source, filename, name))
+        fd, filename = tempfile.mkstemp(
+            prefix="pyknowbase-", suffix=".pkbb", dir=_default_directory()
+        )
+        os.close(fd)
+        try:
+            return cast(SharedKnowledgeBase, cls.from_knowledge_base(source, filename, name))
+        except BaseException:
+            os.unlink(filename)
+            raise
+
+    def open(self) -> None:
+        super().open()
+        stat = self.filepath.stat()
+        self._version = (stat.st_ino, stat.st_mtime_ns)
+
+    def open_index(self) -> BinaryArticleIndex:  # type: ignore[override]
+        if not self.filepath.is_file():
+            raise FileNotFoundError(f"Shared knowledge base file {self.filepath} not found.")
+        index = super().open_index()
+        if not isinstance(index, BinaryArticleIndex):
+            # An empty file is not a valid binary knowledge base file.
+            raise ValueError(f"{self.filepath} is not a binary knowledge base file.")
+        return index
+
+    def refresh(self) -> bool:
+        """Attaches to the current version of the file if it was replaced since it was opened.
+
+        Returns:
+            bool: True if a new version was opened.
+        """
+        stat = self.filepath.stat()
+        if (stat.st_ino, stat.st_mtime_ns) == self._version:
+            return False
+        old_index = self.index
+        self.open()
+        if isinstance(old_index, BinaryArticleIndex):
+            old_index.close()
+        return True
+
+    def unlink(self) -> None:
+        """Detaches from the file and deletes it.
+
+        The processes still attached to the file can read it until they detach.
+        """
+        self.close()
+        try:
+            self.filepath.unlink()
+        except FileNotFoundError:
+            pass
+
+    def __reduce__(self) -> Tuple[Any, ...]:
+        # The memory mapping can not be pickled: the receiving process attaches to the file.
+        return (self.__class__, (str(self.filepath), self.name))
@@ -1,35 +1,115 @@
-from typing import Iterable, List, Optional
+from typing import Any, Iterable, Iterator, Optional, TextIO
 from pathlib import Path
 
 from pyknowbase.model import Article
 
 from . import StrPath
 from .file import FileKnowledgeBase, MutableFileKnowledgeBase
-from ..model import Articles
+
+
+def _import_yaml() -> Any:
+    try:
+        import yaml
+    except ImportError:
+        raise ValueError(
+            "Could not import pyyaml python package. "
+            "Please install it with `pip install pyyaml`."
+        )
+    return yaml
+
+
+def iter_yaml_articles(fp: TextIO, loader: Any) -> Iterator[Article]:
+    """Reads articles from a YAML file, one document at a time.
+
+    The file can contain a single document with the list of the articles, or a stream of
+    documents with one article each. A document is parsed as a whole before its articles are
+    returned.
+
+    Args:
+        fp (TextIO): The YAML file.
+        loader: The YAML loader class, for example yaml.CSafeLoader.
+
+    Returns:
+        Iterator[Article]: The articles.
+    """
+    yaml = _import_yaml()
+    for document in yaml.load_all(fp, Loader=loader):
+        if document is None:
+            continue
+        if isinstance(document, list):
+            for data in document:
+                yield Article.model_validate(data)
+        else:
+            yield Article.model_validate(document)
 
 
 class YamlKnowledgeBase(FileKnowledgeBase):
+    """A knowledge base loaded from a YAML file.
+
+    The file contains either a single YAML document with the list of the articles, or a stream
+    of YAML documents separated by ``---`` lines, one article per document. A stream is read
+    incrementally, one document at a time, while a single document is parsed as a whole, so
+    large knowledge bases should be saved as a stream. The C implementation of the YAML parser
+    of pyyaml (libyaml) is used when it is available, as it is much faster than the pure python
+    parser.
+
+    Args:
+        filename (StrPath): The file name.
+        name (Optional[str]): The name of the knowledge base. If None, the file name is used.
+            Defaults to None.
+        **kwargs: The arguments of FileKnowledgeBase.
+    """
 
-    def __init__(self, filename: StrPath, name: Optional[str] = None) -> None:
-        super().__init__(filename=filename, name=name)
-        try:
-            import yaml
-        except ImportError:
-            raise ValueError(
-                "Could not import pyyaml python package. "
-                "Please install it with `pip install pyyaml`."
-            )
-        self.yaml = yaml
+    def __init__(self, filename: StrPath, name: Optional[str] = None, **kwargs) -> None:
+        # The file is loaded by the constructor of the base class.
+        self.yaml = _import_yaml()
+        self.loader = getattr(self.yaml, "CSafeLoader", self.yaml.SafeLoader)
+        self.dumper = getattr(self.yaml, "CSafeDumper", self.yaml.SafeDumper)
+        super().__init__(filename=filename, name=name, **kwargs)
 
-    def load(self, **kwargs) -> List[Article]:
-        data = self.yaml.safe_load(self.filepath.read_text())
-        return Articles.model_validate(data).root
+    def load(self, **kwargs) -> Iterable[Article]:
+        with open(self.filepath, encoding="utf-8") as fp:
+            yield from iter_yaml_articles(fp, self.loader)
 
 
 class MutableYamlKnowledgeBase(YamlKnowledgeBase, MutableFileKnowledgeBase):
+    """A mutable knowledge base saved into a YAML file.
+
+    Args:
+        filename (StrPath): The file name.
+        name (Optional[str]): The name of the knowledge base. If None, the file name is used.
+            Defaults to None.
+        stream (bool): Set to True to save the articles as a stream of YAML documents, one
+            article per document, that is written incrementally. Otherwise the file contains a
+            single document with the list of the articles, which is parsed as a whole when
+            the file is loaded. Defaults to False.
+        **kwargs: The arguments of MutableFileKnowledgeBase.
+    """
+
+    def __init__(self,
+        filename: StrPath, name: Optional[str] = None, stream: bool = False, **kwargs
+    ) -> None:
+        self.stream = stream
+        super().__init__(filename=filename, name=name, **kwargs)
 
-    def do_save(self, articles: Iterable[Article], **kwargs) -> None:
-        arts = Articles(list(articles))
-        data = arts.model_dump()
-        with open(self.filepath, 'w') as f:
-            self.yaml.dump(data, f)
+    def do_save(
+        self, articles: Iterable[Article], filepath: Optional[Path] = None, **kwargs
+    ) -> None:
+        with open(filepath or self.filepath, "w", encoding="utf-8") as f:
+            if self.stream:
+                self.yaml.dump_all(
+                    (article.model_dump() for article in articles),
+                    f,
+                    Dumper=self.dumper,
+                    explicit_start=True,
+                    sort_keys=False,
+                    allow_unicode=True,
+                )
+            else:
+                self.yaml.dump(
+                    [article.model_dump() for article in articles],
+                    f,
+                    Dumper=self.dumper,
+                    sort_keys=False,
+                    allow_unicode=True,
+                )
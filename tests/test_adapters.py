@@ -0,0 +1,51 @@
+import asyncio
+
+from pyknowbase.adapters import AsyncMutableKnowledgeBaseAdapter
+from pyknowbase.adapters import SyncMutableKnowledgeBaseAdapter
+from pyknowbase.model import Article
+from pyknowbase.storage.memory import MutableInMemoryKnowledgeBase
+
+
+def test_async_adapter():
+    backend = MutableInMemoryKnowledgeBase("kb")
+    kb = AsyncMutableKnowledgeBaseAdapter(backend, batch_size=2)
+
+    async def run():
+        await kb.put_articles(Article(id=f"a{i}", text=f"text {i}") for i in range(5))
+        await kb.delete("a4")
+        assert (await kb.get("a1")).text == "text 1"
+        assert await kb.get("a4") is None
+        assert sorted(await kb.get_many(["a0", "a4"])) == ["a0"]
+        return [article.id async for article in kb]
+
+    assert sorted(asyncio.run(run())) == ["a0", "a1", "a2", "a3"]
+
+
+def test_sync_adapter_roundtrip():
+    backend = MutableInMemoryKnowledgeBase("kb")
+    kb = SyncMutableKnowledgeBaseAdapter(AsyncMutableKnowledgeBaseAdapter(backend), batch_size=2)
+    kb.copy_from(MutableInMemoryKnowledgeBase("empty"))
+    kb.put_articles(Article(id=f"a{i}", text=f"text {i}") for i in range(5))
+    del kb["a0"]
+    assert kb["a1"].text == "text 1"
+    assert sorted(a.id for a in kb) == ["a1", "a2", "a3", "a4"]
+    assert sorted(backend.index) == ["a1", "a2", "a3", "a4"]
+
+
+def test_sync_adapter_closes_abandoned_iteration():
+    closed = []
+
+    class Backend(AsyncMutableKnowledgeBaseAdapter):
+        async def __aiter__(self):
+            try:
+                for i in range(10):
+                    yield Article(id=f"a{i}", text="text")
+            finally:
+                closed.append(True)
+
+    kb = SyncMutableKnowledgeBaseAdapter(Backend(MutableInMemoryKnowledgeBase("kb")))
+    iterator = iter(kb)
+    assert next(iterator).id == "a0"
+    iterator.close()
+    assert closed == [True]
+    assert len(list(kb)) == 10
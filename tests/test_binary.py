@@ -0,0 +1,70 @@
+from datetime import datetime
+from datetime import timezone
+
+import pytest
+
+from pyknowbase.model import Article
+from pyknowbase.storage.binary import BinaryKnowledgeBase
+from pyknowbase.storage.binary import MutableBinaryKnowledgeBase
+from pyknowbase.storage.json_kb import MutableJSONFileKnowledgeBase
+
+
+def test_convert_roundtrip(tmp_path):
+    source = MutableJSONFileKnowledgeBase(tmp_path / "kb.json")
+    source.put_articles(
+        Article(
+            id=f"ä{i}", text=f"text {i}" * i, metadata={"n": i} if i % 2 else {},
+            last_modified=datetime(2023, 9, 5, 12, 0, i, 123456, tzinfo=timezone.utc),
+        )
+        for i in (3, 1, 4, 0, 2)
+    )
+    kb = BinaryKnowledgeBase.from_knowledge_base(source, tmp_path / "kb.bin")
+    assert [a.model_dump() for a in kb] == [a.model_dump() for a in source]
+    assert kb["ä4"] == source["ä4"]
+    assert "missing" not in kb.index
+    with pytest.raises(KeyError):
+        kb["missing"]
+    target = MutableJSONFileKnowledgeBase(tmp_path / "copy.json")
+    target.copy_from(kb)
+    assert list(target) == list(source)
+
+
+def test_mutable(tmp_path):
+    path = tmp_path / "kb.bin"
+    kb = MutableBinaryKnowledgeBase(path)
+    kb.put_articles(Article(id=f"a{i}", text=f"text {i}") for i in range(3))
+    kb.save()
+    kb = MutableBinaryKnowledgeBase(path)
+    kb.add(Article(id="a1", text="changed"))
+    kb.add(Article(id="b", text="new"))
+    del kb["a0"]
+    assert len(kb.index) == 3
+    kb.save()
+    assert [(a.id, a.text) for a in MutableBinaryKnowledgeBase(path)] == [
+        ("a2", "text 2"), ("a1", "changed"), ("b", "new")
+    ]
+
+
+def test_close(tmp_path):
+    source = MutableJSONFileKnowledgeBase(tmp_path / "kb.json")
+    source.put_articles(Article(id=f"a{i}", text=f"text {i}") for i in range(3))
+    with BinaryKnowledgeBase.from_knowledge_base(source, tmp_path / "kb.bin") as kb:
+        buffer = kb.index.buffer
+        assert kb["a1"].text == "text 1"
+    assert buffer.closed
+    assert len(kb.index) == 0
+    loaded = list(BinaryKnowledgeBase(tmp_path / "kb.bin", lazy=False))
+    assert [a.id for a in loaded] == ["a0", "a1", "a2"]
+
+
+def test_from_knowledge_base_failure(tmp_path):
+    path = tmp_path / "kb.bin"
+    source = MutableJSONFileKnowledgeBase(tmp_path / "kb.json")
+    source.add(Article(id="a", text="text"))
+    BinaryKnowledgeBase.from_knowledge_base(source, path).close()
+    source.add(Article(id="b", text="text", metadata={"x": object()}))
+    with pytest.raises(ValueError, match="article b is not JSON serializable"):
+        BinaryKnowledgeBase.from_knowledge_base(source, path)
+    assert sorted(p.name for p in tmp_path.iterdir()) == ["kb.bin"]
+    with BinaryKnowledgeBase(path) as kb:
+        assert [a.id for a in kb] == ["a"]
@@ -0,0 +1,85 @@
+import pytest
+
+from pyknowbase.model import Article
+from pyknowbase.storage.cached import MutableCachedKnowledgeBase
+from pyknowbase.storage.memory import MutableInMemoryKnowledgeBase
+
+
+@pytest.fixture
+def backend():
+    kb = MutableInMemoryKnowledgeBase("kb")
+    kb.put_articles(Article(id=f"a{i}", text=f"text {i}") for i in range(5))
+    return kb
+
+
+def test_read_through(backend):
+    kb = MutableCachedKnowledgeBase(backend, max_items=2)
+    assert kb["a0"].text == "text 0"
+    assert kb["a0"].text == "text 0"
+    kb["a1"], kb["a2"]
+    assert (kb.cache.hits, kb.cache.misses, kb.cache.evictions) == (1, 3, 1)
+    assert "a0" not in kb.cache
+
+
+def test_writes_refresh_cache(backend):
+    kb = MutableCachedKnowledgeBase(backend, cache_missing=True)
+    kb["a0"]
+    kb.add(Article(id="a0", text="changed"))
+    assert kb["a0"].text == "changed"
+    del kb["a0"]
+    with pytest.raises(KeyError):
+        kb["a0"]
+    assert kb.cache.get("a0") == (True, None)
+
+
+def test_ttl(backend):
+    now = [0.0]
+    kb = MutableCachedKnowledgeBase(backend, ttl=10)
+    kb.cache.timer = lambda: now[0]
+    kb["a0"]
+    now[0] = 11.0
+    kb["a0"]
+    assert kb.cache.hits == 0
+
+
+def test_get_many(backend):
+    kb = MutableCachedKnowledgeBase(backend, cache_missing=True)
+    kb["a0"]
+    assert sorted(kb.get_many(["a0", "a1", "missing"])) == ["a0", "a1"]
+    assert sorted(kb.get_many(["a0", "a1", "missing"])) == ["a0", "a1"]
+    assert kb.cache.misses == 3
+
+
+def test_delegation(backend):
+    class Backend(MutableInMemoryKnowledgeBase):
+        def query(self, filter):
+            calls.append("query")
+            return super().query(filter)
+
+        def iter_versions(self):
+            calls.append("iter_versions")
+            return super().iter_versions()
+
+    calls = []
+    kb = MutableCachedKnowledgeBase(Backend("kb"))
+    kb.put_articles(backend)
+    assert sorted(kb.iter_ids()) == [f"a{i}" for i in range(5)]
+    assert len(list(kb.query({}))) == 5
+    assert len(list(kb.iter_versions())) == 5
+    assert calls == ["query", "iter_versions"]
+    assert kb.get("a1", fields=["text"]) == { "id": "a1", "text": "text 1" }
+
+
+def test_failed_bulk_write_does_not_update_cache(backend):
+    class FailingBackend(MutableInMemoryKnowledgeBase):
+        def put_articles(self, articles):
+            list(articles)
+            raise OSError("write failed")
+
+    kb = MutableCachedKnowledgeBase(FailingBackend("kb"))
+    with pytest.raises(OSError):
+        kb.put_articles([Article(id="a0", text="lost")])
+    assert "a0" not in kb.cache
+    kb = MutableCachedKnowledgeBase(backend, max_items=2)
+    kb.put_articles([Article(id=f"a{i}", text="new") for i in range(4)])
+    assert sorted(kb.cache._entries) == ["a2", "a3"]
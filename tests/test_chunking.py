@@ -0,0 +1,109 @@
+from datetime import timedelta
+
+import pytest
+
+from pyknowbase.chunking import (
+    Chunker, MutableChunkedKnowledgeBase, ChunkedKnowledgeBase, parse_chunk_id
+)
+from pyknowbase.model import Article
+from pyknowbase.storage.json_kb import MutableJSONFileKnowledgeBase
+from pyknowbase.storage.memory import MutableInMemoryKnowledgeBase
+
+TEXT = " ".join(f"word{i}" for i in range(100))
+
+
+def test_char_chunks():
+    chunker = Chunker(size=50, overlap=10)
+    spans = chunker.spans(TEXT)
+    assert spans[0][0] == 0 and spans[-1][1] == len(TEXT)
+    for (start, end), (next_start, _) in zip(spans, spans[1:]):
+        assert end - start <= 50
+        assert start < next_start < end
+        # Words are not split.
+        assert TEXT[end - 1] == " " and TEXT[next_start - 1] == " "
+    assert chunker.spans("") == []
+
+
+def test_token_chunks():
+    chunker = Chunker(size=10, overlap=3, unit="tokens")
+    spans = chunker.spans(TEXT)
+    assert TEXT[slice(*spans[0])] == " ".join(f"word{i}" for i in range(10))
+    assert TEXT[slice(*spans[1])].startswith("word7 ")
+    assert spans[-1][1] == len(TEXT)
+    with pytest.raises(ValueError):
+        Chunker(size=10, overlap=10)
+
+
+@pytest.mark.parametrize("unit", ["chars", "tokens"])
+def test_large_overlap(unit):
+    with pytest.raises(ValueError, match="at most half"):
+        Chunker(size=100, overlap=51, unit=unit)
+    text = "x" * 10_000 if unit == "chars" else "x " * 10_000
+    spans = Chunker(size=100, overlap=50, unit=unit).spans(text)
+    # The chunks advance by at least half of their size.
+    assert len(spans) <= 2 * len(text) // 100 + 1
+    assert spans[-1][1] == len(text.rstrip())
+
+
+def test_chunked_knowledge_base(tmp_path):
+    source = MutableJSONFileKnowledgeBase(tmp_path / "kb.json")
+    source.put_articles([Article(id="a", text=TEXT), Article(id="b#1", text="short")])
+    source.save()
+    chunker = Chunker(size=100, overlap=20)
+    kb = ChunkedKnowledgeBase(source, chunker)
+    assert kb.refresh() == (2, 0)
+    assert kb.refresh() == (0, 0)
+
+    chunks = list(kb.get_chunks("a"))
+    assert [chunk.id for chunk in chunks[:2]] == ["a#0", "a#1"]
+    assert all(chunk.text == TEXT[chunk.start:chunk.end] for chunk in chunks)
+    assert kb.get_chunk("a#1") == chunks[1]
+    assert kb.get_chunk("b#1#0").text == "short"
+    assert parse_chunk_id("b#1#0") == ("b#1", 0)
+    assert kb.get_chunk("b#1#1") is None
+    assert kb.get_chunk("c#0") is None
+    assert len(list(kb.iter_chunks())) == len(chunks) + 1
+
+    kb.save_cache()
+    assert (tmp_path / "kb.json.chunks").is_file()
+    cached = ChunkedKnowledgeBase(source, chunker)
+    assert cached.refresh() == (0, 0)
+    # Different settings invalidate the cache.
+    assert ChunkedKnowledgeBase(source, Chunker(size=80, overlap=20)).refresh() == (2, 0)
+
+
+def test_mutable_chunked_knowledge_base():
+    article = Article(id="a", text=TEXT)
+    kb = MutableChunkedKnowledgeBase(
+        MutableInMemoryKnowledgeBase("kb"), Chunker(size=100, overlap=20)
+    )
+    kb["a"] = article
+    kb.refresh()
+    changed = article.model_copy(
+        update={ "text": "changed", "last_modified": article.last_modified + timedelta(1) }
+    )
+    kb.put_articles([changed])
+    assert [chunk.text for chunk in kb.get_chunks("a")] == ["changed"]
+    del kb["a"]
+    assert kb.refresh() == (0, 0)
+    assert list(kb.iter_chunks()) == []
+
+
+def test_delegation():
+    class Backend(MutableInMemoryKnowledgeBase):
+        def query(self, filter):
+            calls.append("query")
+            return super().query(filter)
+
+        def iter_versions(self):
+            calls.append("iter_versions")
+            return super().iter_versions()
+
+    calls = []
+    kb = MutableChunkedKnowledgeBase(Backend("kb"), Chunker(size=100, overlap=20))
+    kb.put_articles(Article(id=f"a{i}", text=TEXT, metadata={ "i": i }) for i in range(3))
+    assert [article.id for article in kb.query({ "i": 1 })] == ["a1"]
+    assert kb.refresh() == (3, 0)
+    assert calls == ["query", "iter_versions"]
+    assert sorted(kb.iter_ids()) == ["a0", "a1", "a2"]
+    assert kb.get("a2", fields=["metadata"]) == { "id": "a2", "metadata": { "i": 2 } }
@@ -0,0 +1,51 @@
+import pytest
+
+from pyknowbase.model import Article
+from pyknowbase.storage.binary import (
+    FLAG_COMPRESSED, BinaryKnowledgeBase, MutableBinaryKnowledgeBase
+)
+from pyknowbase.storage.compression import LocalBlobStore, TextCompression, decompress_text
+
+LONG_TEXT = "Hosszú szöveg, ami sokszor ismétlődik. " * 200
+
+
+def test_text_compression():
+    compression = TextCompression(threshold=1000)
+    assert compression.compress("short") is None
+    data = compression.compress(LONG_TEXT)
+    assert len(data) < len(LONG_TEXT) // 10
+    assert decompress_text(data, "zlib") == LONG_TEXT
+    with pytest.raises(ValueError):
+        TextCompression(codec="lzma")
+
+
+def test_compressed_binary_file(tmp_path):
+    path = tmp_path / "kb.bin"
+    kb = MutableBinaryKnowledgeBase(path, compression=TextCompression(threshold=1000))
+    kb.put_articles([
+        Article(id="long", text=LONG_TEXT, metadata={ "size": "large" }),
+        Article(id="short", text="short"),
+    ])
+    kb.save()
+    assert path.stat().st_size < len(LONG_TEXT) // 10
+
+    reopened = BinaryKnowledgeBase(path)
+    assert reopened.index.flags & FLAG_COMPRESSED
+    assert reopened["long"].text == LONG_TEXT
+    assert reopened["short"].text == "short"
+    assert [h.id for h in reopened.iter_headers()] == ["long", "short"]
+    assert {a.id: a.text for a in reopened} == { "long": LONG_TEXT, "short": "short" }
+
+
+def test_local_blob_store(tmp_path):
+    store = LocalBlobStore(tmp_path / "blobs")
+    store.put("table/kb/a#1", b"data")
+    store.put("table/kb/a#1", b"data")
+    assert store.get("table/kb/a#1") == b"data"
+    assert [p.name for p in store.path("table/kb/a#1").parent.iterdir()] == [
+        store.path("table/kb/a#1").name
+    ]
+    store.delete("table/kb/a#1")
+    store.delete("table/kb/a#1")
+    with pytest.raises(KeyError):
+        store.get("table/kb/a#1")
@@ -0,0 +1,278 @@
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta, timezone
+
+import pytest
+
+pytest.importorskip("moto")
+
+from pyknowbase import instrumentation  # noqa: E402
+from pyknowbase.model import Article  # noqa: E402
+from pyknowbase.storage.compression import LocalBlobStore, TextCompression  # noqa: E402
+from pyknowbase.storage.dynamo_utils import (  # noqa: E402
+    clear_shared_resources, dynamodb_batch_write, dynamodb_parallel_scan,
+)
+from pyknowbase.storage.memory import MutableInMemoryKnowledgeBase  # noqa: E402
+
+START = datetime(2024, 1, 1, tzinfo=timezone.utc)
+
+
+def make_articles(count, prefix="a", text="text"):
+    return [
+        Article(
+            id=f"{prefix}{i}",
+            text=f"{text} {i}",
+            metadata={ "lang": "en" if i % 2 else "de", "rank": i },
+            last_modified=START + timedelta(days=i),
+        )
+        for i in range(count)
+    ]
+
+
+@pytest.fixture
+def aws(monkeypatch):
+    from moto import mock_aws
+
+    monkeypatch.setenv("AWS_DEFAULT_REGION", "us-east-1")
+    monkeypatch.setenv("AWS_ACCESS_KEY_ID", "testing")
+    monkeypatch.setenv("AWS_SECRET_ACCESS_KEY", "testing")
+    clear_shared_resources()
+    with mock_aws():
+        yield
+    clear_shared_resources()
+
+
+def make_collection(table_name="test", **kwargs):
+    from pyknowbase.storage.dynamo_multi import DynamoMultiKnowledgeBaseCollection
+
+    collection = DynamoMultiKnowledgeBaseCollection(table_name, **kwargs)
+    collection.create_table()
+    return collection
+
+
+def count_calls(operation):
+    recorder = instrumentation.MetricsRecorder()
+    with instrumentation.listening(recorder):
+        operation()
+    return { name: stats.count for name, stats in recorder.stats.items() }
+
+
+def test_put_articles_dedupes_across_chunks(aws):
+    kb = make_collection(max_workers=4).put_knowledge_base("kb")
+    articles = make_articles(60)
+    kb.put_articles(articles + [Article(id="a0", text="last")] + articles[1:30])
+    assert kb["a0"].text == "last"
+    assert len(list(kb)) == 60
+    kb.delete_articles(["a0", "a1", "a0"])
+    assert kb.get_many(["a0", "a1", "a2"]).keys() == { "a2" }
+
+
+def test_batch_write_retries_unprocessed_items():
+    class Client:
+        def __init__(self):
+            self.calls = []
+
+        def batch_write_item(self, RequestItems):
+            requests = RequestItems["t"]
+            self.calls.append(len(requests))
+            unprocessed = requests[:1] if len(self.calls) == 1 else []
+            return { "UnprocessedItems": { "t": unprocessed } if unprocessed else {} }
+
+    requests = [{ "PutRequest": { "Item": { "pk": "p", "sk": str(i % 30) } } } for i in range(40)]
+    client = Client()
+    dynamodb_batch_write(client, "t", requests, key_names=("pk", "sk"), base_delay=0)
+    # The sequential writes dedupe the requests within each chunk.
+    assert client.calls == [25, 1, 15]
+    client = Client()
+    dynamodb_batch_write(
+        client, "t", requests, key_names=("pk", "sk"), max_workers=2, base_delay=0
+    )
+    # The second chunk shares keys with the first one, so it waits for its retry.
+    assert client.calls == [25, 1, 15]
+
+
+def test_projections(aws):
+    kb = make_collection().put_knowledge_base("kb")
+    kb.put_articles(make_articles(3))
+    assert kb.get("a1", fields=["metadata"])["metadata"] == { "lang": "en", "rank": 1 }
+    assert kb.get("a2", fields=["id", "text"]) == { "id": "a2", "text": "text 2" }
+    assert kb.get("missing", fields=["text"]) is None
+    headers = sorted(kb.iter_headers(), key=lambda header: header.id)
+    assert [header.id for header in headers] == ["a0", "a1", "a2"]
+    assert headers[1].last_modified == START + timedelta(days=1)
+    assert sorted(kb.iter_ids()) == ["a0", "a1", "a2"]
+
+
+def test_parallel_scan(aws):
+    collection = make_collection(scan_segments=3)
+    for i in range(5):
+        collection.put_knowledge_base(f"kb{i}")
+    assert sorted(kb.name for kb in collection) == [f"kb{i}" for i in range(5)]
+    items = dynamodb_parallel_scan(
+        collection.dynamodb.meta.client.scan, { "TableName": "test" }, total_segments=4
+    )
+    assert len(list(items)) == 5
+
+
+def test_query(aws):
+    kb = make_collection(indexed_fields=["lang"]).put_knowledge_base("kb")
+    kb.put_articles(make_articles(10))
+    assert sorted(a.id for a in kb.query({ "lang": "en", "rank": { "lt": 5 } })) == ["a1", "a3"]
+    assert len(list(kb.query({ "lang": { "in": ["en", "de"] } }))) == 10
+    recent = kb.query({ "last_modified": { "gte": START + timedelta(days=8) } })
+    assert sorted(a.id for a in recent) == ["a8", "a9"]
+    assert sorted(a.id for a in kb.query({ "rank": 4 })) == ["a4"]
+
+
+def test_sync_from(aws):
+    source = make_collection().put_knowledge_base("kb")
+    source.put_articles(make_articles(5))
+    target = MutableInMemoryKnowledgeBase("mirror")
+    assert target.sync_from(source).added == 5
+    source.put_article(make_articles(2, text="changed")[1].model_copy(
+        update={ "last_modified": START + timedelta(days=10) }
+    ))
+    del source["a4"]
+    result = target.sync_from(source)
+    assert (result.added, result.updated, result.deleted) == (0, 1, 1)
+    assert target["a1"].text == "changed 1"
+
+
+def test_sync_from_last_modified_index(aws):
+    collection = make_collection(last_modified_index_name="gsi_last_modified")
+    source = collection.put_knowledge_base("kb")
+    source.put_articles(make_articles(3))
+    # An article written before the last_modified index was introduced.
+    collection.table.put_item(Item={ "pk": "kb", "sk": "legacy", "text": "old" })
+    assert sorted(source.iter_ids()) == ["a0", "a1", "a2"]
+    target = MutableInMemoryKnowledgeBase("mirror")
+    target["legacy"] = Article(id="legacy", text="old")
+    with pytest.raises(ValueError, match="incomplete"):
+        target.sync_from(source)
+    assert target.sync_from(source, delete=False).added == 3
+    assert target.get("legacy") is not None
+    recent = source.query({ "last_modified": { "gte": START + timedelta(days=1) } })
+    assert sorted(a.id for a in recent) == ["a1", "a2"]
+
+
+def test_sharding(aws):
+    collection = make_collection()
+    kb = collection.put_knowledge_base("kb", shards=4)
+    kb.put_articles(make_articles(20))
+    partitions = { item["pk"] for item in collection.table.scan()["Items"] }
+    assert partitions > { "kb#0", "kb#1" }
+    assert collection["kb"].shards == 4
+    assert collection["kb"]["a7"].text == "text 7"
+    assert len(list(collection["kb"])) == 20
+    assert len(kb.get_many(["a1", "a2", "missing"])) == 2
+    with pytest.raises(ValueError):
+        collection.put_knowledge_base("kb", shards=2)
+    collection.delete_knowledge_base("kb")
+    assert collection.table.scan()["Items"] == []
+
+
+def test_skip_unchanged(aws):
+    kb = make_collection(skip_unchanged=True).put_knowledge_base("kb")
+    articles = make_articles(3)
+    kb.put_articles(articles)
+    assert not kb.put_article(articles[0])
+    assert kb.put_article(articles[0].model_copy(update={ "text": "new" }))
+    calls = count_calls(lambda: kb.put_articles(articles[1:]))
+    assert "dynamodb.BatchWriteItem" not in calls
+    assert calls["dynamodb.BatchGetItem"] == 1
+
+
+def test_compression_and_blobs(aws, tmp_path):
+    store = LocalBlobStore(tmp_path)
+    collection = make_collection(
+        compression=TextCompression(threshold=100), blob_store=store, max_inline_text_bytes=1000
+    )
+    kb = collection.put_knowledge_base("kb")
+    compressible = "compress me " * 100
+    incompressible = "".join(chr(0x4e00 + (i * 7919) % 20000) for i in range(2000))
+    kb.put_articles([
+        Article(id="small", text="small"),
+        Article(id="compressed", text=compressible),
+        Article(id="blob", text=incompressible),
+    ])
+    items = { item["sk"]: item for item in collection.table.scan()["Items"] }
+    assert items["small"]["text"] == "small"
+    assert items["compressed"]["text_codec"] == "zlib"
+    assert "text" not in items["blob"]
+    assert store.get(items["blob"]["text_blob"])
+    assert kb["compressed"].text == compressible
+    assert kb["blob"].text == incompressible
+    assert kb.get("blob", fields=["text"])["text"] == incompressible
+    assert { a.id: a.text for a in kb }["compressed"] == compressible
+    del kb["blob"]
+    with pytest.raises(KeyError):
+        store.get(items["blob"]["text_blob"])
+
+
+def test_blob_lifecycle(aws, tmp_path):
+    store = LocalBlobStore(tmp_path)
+    collection = make_collection(blob_store=store, max_inline_text_bytes=100, skip_unchanged=True)
+    kb = collection.put_knowledge_base("kb")
+
+    def blobs():
+        return sorted(p.name for p in tmp_path.rglob("*") if p.is_file())
+
+    large = Article(id="a", text="large " * 100)
+    assert kb.put_article(large)
+    assert len(blobs()) == 1
+    assert not kb.put_article(large)
+    kb.put_articles([large])
+    assert len(blobs()) == 1
+    kb.put_articles([large.model_copy(update={ "text": "larger " * 100 })])
+    assert len(blobs()) == 1
+    assert kb["a"].text == "larger " * 100
+    assert kb.put_article(large.model_copy(update={ "text": "short" }))
+    assert blobs() == []
+
+    def fail(*args, **kwargs):
+        raise RuntimeError("write failed")
+
+    with pytest.MonkeyPatch.context() as monkeypatch:
+        monkeypatch.setattr(collection, "_batch_write", fail)
+        with pytest.raises(RuntimeError):
+            kb.put_articles([large])
+    assert blobs() == []
+    kb.put_articles([large, Article(id="b", text="other " * 100)])
+    assert len(blobs()) == 2
+    del kb["a"]
+    assert len(blobs()) == 1
+    kb.delete_articles(["b"])
+    assert blobs() == []
+
+
+def test_shared_resource(aws):
+    from pyknowbase.storage.dynamo_multi import DynamoMultiKnowledgeBaseCollection
+
+    collection = make_collection()
+    other = DynamoMultiKnowledgeBaseCollection("test")
+    assert other.dynamodb is collection.dynamodb
+    collection.put_knowledge_base("kb")
+    assert other.get_knowledge_base("kb") is not None
+    injected = DynamoMultiKnowledgeBaseCollection("test", dynamodb_resource=other.dynamodb)
+    assert injected.dynamodb is other.dynamodb
+    with ThreadPoolExecutor(1) as executor:
+        resource, table = executor.submit(lambda: (other.dynamodb, other.table)).result()
+        assert executor.submit(lambda: injected.dynamodb).result() is injected.dynamodb
+    assert resource is not other.dynamodb
+    assert table is not other.table
+    assert table.name == other.table.name
+
+
+def test_query_without_last_modified_index(aws):
+    kb = make_collection(
+        indexed_fields=["rank"], last_modified_index_name=None
+    ).put_knowledge_base("kb")
+    kb.put_articles(make_articles(10))
+    recent = {}
+    calls = count_calls(lambda: recent.update(
+        (a.id, a) for a in kb.query({ "last_modified": { "gte": START + timedelta(days=8) } })
+    ))
+    assert sorted(recent) == ["a8", "a9"]
+    # The base table query returns the whole items, they are not fetched again.
+    assert calls == { "dynamodb.Query": 1 }
+    assert sorted(a.id for a in kb.query({ "rank": 4.0 })) == ["a4"]
+    assert sorted(a.id for a in kb.query({ "rank": { "in": [1, 2.0] } })) == ["a1", "a2"]
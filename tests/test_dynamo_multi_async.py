@@ -0,0 +1,89 @@
+import asyncio
+from datetime import datetime, timedelta, timezone
+
+import pytest
+
+pytest.importorskip("aioboto3")
+pytest.importorskip("moto.server")
+
+from pyknowbase.adapters import SyncMutableKnowledgeBaseAdapter  # noqa: E402
+from pyknowbase.model import Article  # noqa: E402
+
+START = datetime(2024, 1, 1, tzinfo=timezone.utc)
+
+
+@pytest.fixture(scope="module")
+def server():
+    from moto.server import ThreadedMotoServer
+
+    server = ThreadedMotoServer(port=0, verbose=False)
+    server.start()
+    yield "http://127.0.0.1:%d" % server.get_host_and_port()[1]
+    server.stop()
+
+
+@pytest.fixture
+def collection(server, monkeypatch):
+    from pyknowbase.storage.dynamo_multi_async import AsyncDynamoMultiKnowledgeBaseCollection
+
+    monkeypatch.setenv("AWS_DEFAULT_REGION", "us-east-1")
+    monkeypatch.setenv("AWS_ACCESS_KEY_ID", "testing")
+    monkeypatch.setenv("AWS_SECRET_ACCESS_KEY", "testing")
+    monkeypatch.setenv("AWS_ENDPOINT_URL", server)
+    table_name = f"test-{id(monkeypatch)}"
+    # The collection is created outside of the event loop that uses it.
+    return AsyncDynamoMultiKnowledgeBaseCollection(
+        table_name, max_concurrency=2, indexed_fields=["lang"], last_modified_index_name=None
+    )
+
+
+def make_articles(count, text="text"):
+    return [
+        Article(
+            id=f"a{i}",
+            text=f"{text} {i}",
+            metadata={ "lang": "en" if i % 2 else "de" },
+            last_modified=START + timedelta(days=i),
+        )
+        for i in range(count)
+    ]
+
+
+def test_async_collection(collection):
+    async def run():
+        async with collection:
+            await collection.create_table()
+            kb = await collection.put_knowledge_base("kb", shards=2)
+            articles = make_articles(120)
+            await kb.put_articles(articles + [Article(id="a0", text="last")] + articles[1:60])
+            assert (await kb.get("a0")).text == "last"
+            assert len([article async for article in kb]) == 120
+            assert len(await kb.get_many(["a1", "a2", "missing"])) == 2
+            english = [article.id async for article in kb.query({ "lang": "en" })]
+            assert len(english) == 60
+            await kb.delete_articles(f"a{i}" for i in range(100))
+            assert sorted(await kb.get_many(["a0", "a100"])) == ["a100"]
+            await collection.delete_knowledge_base("kb")
+            assert await collection.get_knowledge_base("kb") is None
+
+    asyncio.run(run())
+    with pytest.raises(ValueError):
+        asyncio.run(collection._call(asyncio.sleep, delay=0))
+
+
+def test_sync_adapter(collection):
+    from pyknowbase.storage.dynamo_multi_async import AsyncDynamoMultiKnowledgeBase
+
+    kb = SyncMutableKnowledgeBaseAdapter(AsyncDynamoMultiKnowledgeBase(collection, "kb"))
+    kb._run(collection.open())
+    try:
+        kb._run(collection.create_table())
+        kb._run(collection.put_knowledge_base("kb"))
+        kb.put_articles(make_articles(5))
+        assert kb["a3"].text == "text 3"
+        iterator = iter(kb)
+        next(iterator)
+        iterator.close()
+        assert sorted(article.id for article in kb) == [f"a{i}" for i in range(5)]
+    finally:
+        kb._run(collection.close())
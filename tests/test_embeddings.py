@@ -0,0 +1,76 @@
+from datetime import datetime, timezone
+
+import pytest
+
+from pyknowbase.model import Article
+from pyknowbase.storage.memory import MutableInMemoryKnowledgeBase
+
+np = pytest.importorskip("numpy")
+
+from pyknowbase.embeddings import EmbeddingIndex  # noqa: E402
+
+VOCABULARY = ["password", "reset", "billing", "invoice", "login", "error"]
+
+
+def embed(texts):
+    embed.calls += len(texts)
+    return np.array([[text.count(word) + 0.01 for word in VOCABULARY] for text in texts])
+
+
+embed.calls = 0
+
+
+@pytest.fixture
+def kb():
+    kb = MutableInMemoryKnowledgeBase("test")
+    kb.add(Article(id="password", text="reset password password"))
+    kb.add(Article(id="billing", text="billing invoice"))
+    kb.add(Article(id="login", text="login error"))
+    return kb
+
+
+def test_refresh_and_search(kb, tmp_path, monkeypatch):
+    embed.calls = 0
+    index = EmbeddingIndex(kb, embed, dtype="float16", batch_size=2)
+    read = []
+    get_many = kb.get_many
+    monkeypatch.setattr(kb, "get_many", lambda ids: read.append(list(ids)) or get_many(ids))
+    assert index.refresh() == (3, 0)
+    assert index.refresh() == (0, 0)
+    # Only the changed articles are read, in batches.
+    assert read == [["password", "billing"], ["login"]]
+    assert embed.calls == 3
+
+    assert index.search("password", k=1)[0][0] == "password"
+    results = index.search_batch(["invoice", "login error"], k=2)
+    assert [r[0][0] for r in results] == ["billing", "login"]
+
+    kb["billing"] = Article(id="billing", text="password", last_modified=datetime.now(timezone.utc))
+    del kb["login"]
+    assert index.refresh() == (1, 1)
+    assert [article_id for article_id, _ in index.search("password", k=5)] == [
+        "billing", "password"
+    ]
+
+    index.save(tmp_path / "index")
+    loaded = EmbeddingIndex.load(tmp_path / "index", kb, embed)
+    assert loaded.search("password", k=5) == index.search("password", k=5)
+    kb.add(Article(id="new", text="invoice"))
+    assert loaded.refresh() == (1, 0)
+    assert loaded.search("invoice", k=1)[0][0] == "new"
+
+
+def test_ivf(kb):
+    for i in range(50):
+        kb.add(Article(id=f"a{i}", text=VOCABULARY[i % len(VOCABULARY)]))
+    index = EmbeddingIndex(kb, embed)
+    index.refresh()
+    index.build_ivf(n_lists=4)
+    exact = index.search("billing invoice", k=3)
+    approximate = index.search("billing invoice", k=3, n_probe=4)
+    assert [r[0] for r in approximate] == [r[0] for r in exact]
+    assert len(index.search("billing invoice", k=3, n_probe=1)) <= 3
+    index.remove(exact[0][0])
+    approximate = index.search("billing invoice", k=3, n_probe=4)
+    assert exact[0][0] not in [r[0] for r in approximate]
+    assert [r[0] for r in approximate] == [r[0] for r in index.search("billing invoice", k=3)]
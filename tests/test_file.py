@@ -0,0 +1,104 @@
+import os
+
+import pytest
+
+from pyknowbase.model import Article
+from pyknowbase.storage.binary import MutableBinaryKnowledgeBase
+from pyknowbase.storage.json_kb import MutableJSONFileKnowledgeBase
+from pyknowbase.storage.jsonl_kb import MutableJsonLinesKnowledgeBase
+
+
+@pytest.mark.parametrize("kb_class, suffix", [
+    (MutableJSONFileKnowledgeBase, "json"),
+    (MutableJsonLinesKnowledgeBase, "jsonl"),
+    (MutableBinaryKnowledgeBase, "bin"),
+])
+def test_journal(tmp_path, kb_class, suffix):
+    path = tmp_path / f"kb.{suffix}"
+    kb = kb_class(path, journal=True)
+    kb.put_articles(Article(id=str(i), text=f"text {i}") for i in range(5))
+    kb.compact()
+    assert not kb.journal_filepath.exists()
+
+    kb["5"] = Article(id="5", text="text 5")
+    del kb["0"]
+    kb.save()
+    size = path.stat().st_size
+    kb["1"] = Article(id="1", text="updated")
+    kb.save()
+    assert path.stat().st_size == size
+
+    with open(kb.journal_filepath, "a") as f:
+        f.write('{"op": "put", "id": "6", "art')
+
+    reopened = kb_class(path)
+    assert sorted(a.id for a in reopened) == ["1", "2", "3", "4", "5"]
+    assert reopened["1"].text == "updated"
+
+    reopened.save()
+    assert not reopened.journal_filepath.exists()
+    assert not path.with_name(path.name + ".tmp").exists()
+    assert sorted(a.id for a in kb_class(path)) == ["1", "2", "3", "4", "5"]
+
+
+def test_journal_torn_write(tmp_path):
+    path = tmp_path / "kb.jsonl"
+    kb = MutableJsonLinesKnowledgeBase(path, journal=True)
+    kb.put_articles([Article(id="a", text="a"), Article(id="b", text="b")])
+    kb.save()
+    with open(kb.journal_filepath, "a") as f:
+        f.write('{"op": "put", "art')
+
+    reopened = MutableJsonLinesKnowledgeBase(path, journal=True)
+    reopened.add(Article(id="c", text="c"))
+    reopened.save()
+    reopened = MutableJsonLinesKnowledgeBase(path, journal=True)
+    assert sorted(reopened.iter_ids()) == ["a", "b", "c"]
+    reopened.add(Article(id="d", text="d"))
+    reopened.save()
+    assert sorted(MutableJsonLinesKnowledgeBase(path).iter_ids()) == ["a", "b", "c", "d"]
+
+
+def test_skip_unchanged(tmp_path):
+    path = tmp_path / "kb.json"
+    kb = MutableJSONFileKnowledgeBase(path, skip_unchanged=True)
+    article = Article(id="a", text="text")
+    kb.add(article)
+    kb.save()
+    mtime = path.stat().st_mtime_ns
+    assert not kb.modified
+
+    kb.add(Article(id="a", text="text"))
+    assert not kb.modified
+    assert kb["a"].last_modified == article.last_modified
+    kb.save()
+    assert path.stat().st_mtime_ns == mtime
+
+    kb.add(Article(id="a", text="changed"))
+    assert kb.modified
+    kb.save()
+    assert MutableJSONFileKnowledgeBase(path)["a"].text == "changed"
+
+
+@pytest.mark.parametrize("kb_class", [MutableJSONFileKnowledgeBase, MutableBinaryKnowledgeBase])
+def test_compact_closes_memory_map_before_replace(tmp_path, monkeypatch, kb_class):
+    path = tmp_path / "kb"
+    kb = kb_class(path, lazy=True)
+    kb.put_articles(Article(id=str(i), text=f"text {i}") for i in range(3))
+    kb.save()
+    kb = kb_class(path, lazy=True)
+    kb["3"] = Article(id="3", text="text 3")
+    buffer = kb.index.buffer
+    replace = os.replace
+
+    def failing_replace(src, dst):
+        assert buffer.closed
+        raise PermissionError(dst)
+
+    monkeypatch.setattr(os, "replace", failing_replace)
+    with pytest.raises(PermissionError):
+        kb.save()
+    assert sorted(a.text for a in kb) == [f"text {i}" for i in range(4)]
+    monkeypatch.setattr(os, "replace", replace)
+    kb.save()
+    assert sorted(a.text for a in kb_class(path)) == [f"text {i}" for i in range(4)]
@@ -0,0 +1,35 @@
+import subprocess
+import sys
+
+MODULES = [
+    "pyknowbase",
+    "pyknowbase.storage",
+    "pyknowbase.storage.dynamo",
+    "pyknowbase.storage.dynamo_multi",
+    "pyknowbase.storage.dynamo_multi_async",
+    "pyknowbase.cli",
+]
+
+HEAVY_MODULES = ["boto3", "botocore", "aioboto3", "dynamodb_mapping", "yaml", "numpy"]
+
+
+def test_optional_dependencies_are_imported_lazily():
+    code = (
+        f"import sys\nfor module in {MODULES!r}:\n    __import__(module)\n"
+        f"print(','.join(m for m in {HEAVY_MODULES!r} if m in sys.modules))"
+    )
+    output = subprocess.run(
+        [sys.executable, "-c", code], capture_output=True, text=True, check=True
+    ).stdout
+    assert output.strip() == ""
+
+
+def test_shared_dynamodb_resource():
+    from pyknowbase.storage.dynamo_utils import clear_shared_resources, shared_dynamodb_resource
+
+    resource = shared_dynamodb_resource(region_name="us-east-1")
+    assert shared_dynamodb_resource(region_name="us-east-1") is resource
+    assert shared_dynamodb_resource(region_name="eu-west-1") is not resource
+    clear_shared_resources()
+    assert shared_dynamodb_resource(region_name="us-east-1") is not resource
+    clear_shared_resources()
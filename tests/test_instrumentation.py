@@ -0,0 +1,115 @@
+import pytest
+
+from pyknowbase import instrumentation
+from pyknowbase.model import Article
+from pyknowbase.storage.json_kb import MutableJSONFileKnowledgeBase
+
+
+def test_disabled():
+    assert not instrumentation.is_enabled()
+    with instrumentation.operation("test") as op:
+        op.items = 1
+    assert not op.recording
+
+
+def test_file_operations(tmp_path):
+    recorder = instrumentation.MetricsRecorder()
+    with instrumentation.listening(recorder):
+        assert instrumentation.is_enabled()
+        kb = MutableJSONFileKnowledgeBase(tmp_path / "kb.json", journal=True)
+        kb["a"] = Article(id="a", text="A")
+        kb.save()
+        kb.compact()
+        MutableJSONFileKnowledgeBase(tmp_path / "kb.json")
+    assert not instrumentation.is_enabled()
+
+    stats = recorder.stats
+    assert stats["file.open"].count == 2
+    assert stats["file.open"].items == 1
+    assert stats["file.append_journal"].items == 1
+    assert stats["file.append_journal"].bytes > 0
+    assert stats["file.save"].items == 1
+    assert stats["file.save"].bytes == (tmp_path / "kb.json").stat().st_size
+
+
+def test_error():
+    events = []
+    with instrumentation.listening(events.append):
+        with pytest.raises(KeyError):
+            with instrumentation.operation("test", foo="bar"):
+                raise KeyError("a")
+    assert events[0].error == "KeyError"
+    assert events[0].attributes == { "foo": "bar" }
+
+
+def test_dynamodb_client():
+    botocore_session = pytest.importorskip("botocore.session")
+    from botocore.stub import Stubber
+    from pyknowbase.storage.dynamo_utils import instrument_client
+
+    client = botocore_session.get_session().create_client(
+        "dynamodb", region_name="us-east-1",
+        aws_access_key_id="test", aws_secret_access_key="test",
+    )
+    instrument_client(client)
+    instrument_client(client)
+    query = { "TableName": "table", "KeyConditionExpression": "pk = :pk" }
+    response = {
+        "Items": [{ "pk": { "S": "a" } }],
+        "Count": 1,
+        "ConsumedCapacity": { "TableName": "table", "CapacityUnits": 0.5 },
+    }
+    events = []
+    with Stubber(client) as stubber:
+        stubber.add_response("query", response, { **query, "ReturnConsumedCapacity": "TOTAL" })
+        stubber.add_client_error("get_item", "ResourceNotFoundException")
+        stubber.add_response("query", { "Items": [] }, query)
+        with instrumentation.listening(events.append):
+            client.query(**query)
+            with pytest.raises(client.exceptions.ResourceNotFoundException):
+                client.get_item(TableName="table", Key={ "pk": { "S": "a" } })
+        client.query(**query)
+
+    assert [event.operation for event in events] == ["dynamodb.Query", "dynamodb.GetItem"]
+    assert events[0].items == 1
+    assert events[0].consumed_capacity == 0.5
+    assert events[0].attributes["table"] == "table"
+    assert events[0].error is None
+    assert events[1].error == "ResourceNotFoundException"
+
+
+def test_opentelemetry(tmp_path):
+    pytest.importorskip("opentelemetry.sdk")
+    from opentelemetry.sdk.trace import TracerProvider
+    from opentelemetry.sdk.trace.export import SimpleSpanProcessor
+    from opentelemetry.sdk.trace.export.in_memory_span_exporter import InMemorySpanExporter
+
+    exporter = InMemorySpanExporter()
+    provider = TracerProvider()
+    provider.add_span_processor(SimpleSpanProcessor(exporter))
+    listener = instrumentation.OpenTelemetryListener(tracer=provider.get_tracer("test"))
+    with instrumentation.listening(listener):
+        MutableJSONFileKnowledgeBase(tmp_path / "kb.json").save()
+
+    spans = exporter.get_finished_spans()
+    assert [span.name for span in spans] == ["file.open", "file.save"]
+    assert spans[1].attributes["pyknowbase.items"] == 0
+    assert spans[1].end_time >= spans[1].start_time
+
+
+def test_failing_listener(tmp_path, caplog):
+    def fail(event):
+        raise RuntimeError("listener failed")
+
+    recorder = instrumentation.MetricsRecorder()
+    kb = MutableJSONFileKnowledgeBase(tmp_path / "kb.json")
+    kb["a"] = Article(id="a", text="A")
+    with instrumentation.listening(fail), instrumentation.listening(recorder):
+        kb.save()
+        with pytest.raises(KeyError):
+            with instrumentation.operation("test"):
+                raise KeyError("a")
+    assert MutableJSONFileKnowledgeBase(tmp_path / "kb.json")["a"].text == "A"
+    assert recorder.stats["file.save"].count == 1
+    assert recorder.stats["test"].errors == 1
+    assert "listener failed" in caplog.text
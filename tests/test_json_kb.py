@@ -0,0 +1,77 @@
+import io
+
+import pytest
+
+from pyknowbase.model import Article
+from pyknowbase.storage.json_kb import MutableJSONFileKnowledgeBase
+from pyknowbase.storage.json_kb import iter_json_array
+from pyknowbase.storage.jsonl_kb import MutableJsonLinesKnowledgeBase
+
+
+def test_iter_json_array():
+    text = ' [ {"a": "x]y"} ,\n{"b": [1, 2, {"c": null}]}, 3 ] '
+    assert list(iter_json_array(io.StringIO(text), chunk_size=3)) == [
+        {"a": "x]y"}, {"b": [1, 2, {"c": None}]}, 3
+    ]
+    assert list(iter_json_array(io.StringIO("[]"))) == []
+    with pytest.raises(ValueError, match="Invalid JSON array"):
+        list(iter_json_array(io.StringIO('[{"a": 1} {"b": 2}]')))
+
+
+@pytest.mark.parametrize("cls, kwargs", [
+    (MutableJSONFileKnowledgeBase, {}),
+    (MutableJSONFileKnowledgeBase, {"streaming": True}),
+    (MutableJsonLinesKnowledgeBase, {}),
+])
+def test_save_and_load(tmp_path, cls, kwargs):
+    path = tmp_path / "kb.json"
+    kb = cls(path, **kwargs)
+    kb.put_articles(Article(id=f"a{i}", text=f"text {i}", metadata={"i": i}) for i in range(3))
+    kb.save()
+    loaded = cls(path, **kwargs)
+    assert loaded.name == "kb.json"
+    assert [a.model_dump() for a in loaded] == [a.model_dump() for a in kb]
+
+
+@pytest.mark.parametrize("cls", [MutableJSONFileKnowledgeBase, MutableJsonLinesKnowledgeBase])
+def test_lazy(tmp_path, cls):
+    path = tmp_path / "kb.json"
+    kb = cls(path)
+    kb.put_articles(Article(id=f"a{i}", text=f"szöveg {i}") for i in range(5))
+    kb.save()
+    lazy = cls(path, lazy=True, cache_size=2)
+    assert lazy.index_filepath.is_file()
+    assert lazy["a3"].text == "szöveg 3"
+    lazy.add(Article(id="b", text="new"))
+    del lazy["a0"]
+    lazy.save()
+    reopened = cls(path, lazy=True)
+    assert [a.id for a in reopened] == ["a1", "a2", "a3", "a4", "b"]
+    assert reopened.get_many(["a4", "a0"])["a4"].text == "szöveg 4"
+
+
+def test_streaming_validate(tmp_path):
+    path = tmp_path / "kb.json"
+    path.write_text('[{"id": "a", "text": "text", "metadata": {}}, {"id": "b", "text": 5}]')
+    kb = MutableJSONFileKnowledgeBase(path, streaming=True)
+    assert [a.id for a in kb] == ["a", "b"]
+    with pytest.raises(ValueError, match="text"):
+        MutableJSONFileKnowledgeBase(path, streaming=True, validate=True)
+
+
+def test_iter_json_array_chunk_boundaries():
+    text = '[12345, "a\\\\\\"]b", {"c": "]"}, 6.5e1]'
+    expected = [12345, 'a\\"]b', {"c": "]"}, 65.0]
+    for chunk_size in range(1, len(text) + 1):
+        assert list(iter_json_array(io.StringIO(text), chunk_size=chunk_size)) == expected
+    with pytest.raises(ValueError, match="Unexpected end"):
+        list(iter_json_array(io.StringIO("[12"), chunk_size=2))
+
+
+def test_lazy_crlf(tmp_path):
+    path = tmp_path / "kb.json"
+    articles = [Article(id=f"a{i}", text=f"szöveg {i}") for i in range(3)]
+    text = "[\r\n" + ",\r\n".join(a.model_dump_json() for a in articles) + "\r\n]\r\n"
+    path.write_bytes(text.encode("utf-8"))
+    lazy = MutableJSONFileKnowledgeBase(path, lazy=True)
+    assert [lazy[f"a{i}"].text for i in range(3)] == [f"szöveg {i}" for i in range(3)]
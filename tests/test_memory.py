@@ -0,0 +1,44 @@
+from pyknowbase.model import Article
+from pyknowbase.storage.memory import MutableInMemoryKnowledgeBase
+
+
+def make_kb(name="kb", count=3):
+    kb = MutableInMemoryKnowledgeBase(name)
+    kb.put_articles(Article(id=f"a{i}", text=f"text {i}") for i in range(count))
+    return kb
+
+
+def test_copy_from():
+    source = make_kb("source")
+    target = MutableInMemoryKnowledgeBase("target")
+    target.copy_from(source)
+    assert sorted(a.id for a in target) == ["a0", "a1", "a2"]
+    target.delete_articles(["a0", "a2"])
+    assert [a.id for a in target] == ["a1"]
+
+
+def test_get_many():
+    kb = make_kb()
+    result = kb.get_many(["a0", "a2", "missing"])
+    assert sorted(result) == ["a0", "a2"]
+    assert result["a2"].text == "text 2"
+
+
+def test_sync_from():
+    source = make_kb("source")
+    target = MutableInMemoryKnowledgeBase("target")
+    assert target.sync_from(source) == (3, 0, 0, 0)
+    assert target.sync_from(source) == (0, 0, 0, 3)
+
+    source.add(Article(id="a1", text="updated"))
+    source.add(Article(id="a3", text="new"))
+    del source["a0"]
+    result = target.sync_from(source, batch_size=1)
+    assert result.added == 1 and result.updated == 1 and result.deleted == 1
+    assert result.unchanged == 1
+    assert sorted(a.id for a in target) == ["a1", "a2", "a3"]
+    assert target["a1"].text == "updated"
+
+    del source["a3"]
+    assert target.sync_from(source, delete=False).deleted == 0
+    assert "a3" in target.index
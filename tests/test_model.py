@@ -0,0 +1,40 @@
+from datetime import datetime, timezone
+
+from pyknowbase.model import Article, content_hash, find_duplicates, unique_articles
+
+
+def test_from_trusted():
+    data = {
+        "id": "a",
+        "text": "text",
+        "metadata": { "lang": "en" },
+        "last_modified": "2024-01-01T12:30:00.500000Z",
+    }
+    article = Article.from_trusted(data)
+    assert article == Article.model_validate(data)
+    assert article.last_modified == datetime(2024, 1, 1, 12, 30, 0, 500000, tzinfo=timezone.utc)
+    assert article.model_dump_json() == Article.model_validate(data).model_dump_json()
+
+    article = Article.from_trusted({ "id": "b", "text": "text", "metadata": None })
+    assert article.metadata == {}
+    assert article.last_modified.tzinfo is not None
+
+
+def test_metadata_default_is_not_shared():
+    first = Article(id="a", text="a")
+    first.metadata["key"] = "value"
+    assert Article(id="b", text="b").metadata == {}
+
+
+def test_content_hash_and_duplicates():
+    article = Article(id="a", text="text", metadata={ "x": 1 })
+    same = Article(id="b", text="text", metadata={ "x": 1 })
+    assert content_hash(article) == content_hash(same)
+    assert content_hash(article) != content_hash(Article(id="a", text="text", metadata={ "x": 2 }))
+    assert content_hash(article) != content_hash(Article(id="a", text="text2"))
+
+    duplicates = {}
+    unique = list(unique_articles([article, same, Article(id="c", text="other")], duplicates))
+    assert [a.id for a in unique] == ["a", "c"]
+    assert duplicates == { "b": "a" }
+    assert find_duplicates([article, same]) == [["a", "b"]]
@@ -0,0 +1,31 @@
+import pytest
+
+from pyknowbase.storage.parallel import consume_parallel, iterate_parallel
+
+
+def test_iterate_parallel():
+    sources = [lambda i=i: range(i * 100, (i + 1) * 100) for i in range(5)]
+    result = list(iterate_parallel(sources, max_workers=2, queue_size=10))
+    assert sorted(result) == list(range(500))
+
+
+def test_iterate_parallel_error():
+    def failing():
+        yield 1
+        raise ValueError("boom")
+
+    with pytest.raises(ValueError, match="boom"):
+        list(iterate_parallel([failing, lambda: range(10)]))
+
+
+def test_consume_parallel():
+    consumed = []
+    consume_parallel(range(100), consumed.append, max_workers=3)
+    assert sorted(consumed) == list(range(100))
+
+    def failing(element):
+        if element == 5:
+            raise ValueError("boom")
+
+    with pytest.raises(ValueError, match="boom"):
+        consume_parallel(range(100), failing, max_workers=2)
@@ -0,0 +1,51 @@
+import pytest
+
+from pyknowbase.model import Article, ArticleHeader
+from pyknowbase.storage.binary import MutableBinaryKnowledgeBase
+from pyknowbase.storage.json_kb import MutableJSONFileKnowledgeBase
+from pyknowbase.storage.jsonl_kb import MutableJsonLinesKnowledgeBase
+from pyknowbase.storage.memory import MutableInMemoryKnowledgeBase
+
+
+def test_memory_projection():
+    kb = MutableInMemoryKnowledgeBase("test")
+    kb.add(Article(id="a", text="text", metadata={ "lang": "en" }))
+    assert list(kb.iter_ids()) == ["a"]
+    assert [h.metadata for h in kb.iter_headers()] == [{ "lang": "en" }]
+    assert kb.get("a", fields=["metadata"]) == { "id": "a", "metadata": { "lang": "en" } }
+    assert kb.get("a").text == "text"
+    assert kb.get("missing") is None
+    assert kb.get("missing", fields=["text"]) is None
+    with pytest.raises(ValueError):
+        kb.get("a", fields=["unknown"])
+
+
+@pytest.mark.parametrize("cls, kwargs", [
+    (MutableJSONFileKnowledgeBase, { "lazy": True }),
+    (MutableJsonLinesKnowledgeBase, { "lazy": True }),
+    (MutableBinaryKnowledgeBase, {}),
+])
+def test_file_projection(tmp_path, cls, kwargs):
+    path = tmp_path / "kb"
+    kb = cls(path)
+    kb.put_articles(Article(id=f"a{i}", text=f"text {i}", metadata={ "i": i }) for i in range(3))
+    kb.save()
+    kb = cls(path, **kwargs)
+    parsed = []
+    parse_article = kb.index.parse if hasattr(kb.index, "parse") else kb.index.decode
+
+    def counting_parse(*args):
+        parsed.append(args)
+        return parse_article(*args)
+
+    if hasattr(kb.index, "parse"):
+        kb.index.parse = counting_parse
+    else:
+        kb.index.decode = counting_parse
+    headers = sorted(kb.iter_headers(), key=lambda h: h.id)
+    assert [h.metadata["i"] for h in headers] == [0, 1, 2]
+    assert all(isinstance(h, ArticleHeader) for h in headers)
+    assert kb.get("a1", fields=["last_modified"])["last_modified"] == headers[1].last_modified
+    assert sorted(kb.iter_ids()) == ["a0", "a1", "a2"]
+    assert parsed == []
+    assert kb.get("a1", fields=["text"]) == { "id": "a1", "text": "text 1" }
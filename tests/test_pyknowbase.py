@@ -1,6 +1,57 @@
+import json
 
-from pyknowbase.cli import main
+import pytest
+
+from pyknowbase.cli import main, parse_uri
+from pyknowbase.model import Article
+from pyknowbase.storage.binary import BinaryKnowledgeBase
+from pyknowbase.storage.json_kb import MutableJSONFileKnowledgeBase
 
 
 def test_main():
     main([])
+
+
+def test_parse_uri():
+    assert parse_uri("json:///tmp/kb.json") == ("json", "/tmp/kb.json", {})
+    assert parse_uri("kb.pkbb?compression=zlib") == ("binary", "kb.pkbb", { "compression": "zlib" })
+    options = parse_uri("dynamo://table/kb?shards=1&create=0&lazy=yes")[2]
+    assert [(key, type(value), value) for key, value in options.items()] == [
+        ("shards", int, 1), ("create", int, 0), ("lazy", bool, True)
+    ]
+    with pytest.raises(ValueError):
+        parse_uri("kb.txt")
+    with pytest.raises(ValueError):
+        parse_uri("ftp://kb")
+
+
+def test_copy_stats_sync(tmp_path, capsys):
+    source = tmp_path / "kb.json"
+    kb = MutableJSONFileKnowledgeBase(source)
+    kb.put_articles(Article(id=f"a{i}", text=f"text {i % 5}") for i in range(20))
+    kb.save()
+
+    target = tmp_path / "kb.pkbb"
+    uri = f"binary://{target}?compression=zlib"
+    assert main(["copy", str(source), uri, "--batch-size", "3"]) == 0
+    assert "copied 20 articles" in capsys.readouterr().err
+    assert len(list(BinaryKnowledgeBase(target))) == 20
+
+    assert main(["stats", str(target), "--duplicates"]) == 0
+    stats = json.loads(capsys.readouterr().out)
+    assert stats["articles"] == 20
+    assert stats["duplicates"] == 15
+
+    del kb["a0"]
+    kb.save()
+    assert main(["sync", "-q", str(source), str(target)]) == 0
+    assert len(list(BinaryKnowledgeBase(target))) == 19
+
+    assert main(["copy", str(source), f"json://{tmp_path / 'copy.json'}?stream=true"]) == 1
+    assert "Unsupported option stream" in capsys.readouterr().err
+    assert main(["copy", str(source), f"jsonl://{tmp_path / 'copy.jsonl'}?compression=zlib"]) == 1
+    assert "Unsupported option compression" in capsys.readouterr().err
+    assert main(["copy", f"{source}?streaming=true&journal=true", str(tmp_path / "c.yml")]) == 0
+    assert main(["export", str(source), "dynamo://table/kb"]) == 1
+    assert main(["stats", str(tmp_path / "missing.json")]) == 1
+    assert "not found" in capsys.readouterr().err
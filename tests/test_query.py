@@ -0,0 +1,60 @@
+from datetime import datetime, timedelta, timezone
+
+import pytest
+
+from pyknowbase.model import Article, article_matches
+from pyknowbase.storage.json_kb import MutableJSONFileKnowledgeBase
+from pyknowbase.storage.memory import MutableInMemoryKnowledgeBase
+
+T0 = datetime(2024, 1, 1, tzinfo=timezone.utc)
+
+
+def make_articles():
+    return [
+        Article(
+            id=f"a{i}",
+            text="text",
+            metadata={ "lang": ["en", "de", "fr"][i % 3], "n": i, "tags": ["x"] },
+            last_modified=T0 + timedelta(days=i),
+        )
+        for i in range(9)
+    ]
+
+
+def ids(articles):
+    return sorted(article.id for article in articles)
+
+
+def test_article_matches():
+    article = make_articles()[4]
+    assert article_matches(article, { "lang": "de", "n": { "gte": 4, "lt": 5 } })
+    assert article_matches(article, { "tags": ["x"] })
+    assert article_matches(article, { "last_modified": { "gt": datetime(2024, 1, 1) } })
+    assert not article_matches(article, { "lang": { "in": ["en", "fr"] } })
+    assert not article_matches(article, { "missing": None })
+    assert not article_matches(article, { "lang": { "gt": 3 } })
+
+
+@pytest.mark.parametrize("indexed_fields", [(), ("lang", "tags")])
+def test_memory_query(indexed_fields):
+    kb = MutableInMemoryKnowledgeBase("test", indexed_fields=indexed_fields)
+    kb.put_articles(make_articles())
+    assert ids(kb.query({ "lang": "en" })) == ["a0", "a3", "a6"]
+    assert ids(kb.query({ "lang": { "in": ["de", "fr"] }, "n": { "gt": 5 } })) == ["a7", "a8"]
+    assert ids(kb.query({ "tags": ["x"], "last_modified": { "lt": T0 + timedelta(days=2) } })) \
+        == ["a0", "a1"]
+
+    kb["a0"] = Article(id="a0", text="text", metadata={ "lang": "de" })
+    del kb["a3"]
+    assert ids(kb.query({ "lang": "en" })) == ["a6"]
+    assert ids(kb.query({ "lang": "de" })) == ["a0", "a1", "a4", "a7"]
+
+
+def test_file_query(tmp_path):
+    path = tmp_path / "kb.json"
+    kb = MutableJSONFileKnowledgeBase(path)
+    kb.put_articles(make_articles())
+    kb.save()
+    indexed = MutableJSONFileKnowledgeBase(path, lazy=True, indexed_fields=["lang"])
+    assert ids(indexed.query({ "lang": "fr" })) == ["a2", "a5", "a8"]
+    assert set(indexed.metadata_indexes["lang"].keys) == { "en", "de", "fr" }
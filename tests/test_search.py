@@ -0,0 +1,74 @@
+from pyknowbase.model import Article
+from pyknowbase.search import InvertedIndex, MutableSearchableKnowledgeBase
+from pyknowbase.storage.json_kb import MutableJSONFileKnowledgeBase
+from pyknowbase.storage.memory import MutableInMemoryKnowledgeBase
+
+TEXTS = {
+    "password": "How to reset your password. Open the settings and click reset password.",
+    "billing": "Billing questions: invoices are sent monthly.",
+    "login": "If the login fails, check your password or reset it.",
+}
+
+
+def test_search_ranking():
+    index = InvertedIndex()
+    for article_id, text in TEXTS.items():
+        index.add(article_id, text)
+    results = index.search("reset password", k=2)
+    assert [article_id for article_id, _ in results] == ["password", "login"]
+    assert results[0][1] > results[1][1] > 0
+    assert index.search("unknown words") == []
+
+    index.remove("password")
+    assert [article_id for article_id, _ in index.search("reset password")] == ["login"]
+    index.add("login", "Billing of the login")
+    assert {article_id for article_id, _ in index.search("billing")} == {"billing", "login"}
+    assert len(index) == 2
+
+
+def test_searchable_file_knowledge_base(tmp_path):
+    path = tmp_path / "kb.json"
+    kb = MutableSearchableKnowledgeBase(MutableJSONFileKnowledgeBase(path))
+    kb.put_articles(Article(id=article_id, text=text) for article_id, text in TEXTS.items())
+    del kb["billing"]
+    kb.knowledge_base.save()
+    kb.save_index()
+    assert kb.index_path == tmp_path / "kb.json.search"
+
+    loaded = InvertedIndex.load(kb.index_path)
+    assert loaded is not None
+    assert loaded.search("reset password") == kb.search("reset password")
+
+    reopened = MutableSearchableKnowledgeBase(MutableJSONFileKnowledgeBase(path))
+    assert reopened.search("invoices") == []
+    assert reopened.search("login")[0][0] == "login"
+
+
+def test_searchable_memory_knowledge_base():
+    memory = MutableInMemoryKnowledgeBase("memory")
+    memory["billing"] = Article(id="billing", text=TEXTS["billing"])
+    kb = MutableSearchableKnowledgeBase(memory)
+    kb["login"] = Article(id="login", text=TEXTS["login"])
+    assert {article_id for article_id, _ in kb.search("invoices login")} == {"billing", "login"}
+    assert kb.index_path is None
+
+
+def test_delegation():
+    class Backend(MutableInMemoryKnowledgeBase):
+        def query(self, filter):
+            calls.append("query")
+            return super().query(filter)
+
+        def iter_headers(self):
+            calls.append("iter_headers")
+            return super().iter_headers()
+
+    calls = []
+    kb = MutableSearchableKnowledgeBase(Backend("kb", indexed_fields=["topic"]))
+    kb.put_articles(
+        Article(id=key, text=text, metadata={"topic": key}) for key, text in TEXTS.items()
+    )
+    assert [article.id for article in kb.query({"topic": "login"})] == ["login"]
+    assert sorted(header.id for header in kb.iter_headers()) == sorted(TEXTS)
+    assert calls == ["query", "iter_headers"]
+    assert kb.get("login", fields=["metadata"]) == {"id": "login", "metadata": {"topic": "login"}}
@@ -0,0 +1,46 @@
+import pytest
+
+from pyknowbase.model import Article
+from pyknowbase.storage.memory import MutableInMemoryKnowledgeBase
+from pyknowbase.storage.sharded import MutableShardedKnowledgeBase, shard_of
+
+
+def make_kb(shards=4):
+    return MutableShardedKnowledgeBase(
+        [MutableInMemoryKnowledgeBase(f"shard-{i}") for i in range(shards)], name="sharded"
+    )
+
+
+def test_shard_of():
+    assert shard_of("article", 1) == 0
+    assert shard_of("article", 16) == shard_of("article", 16)
+    assert { shard_of(f"article-{i}", 4) for i in range(100) } == { 0, 1, 2, 3 }
+
+
+def test_routing():
+    kb = make_kb()
+    articles = [Article(id=f"a{i}", text=f"text {i}", metadata={ "n": i }) for i in range(100)]
+    kb.put_articles(articles)
+    kb.add(Article(id="single", text="single"))
+
+    for shard in kb.shards:
+        assert 0 < len(list(shard)) < 101
+        for article in shard:
+            assert kb.shard(article.id) is shard
+
+    assert kb["a42"].text == "text 42"
+    assert kb.get("a42", fields=["metadata"]) == { "id": "a42", "metadata": { "n": 42 } }
+    assert set(kb.get_many(["a1", "a2", "missing"])) == { "a1", "a2" }
+    assert sorted(article.id for article in kb) == sorted([a.id for a in articles] + ["single"])
+    assert len(list(kb.iter_versions())) == 101
+    assert { a.id for a in kb.query({ "n": { "lt": 3 } }) } == { "a0", "a1", "a2" }
+
+    del kb["single"]
+    kb.delete_articles(["a1", "a2"])
+    assert kb.get("single") is None
+    assert set(kb.iter_ids()) == { a.id for a in articles } - { "a1", "a2" }
+
+
+def test_no_shards():
+    with pytest.raises(ValueError):
+        MutableShardedKnowledgeBase([])
@@ -0,0 +1,64 @@
+from concurrent.futures import ProcessPoolExecutor
+import multiprocessing
+import pickle
+
+import pytest
+
+from pyknowbase.model import Article
+from pyknowbase.storage.memory import MutableInMemoryKnowledgeBase
+from pyknowbase.storage.shared import SharedKnowledgeBase
+
+
+def make_source(count=10):
+    kb = MutableInMemoryKnowledgeBase("source")
+    kb.put_articles(Article(id=f"a{i}", text=f"text {i}") for i in range(count))
+    return kb
+
+
+def read_text(kb, article_id):
+    return kb[article_id].text
+
+
+def test_publish(tmp_path):
+    kb = SharedKnowledgeBase.publish(make_source(), tmp_path / "kb.pkbb")
+    assert kb.name == "source"
+    assert kb["a3"].text == "text 3"
+    assert len(list(kb)) == 10
+    assert not hasattr(kb, "__setitem__")
+
+    attached = pickle.loads(pickle.dumps(kb))
+    assert attached.filepath == kb.filepath
+    assert attached["a5"].text == "text 5"
+
+    assert not kb.refresh()
+    SharedKnowledgeBase.publish(make_source(20), tmp_path / "kb.pkbb")
+    assert kb.refresh()
+    assert len(list(kb)) == 20
+    # A process attached to the old version can still read it.
+    assert attached["a5"].text == "text 5"
+    assert attached.get("a15") is None
+
+    kb.unlink()
+    assert not (tmp_path / "kb.pkbb").exists()
+    with pytest.raises(FileNotFoundError):
+        SharedKnowledgeBase(tmp_path / "kb.pkbb")
+
+
+def test_worker_processes(tmp_path):
+    kb = SharedKnowledgeBase.publish(make_source(), tmp_path / "kb.pkbb")
+    context = multiprocessing.get_context("spawn")
+    with ProcessPoolExecutor(max_workers=1, mp_context=context) as executor:
+        texts = list(executor.map(read_text, [kb, kb], ["a1", "a2"]))
+    assert texts == ["text 1", "text 2"]
+
+
+def test_publish_failure_keeps_the_published_version(tmp_path):
+    kb = SharedKnowledgeBase.publish(make_source(3), tmp_path / "kb.pkbb")
+    source = make_source(3)
+    source["bad"] = Article(id="bad", text="text", metadata={"x": object()})
+    with pytest.raises(ValueError):
+        SharedKnowledgeBase.publish(source, tmp_path / "kb.pkbb")
+    assert [path.name for path in tmp_path.iterdir()] == ["kb.pkbb"]
+    assert not kb.refresh()
+    kb.unlink()
+    kb.unlink()
@@ -0,0 +1,29 @@
+import pytest
+
+from pyknowbase.model import Article
+
+yaml = pytest.importorskip("yaml")
+
+from pyknowbase.storage.yaml import MutableYamlKnowledgeBase, YamlKnowledgeBase  # noqa: E402
+
+
+@pytest.mark.parametrize("stream", [False, True])
+def test_save_and_load(tmp_path, stream):
+    path = tmp_path / "kb.yaml"
+    kb = MutableYamlKnowledgeBase(path, stream=stream)
+    kb.put_articles(
+        Article(id=f"a{i}", text=f"szöveg\n{i}", metadata={ "i": i }) for i in range(3)
+    )
+    kb.save()
+    documents = list(yaml.safe_load_all(path.read_text(encoding="utf-8")))
+    assert len(documents) == (3 if stream else 1)
+
+    # Both formats are recognized when loading.
+    loaded = YamlKnowledgeBase(path)
+    assert [a.model_dump() for a in loaded] == [a.model_dump() for a in kb]
+
+
+def test_empty(tmp_path):
+    path = tmp_path / "kb.yaml"
+    path.write_text("")
+    assert list(YamlKnowledgeBase(path)) == []